@@ -0,0 +1,236 @@
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger(__name__)
+
+
+def top_n_indices(scores: np.ndarray, n: int, candidate_mask: np.ndarray = None) -> np.ndarray:
+    """
+    Return the indices of the n highest scores, best first, using argpartition instead of a full sort.
+    Ties are broken by the lower index, like a stable descending sort. Only indices where
+    candidate_mask is True are considered.
+    """
+    candidates = np.flatnonzero(candidate_mask) if candidate_mask is not None else np.arange(len(scores))
+    if n <= 0 or len(candidates) == 0:
+        return np.array([], dtype=np.int64)
+
+    if n < len(candidates):
+        candidate_scores = scores[candidates]
+        cutoff = candidate_scores[np.argpartition(-candidate_scores, n - 1)[:n]].min()
+        # Everything above the cut-off score, then the lowest-index ties to fill up to n
+        above = candidates[candidate_scores > cutoff]
+        tied = candidates[candidate_scores == cutoff][:n - len(above)]
+        candidates = np.concatenate([above, tied])
+
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def normalize_vectors(vectors):
+    """
+    L2-normalize the rows of a dense or sparse matrix (all-zero rows stay zero)
+    """
+    if sp.issparse(vectors):
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    else:
+        vectors = np.asarray(vectors, dtype=np.float64)
+        norms = np.linalg.norm(vectors, axis=1)
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms, dtype=np.float64), where=norms > 0)
+    if sp.issparse(vectors):
+        return sp.csr_matrix(sp.diags(inverse_norms) @ vectors)
+    return vectors * inverse_norms[:, None]
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search over unit-length rows (dense or sparse): one product with the whole
+    catalog per query. The reference for recall and the index used for small catalogs.
+    """
+
+    kind = 'exact'
+    approximate = False
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.recall_at_k = 1.0
+
+    @property
+    def n_items(self) -> int:
+        return self.vectors.shape[0]
+
+    def search(self, query: np.ndarray, k: int, candidate_mask: np.ndarray = None) -> tuple:
+        """
+        Return (row indices, cosine similarities) of the k rows most similar to a unit-length
+        query, best first (ties by the lower index), among rows where candidate_mask is True
+        """
+        scores = np.asarray(self.vectors @ query).ravel()
+        top = top_n_indices(scores, k, candidate_mask)
+        return top, scores[top]
+
+    def params(self) -> dict:
+        return {'kind': self.kind}
+
+    def arrays(self) -> dict:
+        return {}
+
+
+class IVFIndex:
+    """
+    Inverted-file index: a spherical k-means coarse quantizer splits the unit-length rows into
+    n_lists cells. A query scores the centroids, then scores exactly only the rows of the n_probe
+    best cells, so its cost is about n_lists + n_items * n_probe / n_lists instead of n_items.
+    Cells are stored CSR-style (rows of cell c are list_rows[list_offsets[c]:list_offsets[c + 1]],
+    ascending). When the probed cells hold fewer than k candidates, more cells are probed.
+    """
+
+    kind = 'ivf'
+    approximate = True
+
+    def __init__(self, vectors, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray,
+                 n_probe: int = 8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.n_probe = max(1, min(n_probe, len(centroids)))
+        self.recall_at_k = None
+
+    @classmethod
+    def build(cls, vectors, n_lists: int = None, n_probe: int = 8, n_iter: int = 10,
+              train_size: int = 50000, block_size: int = 4096, random_state: int = 42) -> 'IVFIndex':
+        """
+        Fit the quantizer on up to train_size rows (n_lists defaults to about sqrt(n_items)),
+        then assign every row to its closest centroid, block_size rows at a time
+        """
+        n_items = vectors.shape[0]
+        n_lists = max(1, min(n_lists or int(np.sqrt(n_items)), n_items))
+        rng = np.random.default_rng(random_state)
+
+        sample = vectors
+        if n_items > train_size:
+            sample = vectors[np.sort(rng.choice(n_items, train_size, replace=False))]
+        centroids = cls._spherical_kmeans(sample, n_lists, n_iter, rng, block_size)
+
+        labels = cls._assign(vectors, centroids, block_size)
+        list_rows = np.argsort(labels, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(vectors, centroids, list_offsets, list_rows, n_probe)
+
+    @staticmethod
+    def _assign(vectors, centroids: np.ndarray, block_size: int) -> np.ndarray:
+        """
+        Closest centroid of every row. Rows are scored one block at a time and only each block's
+        argmax is kept, so at most a (block_size x n_lists) score block is held.
+        """
+        n_rows = vectors.shape[0]
+        labels = np.empty(n_rows, dtype=np.int64)
+        centroids_t = centroids.T
+        for start in range(0, n_rows, block_size):
+            end = min(start + block_size, n_rows)
+            labels[start:end] = np.asarray(vectors[start:end] @ centroids_t).argmax(axis=1).ravel()
+        return labels
+
+    @classmethod
+    def _spherical_kmeans(cls, vectors, n_lists: int, n_iter: int, rng, block_size: int) -> np.ndarray:
+        n_rows = vectors.shape[0]
+        seeds = rng.choice(n_rows, n_lists, replace=False)
+        centroids = vectors[seeds].toarray() if sp.issparse(vectors) else np.array(vectors[seeds], dtype=np.float64)
+        for _ in range(n_iter):
+            labels = cls._assign(vectors, centroids, block_size)
+            membership = sp.csr_matrix((np.ones(n_rows), (labels, np.arange(n_rows))), shape=(n_lists, n_rows))
+            sums = membership @ vectors
+            sums = sums.toarray() if sp.issparse(sums) else np.asarray(sums)
+            norms = np.linalg.norm(sums, axis=1)
+            # Cells that lost all their rows keep their previous centroid
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+        return centroids
+
+    @property
+    def n_items(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def search(self, query: np.ndarray, k: int, candidate_mask: np.ndarray = None) -> tuple:
+        """
+        Same contract as ExactIndex.search, over the rows of the probed cells
+        """
+        centroid_order = np.argsort(-(self.centroids @ query), kind='stable')
+        n_probe = self.n_probe
+        while True:
+            cells = centroid_order[:n_probe]
+            rows = np.sort(np.concatenate([
+                self.list_rows[self.list_offsets[cell]:self.list_offsets[cell + 1]] for cell in cells
+            ]))
+            if candidate_mask is not None:
+                rows = rows[candidate_mask[rows]]
+            if len(rows) >= k or n_probe >= self.n_lists:
+                break
+            n_probe *= 2
+
+        scores = np.asarray(self.vectors[rows] @ query).ravel()
+        top = top_n_indices(scores, k)
+        return rows[top], scores[top]
+
+    def params(self) -> dict:
+        return {'kind': self.kind, 'n_probe': self.n_probe}
+
+    def arrays(self) -> dict:
+        return {'centroids': self.centroids, 'list_offsets': self.list_offsets, 'list_rows': self.list_rows}
+
+
+def recall_at_k(index, exact: ExactIndex, queries, k: int = 10) -> float:
+    """
+    Fraction of the exact top-k (over all queries) that the index also returns
+    """
+    found = expected = 0
+    for query in queries:
+        exact_top = set(exact.search(query, k)[0].tolist())
+        found += len(exact_top & set(index.search(query, k)[0].tolist()))
+        expected += len(exact_top)
+    return found / expected if expected else 1.0
+
+
+def build_index(vectors, method: str = 'ivf', min_items: int = 5000, n_probe: int = 8,
+                recall_queries: int = 100, profile_size: int = 3, k: int = 10, random_state: int = 42):
+    """
+    Index unit-length rows for cosine search: an IVFIndex for catalogs of at least min_items rows
+    (method 'ivf'), otherwise an ExactIndex. The IVF recall@k against exact search is measured on
+    recall_queries profiles of profile_size random rows and kept in index.recall_at_k.
+    """
+    if method not in ('ivf', 'exact'):
+        raise ValueError(f"Unknown ANN index method '{method}', expected ivf or exact")
+    n_items = vectors.shape[0]
+    if method == 'exact' or n_items < max(min_items, 1):
+        return ExactIndex(vectors)
+
+    index = IVFIndex.build(vectors, n_probe=n_probe, random_state=random_state)
+    # Queries shaped like user profiles: the normalized mean of a few random rows
+    rng = np.random.default_rng(random_state)
+    n_queries = min(recall_queries, n_items)
+    profile_rows = sp.csr_matrix((np.ones(n_queries * profile_size),
+                                  (np.repeat(np.arange(n_queries), profile_size),
+                                   rng.integers(0, n_items, n_queries * profile_size))),
+                                 shape=(n_queries, n_items))
+    queries = normalize_vectors(profile_rows @ vectors)
+    queries = queries.toarray() if sp.issparse(queries) else queries
+    index.recall_at_k = round(recall_at_k(index, ExactIndex(vectors), queries, k), 4)
+    logger.info(f"Built IVF index over {n_items} rows: {index.n_lists} lists, {index.n_probe} probed, "
+                f"recall@{k} {index.recall_at_k}")
+    return index
+
+
+def load_index(params: dict, arrays: dict, vectors):
+    """
+    Rebuild an index from its params() and arrays() over the same vectors
+    """
+    if params['kind'] == 'ivf':
+        index = IVFIndex(vectors, arrays['centroids'], arrays['list_offsets'], arrays['list_rows'], params['n_probe'])
+        index.recall_at_k = params.get('recall_at_k')
+        return index
+    return ExactIndex(vectors)
@@ -0,0 +1,306 @@
+"""
+Benchmark suite for the recommender's core algorithms on synthetic data.
+
+Generates ratings, quizzes and play history at a configurable scale into a temporary SQLite
+database, runs every stage in-process and writes a JSON report. Passing --baseline compares the
+run against an earlier report and exits with status 1 when a stage got slower than the threshold.
+
+    python benchmark_recommender.py --scale small --output baseline.json
+    python benchmark_recommender.py --scale small --baseline baseline.json --threshold 1.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quiz_recommendation_system import QuizRecommendationSystem
+from update_trace import peak_rss_mb
+
+# (ratings, quizzes, users)
+SCALES = {
+    'tiny': (2000, 200, 300),
+    'small': (10000, 1000, 2000),
+    'medium': (100000, 10000, 20000),
+    'large': (1000000, 50000, 100000)
+}
+
+WORDS = ('algebra geometry physics chemistry biology history empire grammar vocabulary rhythm melody '
+         'calculus cells atoms kings poems statistics networks programming databases economics '
+         'geography literature painting anatomy genetics astronomy ecology logic ethics').split()
+CATEGORIES = ['Math', 'Science', 'History', 'English', 'Music', 'Computing', 'Art', 'Geography']
+LEVELS = np.array(['Easy', 'Medium', 'Hard'], dtype=object)
+
+
+def make_synthetic_data(n_ratings: int, n_quizzes: int, n_users: int, seed: int = 42) -> dict:
+    """
+    Synthetic quizzes, ratings (popularity-skewed, one per student and quiz) and play history
+    """
+    rng = np.random.default_rng(seed)
+    quiz_ids = np.array([str(uuid.UUID(int=int(value))) for value in rng.integers(0, 2 ** 63, n_quizzes)], dtype=object)
+
+    quizzes = pd.DataFrame({
+        'Id': quiz_ids,
+        'Name': [' '.join(rng.choice(WORDS, 2)) + f' quiz {i}' for i in range(n_quizzes)],
+        'Description': [' '.join(rng.choice(WORDS, 5)) for _ in range(n_quizzes)],
+        'CategoryId': rng.integers(1, len(CATEGORIES) + 1, n_quizzes),
+        'TotalQuestions': rng.integers(5, 40, n_quizzes),
+        'TimeInMinutes': rng.integers(5, 90, n_quizzes),
+        'IsActive': 1,
+        'Level': rng.choice(LEVELS, n_quizzes),
+        'CreatedAt': '2025-01-01 00:00:00'
+    })
+    quiz_categories = pd.DataFrame({'QuizId': quiz_ids, 'CategoryId': quizzes['CategoryId']})
+
+    # Zipf-like quiz popularity and student activity, deduplicated to one rating per pair
+    quiz_weights = 1.0 / np.arange(1, n_quizzes + 1) ** 0.8
+    user_weights = 1.0 / np.arange(1, n_users + 1) ** 0.5
+    n_draws = int(n_ratings * 1.3)
+    pairs = pd.DataFrame({
+        'StudentId': rng.choice(np.arange(1, n_users + 1), n_draws, p=user_weights / user_weights.sum()),
+        'QuizId': quiz_ids[rng.choice(n_quizzes, n_draws, p=quiz_weights / quiz_weights.sum())]
+    }).drop_duplicates().head(n_ratings).reset_index(drop=True)
+
+    feedbacks = pairs.assign(
+        Id=np.arange(1, len(pairs) + 1),
+        Score=rng.integers(1, 6, len(pairs)),
+        CreatedOn='2025-06-01 12:00:00'
+    )
+    student_quizzes = pairs.assign(Id=np.arange(1, len(pairs) + 1), Status='Completed')
+
+    return {
+        'Quizzes': quizzes,
+        'Categories': pd.DataFrame({'Id': np.arange(1, len(CATEGORIES) + 1), 'Name': CATEGORIES}),
+        'QuizCategories': quiz_categories,
+        'QuizFeedbacks': feedbacks,
+        'StudentQuizzes': student_quizzes
+    }
+
+
+def write_database(tables: dict, db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        for name, frame in tables.items():
+            frame.to_sql(name, conn, index=False)
+        conn.execute("CREATE INDEX IX_QuizFeedbacks_QuizId ON QuizFeedbacks (QuizId)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class StageTimer:
+    """
+    Collects stage results; optionally tracks each stage's peak Python allocations with tracemalloc
+    """
+
+    def __init__(self, repeat: int = 3, trace_memory: bool = False):
+        self.repeat = max(repeat, 1)
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def measure(self, name: str, fn, *args, **details):
+        """
+        Run fn(*args) repeat times; 'seconds' is the fastest run. Returns the last result.
+        """
+        timings = []
+        for _ in range(self.repeat):
+            with self.stage(name, **details):
+                result = fn(*args)
+            timings.append(self.results[name]['seconds'])
+        self.results[name].update(seconds=min(timings), median=round(float(np.median(timings)), 6), runs=len(timings))
+        return result
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **details):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            result = {'seconds': round(seconds, 6), **details}
+            if self.trace_memory:
+                result['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                tracemalloc.stop()
+            self.results[name] = result
+
+    def requests(self, name: str, fn, args_list: list):
+        """
+        Time fn(*args) once per entry; 'seconds' is the median latency
+        """
+        latencies = []
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies)
+        self.results[name] = {
+            'seconds': round(float(np.median(latencies)), 6),
+            'mean': round(float(latencies.mean()), 6),
+            'p95': round(float(np.percentile(latencies, 95)), 6),
+            'max': round(float(latencies.max()), 6),
+            'count': len(latencies)
+        }
+
+
+def run_benchmark(n_ratings: int, n_quizzes: int, n_users: int, n_requests: int = 200,
+                  batch_size: int = 500, repeat: int = 3, seed: int = 42, trace_memory: bool = False) -> dict:
+    """
+    Run every stage at the given scale (model builds and batches repeat times, single-user
+    requests once per sampled user) and return the report
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'benchmark.db')
+    timer = StageTimer(repeat, trace_memory)
+
+    try:
+        with timer.stage('generate_data'):
+            tables = make_synthetic_data(n_ratings, n_quizzes, n_users, seed)
+            write_database(tables, db_path)
+
+        rec_system = QuizRecommendationSystem(f'sqlite:///{db_path}', materialize_recommendations=False)
+        df = tables['QuizFeedbacks'].rename(columns={'StudentId': 'student_id', 'QuizId': 'quiz_id', 'Score': 'rating'})
+        df = df[['student_id', 'quiz_id', 'rating']]
+
+        # The recommender prints every recommendation list, keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            user_item_matrix = timer.measure('build_user_item_matrix', rec_system.build_user_item_matrix, df,
+                                             ratings=len(df))
+            item_neighbors = timer.measure('compute_item_similarity', rec_system.compute_item_similarity,
+                                           quizzes=user_item_matrix.shape[1])
+            timer.results['compute_item_similarity']['neighbors'] = item_neighbors.nnz
+            timer.measure('fit_knn_model', rec_system.fit_knn_model, df)
+            timer.measure('build_content_model', rec_system.build_content_model)
+            timer.measure('build_popularity', rec_system.build_popularity, df)
+            timer.measure('load_play_history', rec_system.play_history.refresh, True)
+
+            rng = np.random.default_rng(seed)
+            user_ids = user_item_matrix.index
+            sample_users = [int(user_id) for user_id in rng.choice(user_ids, min(n_requests, len(user_ids)), replace=False)]
+
+            timer.requests('recommend_for_user', rec_system.recommend_for_user, [(user_id, 10) for user_id in sample_users])
+            timer.requests('get_user_recommendations_with_knn', rec_system.get_user_recommendations_with_knn,
+                           [(user_id, 10) for user_id in sample_users])
+            timer.requests('content_based_recommend', rec_system.content_based_recommend,
+                           [(user_id, 10) for user_id in sample_users])
+
+            batch_users = [int(user_id) for user_id in rng.choice(user_ids, min(batch_size, len(user_ids)), replace=False)]
+            timer.measure('recommend_for_users', rec_system.recommend_for_users, batch_users, 10,
+                          users=len(batch_users))
+            timer.measure('get_batch_recommendations_with_knn', rec_system.get_batch_recommendations_with_knn,
+                          batch_users, 10, users=len(batch_users))
+
+        rec_system.engine.dispose()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform()
+        },
+        'scale': {'ratings': n_ratings, 'quizzes': n_quizzes, 'users': n_users,
+                  'requests': n_requests, 'batch_size': batch_size, 'repeat': repeat, 'seed': seed},
+        'trace_memory': trace_memory,
+        'peak_rss_mb': peak_rss_mb(),
+        'results': timer.results
+    }
+
+
+def compare_reports(report: dict, baseline: dict, threshold: float = 1.25, min_delta: float = 0.005) -> list:
+    """
+    Stages whose time grew beyond threshold x the baseline (ignoring differences under min_delta seconds)
+    """
+    if report['scale'] != baseline['scale']:
+        raise ValueError(f"Scale differs from the baseline: {report['scale']} vs {baseline['scale']}")
+    if report['trace_memory'] != baseline['trace_memory']:
+        raise ValueError("Timings with and without --trace-memory are not comparable")
+
+    regressions = []
+    for name, result in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None or name == 'generate_data':
+            continue
+        if result['seconds'] > previous['seconds'] * threshold and result['seconds'] - previous['seconds'] > min_delta:
+            regressions.append({
+                'stage': name,
+                'seconds': result['seconds'],
+                'baseline_seconds': previous['seconds'],
+                'ratio': round(result['seconds'] / previous['seconds'], 2) if previous['seconds'] else None
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the quiz recommender on synthetic data')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='preset scale (default: small)')
+    parser.add_argument('--ratings', type=int, help='number of ratings (overrides the preset)')
+    parser.add_argument('--quizzes', type=int, help='number of quizzes (overrides the preset)')
+    parser.add_argument('--users', type=int, help='number of students (overrides the preset)')
+    parser.add_argument('--requests', type=int, default=200, help='single-user requests timed per method')
+    parser.add_argument('--batch-size', type=int, default=500, help='users in the batch stages')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per model build and batch stage, fastest kept')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='record peak allocations per stage with tracemalloc (slows the run)')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='compare against this earlier JSON report')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='fail when a stage takes more than threshold x the baseline (default: 1.25)')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='ignore slowdowns smaller than this many seconds (default: 0.005)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    n_ratings, n_quizzes, n_users = SCALES[args.scale]
+    report = run_benchmark(
+        args.ratings or n_ratings, args.quizzes or n_quizzes, args.users or n_users,
+        n_requests=args.requests, batch_size=args.batch_size, repeat=args.repeat, seed=args.seed,
+        trace_memory=args.trace_memory
+    )
+
+    print(f"Benchmark at {report['scale']['ratings']} ratings, {report['scale']['quizzes']} quizzes, "
+          f"{report['scale']['users']} users (peak RSS {report['peak_rss_mb']} MB)")
+    for name, result in report['results'].items():
+        extra = f" (p95 {result['p95'] * 1000:.2f} ms over {result['count']} requests)" if 'p95' in result else ''
+        print(f"  {name:<36} {result['seconds'] * 1000:10.2f} ms{extra}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_reports(report, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\nRegressions over {args.threshold}x the baseline:")
+            for regression in regressions:
+                print(f"  {regression['stage']}: {regression['seconds']}s vs {regression['baseline_seconds']}s "
+                      f"({regression['ratio']}x)")
+            sys.exit(1)
+        print(f"\nNo stage slower than {args.threshold}x the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,4 +5,33 @@ DATABASE_CONNECTION_STRING = (
 )
 PORT = 5000
 K_NEIGHBORS = 5                 # số quiz tương tự dùng cho KNN
-UPDATE_INTERVAL_MINUTES = 5     # chạy phân tích lại mỗi 5 phút
\ No newline at end of file
+UPDATE_INTERVAL_MINUTES = 5     # chạy phân tích lại mỗi 5 phút
+FULL_RELOAD_EVERY_N_UPDATES = 12  # nạp lại toàn bộ QuizFeedbacks sau mỗi N lần cập nhật (0 = chỉ nạp delta)
+SIMILARITY_TOP_K = 50           # số quiz láng giềng giữ lại cho mỗi quiz (0 = giữ tất cả)
+SIMILARITY_MIN_SCORE = 0.0      # chỉ giữ láng giềng có độ tương đồng lớn hơn ngưỡng này
+SIMILARITY_DTYPE = "float32"    # kiểu lưu điểm tương đồng: float32 hoặc float16
+SIMILARITY_BLOCK_SIZE = 512     # số quiz tính tương đồng trong mỗi khối
+SIMILARITY_WORKERS = 1          # số tiến trình tính các khối tương đồng song song (1 = trong tiến trình hiện tại, 0 = theo số CPU)
+BATCH_CHUNK_SIZE = 256          # số người dùng được chấm điểm cùng lúc trong API batch
+MATERIALIZE_RECOMMENDATIONS = True  # ghi top-N của mỗi người dùng vào bảng RecommendedQuizzes sau mỗi lần cập nhật
+MATERIALIZE_TOP_N = 10          # số quiz gợi ý ghi cho mỗi người dùng
+MATERIALIZE_CHUNK_SIZE = 500    # số người dùng ghi trong mỗi transaction
+CLUSTER_MINIBATCH_THRESHOLD = 5000  # từ số quiz này trở lên dùng MiniBatchKMeans để phân cụm (0 = luôn dùng KMeans)
+CONTENT_MAX_FEATURES = 200     # số đặc trưng TF-IDF tối đa cho vector nội dung quiz
+ANN_METHOD = "ivf"              # chỉ mục láng giềng gần nhất: ivf (xấp xỉ) hoặc exact (tính với mọi quiz)
+ANN_MIN_ITEMS = 5000            # từ số quiz này trở lên mới dùng chỉ mục ivf (ít hơn thì tìm chính xác)
+ANN_PROBES = 8                  # số cụm được duyệt cho mỗi truy vấn (nhiều hơn = chính xác hơn nhưng chậm hơn)
+POPULARITY_PRIOR_WEIGHT = 0.0   # trọng số Bayes khi xếp hạng quiz phổ biến (0 = dùng điểm trung bình thuần)
+QUIZ_CACHE_MAX_ENTRIES = 50000  # số quiz tối đa giữ trong bộ nhớ đệm thông tin quiz
+QUIZ_CACHE_TTL_SECONDS = 3600   # thời gian sống (giây) của thông tin quiz trong bộ nhớ đệm
+RESPONSE_CACHE_MAX_ENTRIES = 10000  # số phản hồi gợi ý tối đa trong bộ nhớ đệm (0 = tắt)
+RESPONSE_CACHE_MAX_BYTES = 67108864 # dung lượng tối đa (byte) của bộ nhớ đệm phản hồi
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 30  # thời gian chờ tối đa (giây) cho yêu cầu trùng đang được tính
+METRICS_ENABLED = True          # thu thập số liệu cho endpoint /metrics
+UPDATE_TRACE_HISTORY = 50       # số lần cập nhật gần nhất giữ lại trong lịch sử trace
+PROFILE_TOP_N = 25              # số hàm tốn thời gian nhất trả về khi profile một yêu cầu
+PROFILE_HISTORY = 20            # số kết quả profile gần nhất được lưu lại
+MODEL_KEEP_VERSIONS = 3         # số phiên bản mô hình đã lưu giữ lại trên đĩa (khi đặt MODEL_DIR)
+MODEL_POLL_SECONDS = 10         # chu kỳ (giây) tiến trình phục vụ kiểm tra mô hình mới trong MODEL_DIR
+TRAIN_IN_SUBPROCESS = True      # huấn luyện lại mô hình trong tiến trình con để không làm chậm các yêu cầu
+UPDATE_WORKERS = 4              # số luồng chạy song song các bước cập nhật độc lập (truy vấn, huấn luyện)
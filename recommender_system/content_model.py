@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from ann_index import build_index, top_n_indices
+
+
+class ContentModel:
+    """
+    Fitted content-based model: the TF-IDF vectorizer, one L2-normalized sparse content vector per
+    active quiz (CSR rows in quiz_ids order) and the quiz id -> row index map.
+    Built once per model update and shared by all content-based requests, together with the
+    quiz clustering (labels, centroids and per-cluster member rows) used by the advanced method
+    and the nearest-neighbor index over the vectors used by profile searches.
+    """
+
+    def __init__(self, vectorizer, vectors, quiz_ids):
+        self.vectorizer = vectorizer
+        self.vectors = sp.csr_matrix(vectors)
+        self.quiz_ids = list(quiz_ids)
+        self.quiz_index = {quiz_id: row for row, quiz_id in enumerate(self.quiz_ids)}
+        self.cluster_labels = None
+        self.cluster_centroids = None
+        self.cluster_members = []
+        self.index = None
+
+    @property
+    def empty(self) -> bool:
+        return len(self.quiz_ids) == 0
+
+    def rows_for(self, quiz_ids) -> np.ndarray:
+        """
+        Row indices (ascending) of the given quizzes, skipping ids not in the model
+        """
+        rows = {self.quiz_index[quiz_id] for quiz_id in quiz_ids if quiz_id in self.quiz_index}
+        return np.array(sorted(rows), dtype=np.int64)
+
+    @property
+    def n_features(self) -> int:
+        return self.vectors.shape[1]
+
+    def profile_vector(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Unit-length user profile, the mean of the given rows' vectors (None if it is all zeros)
+        """
+        profile = np.asarray(self.vectors[rows].sum(axis=0)).ravel() / len(rows)
+        profile_norm = np.linalg.norm(profile)
+        if profile_norm == 0:
+            return None
+        return profile / profile_norm
+
+    def profile_similarities(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every quiz to a user profile, the mean of the given rows' vectors.
+        Rows are unit length (TF-IDF l2 norm), so this is one sparse x dense product scaled by
+        the profile norm; quizzes with an empty vector score 0.
+        """
+        profile = self.profile_vector(rows)
+        if profile is None:
+            return np.zeros(len(self.quiz_ids))
+        return self.vectors @ profile
+
+    def search(self, rows: np.ndarray, n: int, candidate_mask: np.ndarray = None) -> tuple:
+        """
+        The n quizzes most similar to the profile of the given rows, among rows where candidate_mask
+        is True: (row indices, cosine similarities), best first. Goes through the index when one
+        is built (approximate for large catalogs), otherwise scores every quiz.
+        """
+        profile = self.profile_vector(rows)
+        if self.index is None or profile is None:
+            similarities = self.profile_similarities(rows)
+            top = top_n_indices(similarities, n, candidate_mask)
+            return top, similarities[top]
+        return self.index.search(profile, n, candidate_mask)
+
+    def build_index(self, method: str = 'ivf', min_items: int = 5000, n_probe: int = 8):
+        """
+        Index the quiz vectors for profile searches (see ann_index.build_index)
+        """
+        self.index = build_index(self.vectors, method=method, min_items=min_items, n_probe=n_probe)
+        return self
+
+    def fit_clusters(self, minibatch_threshold: int = 5000, random_state: int = 42):
+        """
+        Cluster the quiz vectors (up to 10 clusters, about one per 10 quizzes) and store each
+        cluster's member rows in ascending order. Catalogs with at least minibatch_threshold
+        quizzes use MiniBatchKMeans instead of full KMeans.
+        """
+        n_quizzes = len(self.quiz_ids)
+        if n_quizzes == 0:
+            return self
+
+        n_clusters = min(max(3, n_quizzes // 10), 10, n_quizzes)
+        if minibatch_threshold and n_quizzes >= minibatch_threshold:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+        labels = kmeans.fit_predict(self.vectors).astype(np.int32)
+        return self.set_clusters(labels, kmeans.cluster_centers_)
+
+    def set_clusters(self, labels: np.ndarray, centroids: np.ndarray):
+        """
+        Store a clustering (one label per quiz row, one centroid per cluster), e.g. one fitted earlier
+        """
+        # A stable sort by label keeps each cluster's rows ascending
+        order = np.argsort(labels, kind='stable')
+        boundaries = np.cumsum(np.bincount(labels, minlength=len(centroids)))[:-1]
+
+        self.cluster_labels = labels
+        self.cluster_centroids = centroids
+        self.cluster_members = np.split(order, boundaries)
+        return self
@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class ItemNeighborStore:
+    """
+    Top-K most similar quizzes per quiz, packed CSR-style:
+    the neighbors of quiz i are indices[indptr[i]:indptr[i + 1]] (int32 column indices,
+    sorted ascending) with similarities in scores (float32 or float16).
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray, n_items: int,
+                 matrix_t: sp.csr_matrix = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.n_items = n_items
+        self._matrix = None
+        self._abs_matrix = None
+        # The transpose can be passed in precomputed (e.g. memory-mapped from a saved snapshot)
+        self._matrix_t = matrix_t
+        self._abs_matrix_t = None
+
+    @property
+    def shape(self) -> tuple:
+        return (self.n_items, self.n_items)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.scores.nbytes
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        """
+        Sparse items x items similarity matrix over the stored neighbors, for scoring products.
+        scipy.sparse has no float16 support, so float16 scores are widened to float32 here.
+        """
+        if self._matrix is None:
+            scores = self.scores if self.scores.dtype != np.float16 else self.scores.astype(np.float32)
+            self._matrix = sp.csr_matrix((scores, self.indices, self.indptr), shape=self.shape)
+        return self._matrix
+
+    @property
+    def abs_matrix(self) -> sp.csr_matrix:
+        """
+        |similarity| matrix for the normalizing product (the same matrix when no score is negative)
+        """
+        if self._abs_matrix is None:
+            matrix = self.matrix
+            self._abs_matrix = matrix if not len(self.scores) or self.scores.min() >= 0 else abs(matrix)
+        return self._abs_matrix
+
+    @property
+    def matrix_t(self) -> sp.csr_matrix:
+        """
+        Transposed similarity matrix in CSR form, for (users x quizzes) x (quizzes x quizzes) products
+        """
+        if self._matrix_t is None:
+            self._matrix_t = self.matrix.T.tocsr()
+        return self._matrix_t
+
+    @property
+    def abs_matrix_t(self) -> sp.csr_matrix:
+        """
+        Transposed |similarity| matrix in CSR form
+        """
+        if self._abs_matrix_t is None:
+            self._abs_matrix_t = self.matrix_t if self.abs_matrix is self.matrix else self.abs_matrix.T.tocsr()
+        return self._abs_matrix_t
+
+    def neighbors(self, item_idx: int) -> tuple:
+        """
+        Return (neighbor column indices, similarities) for one quiz
+        """
+        start, end = self.indptr[item_idx], self.indptr[item_idx + 1]
+        return self.indices[start:end], self.scores[start:end]
+
+    def similarities_to(self, item_idx: int, other_indices: np.ndarray) -> np.ndarray:
+        """
+        Similarity of one quiz to each of other_indices (0 where the pair was pruned)
+        """
+        neighbor_indices, neighbor_scores = self.neighbors(item_idx)
+        result = np.zeros(len(other_indices), dtype=np.float32)
+        if len(neighbor_indices) == 0 or len(other_indices) == 0:
+            return result
+        positions = np.searchsorted(neighbor_indices, other_indices)
+        positions = np.minimum(positions, len(neighbor_indices) - 1)
+        found = neighbor_indices[positions] == other_indices
+        result[found] = neighbor_scores[positions[found]]
+        return result
+
+
+def normalize_rows(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    """
+    L2-normalize the rows of a sparse matrix (all-zero rows stay zero)
+    """
+    matrix = sp.csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sp.diags(inverse_norms.astype(np.float32)) @ matrix
+
+
+def top_k_block(normalized: sp.csr_matrix, normalized_t: sp.csr_matrix, start: int, end: int,
+                top_k: int, min_similarity: float) -> tuple:
+    """
+    Cosine similarities of rows start:end against all rows, reduced to the top-K per row.
+    Returns (row lengths, column indices, scores) for the block.
+    """
+    block = (normalized[start:end] @ normalized_t).toarray()
+    n_rows, n_items = block.shape
+
+    # A quiz is not its own neighbor
+    block[np.arange(n_rows), np.arange(start, end)] = -np.inf
+
+    if top_k and top_k < n_items:
+        candidates = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_items), (n_rows, n_items))
+    candidates = np.sort(candidates, axis=1)
+    candidate_scores = np.take_along_axis(block, candidates, axis=1)
+
+    keep = candidate_scores > min_similarity
+    return keep.sum(axis=1), candidates[keep].astype(np.int32), candidate_scores[keep]
+
+
+# Normalized matrices of a similarity worker process, set once per worker by _init_block_worker
+_worker_matrices = None
+
+
+def _init_block_worker(normalized: sp.csr_matrix, normalized_t: sp.csr_matrix):
+    global _worker_matrices
+    _worker_matrices = (normalized, normalized_t)
+
+
+def _top_k_block_worker(start: int, end: int, top_k: int, min_similarity: float) -> tuple:
+    normalized, normalized_t = _worker_matrices
+    return top_k_block(normalized, normalized_t, start, end, top_k, min_similarity)
+
+
+def compute_item_neighbors(item_matrix: sp.csr_matrix, top_k: int = 50, min_similarity: float = 0.0,
+                           block_size: int = 512, dtype=np.float32, workers: int = 1) -> ItemNeighborStore:
+    """
+    Build the neighbor store from a quizzes x users rating matrix, one block of quizzes at a
+    time so the full items x items similarity matrix never exists at once.
+    top_k of 0 or None keeps every neighbor above min_similarity.
+    With workers > 1 (0 = one per CPU) the blocks are spread over a process pool. Each worker
+    holds one copy of the normalized matrix and one dense block at a time, and only the top-K of
+    each block comes back. Workers are spawned (forking a process with running threads is unsafe),
+    which costs a second or two, so this only pays off for large catalogs.
+    """
+    n_items = item_matrix.shape[0]
+    normalized = normalize_rows(item_matrix)
+    normalized_t = normalized.T.tocsr()
+
+    row_lengths, indices, scores = [], [], []
+
+    def collect(block_results):
+        # Keep only each block's top-K, as the blocks come in
+        for block_lengths, block_indices, block_scores in block_results:
+            row_lengths.append(block_lengths)
+            indices.append(block_indices)
+            scores.append(block_scores.astype(dtype))
+
+    blocks = [(start, min(start + block_size, n_items)) for start in range(0, n_items, block_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(blocks)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_block_worker, initargs=(normalized, normalized_t)) as executor:
+            starts, ends = zip(*blocks)
+            collect(executor.map(
+                _top_k_block_worker, starts, ends, [top_k] * len(blocks), [min_similarity] * len(blocks)
+            ))
+    else:
+        collect(top_k_block(normalized, normalized_t, start, end, top_k, min_similarity) for start, end in blocks)
+
+    row_lengths = np.concatenate(row_lengths) if row_lengths else np.array([], dtype=np.int64)
+    index_dtype = np.int32 if row_lengths.sum() < np.iinfo(np.int32).max else np.int64
+    indptr = np.zeros(n_items + 1, dtype=index_dtype)
+    np.cumsum(row_lengths, out=indptr[1:])
+
+    return ItemNeighborStore(
+        indptr=indptr,
+        indices=np.concatenate(indices) if indices else np.array([], dtype=np.int32),
+        scores=np.concatenate(scores) if scores else np.array([], dtype=dtype),
+        n_items=n_items
+    )
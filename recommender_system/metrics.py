@@ -0,0 +1,194 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond lookups to multi-second queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram for one label set
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Observations of the current request while a profiler captures them (None otherwise)
+_capture = contextvars.ContextVar('metrics_capture', default=None)
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics in the Prometheus text exposition format: labelled counters,
+    latency histograms and gauges read from callbacks at scrape time.
+    Recording is one dictionary lookup and an addition under a lock, so hooks can wrap hot
+    functions; set enabled to False to turn recording off.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        capture = _capture.get()
+        if capture is not None:
+            capture.append((name, labels, value))
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, callback, help_text: str = None, metric_type: str = 'gauge'):
+        """
+        Register a gauge whose value(s) are read from callback() at scrape time. The callback
+        returns a number or a {label tuple: number} dict, e.g. {(('cache', 'response'),): 0.5}.
+        Use metric_type='counter' for totals kept elsewhere (e.g. a component's own counters).
+        """
+        self._gauges[name] = (callback, metric_type)
+        if help_text:
+            self.describe(name, help_text)
+
+    @contextmanager
+    def capture(self):
+        """
+        Collect every observation made in this context (thread) as (name, labels, value) tuples,
+        even while recording is disabled
+        """
+        observations = []
+        token = _capture.set(observations)
+        try:
+            yield observations
+        finally:
+            _capture.reset(token)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Observe the duration of the with-block in the named histogram
+        """
+        if not self.enabled and _capture.get() is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """
+        Decorator version of timer()
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled and _capture.get() is None:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _format_labels(key: tuple, extra: tuple = ()) -> str:
+        pairs = []
+        for name, value in key + extra:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{name}="{value}"')
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _header(self, lines: list, name: str, metric_type: str):
+        if name in self._help:
+            lines.append(f'# HELP {name} {self._help[name]}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, 'counter')
+            for key, value in sorted(series.items()):
+                lines.append(f'{name}{self._format_labels(key)} {value}')
+
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, 'histogram')
+            for key, (buckets, counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{self._format_labels(key, (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{self._format_labels(key)} {total}')
+                lines.append(f'{name}_count{self._format_labels(key)} {count}')
+
+        for name, (callback, metric_type) in sorted(self._gauges.items()):
+            try:
+                values = callback()
+            except Exception:
+                continue
+            if values is None:
+                continue
+            self._header(lines, name, metric_type)
+            if not isinstance(values, dict):
+                values = {(): values}
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{self._format_labels(key)} {float(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by the recommender and its Flask endpoints
+metrics = MetricsRegistry()
+metrics.describe('recommender_requests_total', 'HTTP requests by endpoint, recommendation method and status')
+metrics.describe('recommender_request_seconds', 'HTTP request latency by endpoint and recommendation method')
+metrics.describe('recommender_stage_seconds', 'Request stage latency: db_query, scoring, enrichment, serialization')
+metrics.describe('recommender_function_seconds', 'Latency of instrumented recommender functions')
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from content_model import ContentModel
+from item_neighbors import ItemNeighborStore
+from popularity import PopularityLeaderboard
+from user_item_matrix import UserItemMatrix
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    Immutable bundle of every trained artifact a request reads: the user-item matrix, the item
+    neighbor store built from it, the KNN feature model and its nearest-neighbor index, the content
+    model and the popularity leaderboard.
+    Snapshots are never modified once published; an update builds a new one and swaps the
+    reference, so a request that holds a snapshot always sees one consistent model.
+    """
+    version: int = 0
+    # Bumped in this process when a snapshot swapped in from the model store is not newer than the
+    # served one (a rollback of CURRENT), so version-keyed caches still see it as a new model
+    generation: int = 0
+    built_at: datetime = None
+    user_item_matrix: UserItemMatrix = None
+    item_neighbors: ItemNeighborStore = None
+    knn_model: object = None
+    scaler: object = None
+    quiz_ids: list = None
+    quiz_features: object = None
+    feature_index: object = None
+    content_model: ContentModel = None
+    popularity: PopularityLeaderboard = None
+
+    @property
+    def cache_version(self) -> tuple:
+        """
+        Ordered key of this snapshot for caches: (generation, version)
+        """
+        return self.generation, self.version
+
+    def evolve(self, **artifacts) -> 'ModelSnapshot':
+        """
+        Return the next version with the given artifacts replaced and the rest carried over
+        """
+        return replace(self, version=self.version + 1, built_at=datetime.now(), **artifacts)
@@ -0,0 +1,347 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from ann_index import load_index, normalize_vectors
+from content_model import ContentModel
+from item_neighbors import ItemNeighborStore
+from model_snapshot import ModelSnapshot
+from popularity import PopularityLeaderboard
+from user_item_matrix import UserItemMatrix
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout changes; snapshots saved in another format are not loaded
+FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+TRAINER_LOCK_FILE = 'trainer.lock'
+
+
+def _plain(value):
+    """
+    JSON-serializable form of an id or board key (numpy scalars become Python numbers)
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class TrainerLock:
+    """
+    Exclusive, non-blocking lock on a model directory held by the one process that trains and
+    saves snapshots into it. The operating system releases it when the process exits.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, TRAINER_LOCK_FILE)
+        self._file = None
+
+    def acquire(self) -> bool:
+        """
+        Take the lock, or return False if another process holds it
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ModelStore:
+    """
+    Versioned on-disk copy of the served model snapshot, so a restarted process serves the last
+    good model right away instead of waiting for the first update.
+    Each snapshot is a directory of .npy arrays (loaded memory-mapped), an ids.json sidecar with
+    the quiz/student id maps and a meta.json manifest. CURRENT names the newest complete directory
+    and is replaced atomically, so a crash mid-save leaves the previous snapshot in place.
+    Only the keep_versions newest directories are kept.
+    """
+
+    def __init__(self, directory: str, keep_versions: int = 3):
+        self.directory = directory
+        self.keep_versions = max(keep_versions, 1)
+
+    def current_path(self) -> str:
+        """
+        Directory of the current snapshot, or None if nothing was saved yet
+        """
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE), encoding='utf-8') as current_file:
+                name = current_file.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if name and os.path.isdir(path) else None
+
+    def save(self, snapshot: ModelSnapshot) -> str:
+        """
+        Write the snapshot and make it the current one. Returns its directory.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        built_at = snapshot.built_at or datetime.now()
+        name = f"{built_at:%Y%m%d-%H%M%S}-v{snapshot.version:06d}"
+        temp_path = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(temp_path)
+
+        try:
+            meta = {
+                'format': FORMAT_VERSION,
+                'version': snapshot.version,
+                'built_at': built_at.isoformat()
+            }
+            ids = {}
+
+            def save_array(array_name, array):
+                np.save(os.path.join(temp_path, f"{array_name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+            def save_index(prefix, index):
+                # The index structure only; the vectors it searches are saved with their model
+                for array_name, array in index.arrays().items():
+                    save_array(f'{prefix}_{array_name}', array)
+                return dict(index.params(), recall_at_k=index.recall_at_k)
+
+            matrix = snapshot.user_item_matrix
+            if matrix is not None:
+                ratings = matrix.ratings
+                meta['user_item_matrix'] = {'shape': list(ratings.shape)}
+                save_array('ratings_data', ratings.data)
+                save_array('ratings_indices', ratings.indices)
+                save_array('ratings_indptr', ratings.indptr)
+                # Numeric student ids are memory-mapped, anything else goes to the sidecar
+                if matrix.user_ids.dtype.kind in 'iuf':
+                    save_array('user_ids', matrix.user_ids)
+                else:
+                    ids['user_ids'] = [_plain(user_id) for user_id in matrix.user_ids.tolist()]
+                ids['matrix_quiz_ids'] = [_plain(quiz_id) for quiz_id in matrix.quiz_ids.tolist()]
+
+            neighbors = snapshot.item_neighbors
+            if neighbors is not None:
+                meta['item_neighbors'] = {'n_items': neighbors.n_items}
+                save_array('neighbors_indptr', neighbors.indptr)
+                save_array('neighbors_indices', neighbors.indices)
+                save_array('neighbors_scores', neighbors.scores)
+                # The transpose used by batch scoring, so processes mapping the snapshot share it too
+                transposed = neighbors.matrix_t
+                save_array('neighbors_t_data', transposed.data)
+                save_array('neighbors_t_indices', transposed.indices)
+                save_array('neighbors_t_indptr', transposed.indptr)
+
+            if snapshot.knn_model is not None and snapshot.quiz_features is not None:
+                scaler = snapshot.scaler
+                meta['knn'] = {
+                    'n_neighbors': snapshot.knn_model.n_neighbors,
+                    'metric': snapshot.knn_model.metric,
+                    'feature_names': [str(name) for name in getattr(scaler, 'feature_names_in_', [])],
+                    'n_samples_seen': np.asarray(getattr(scaler, 'n_samples_seen_', 0)).tolist()
+                }
+                save_array('quiz_features', np.asarray(snapshot.quiz_features))
+                if scaler is not None:
+                    save_array('scaler_mean', scaler.mean_)
+                    save_array('scaler_scale', scaler.scale_)
+                    save_array('scaler_var', scaler.var_)
+                ids['knn_quiz_ids'] = [_plain(quiz_id) for quiz_id in snapshot.quiz_ids]
+                if snapshot.feature_index is not None:
+                    meta['knn']['index'] = save_index('feature_index', snapshot.feature_index)
+
+            content_model = snapshot.content_model
+            if content_model is not None:
+                vectors = content_model.vectors
+                meta['content_model'] = {
+                    'shape': list(vectors.shape),
+                    'clustered': content_model.cluster_labels is not None
+                }
+                save_array('content_data', vectors.data)
+                save_array('content_indices', vectors.indices)
+                save_array('content_indptr', vectors.indptr)
+                if content_model.cluster_labels is not None:
+                    save_array('cluster_labels', content_model.cluster_labels)
+                    save_array('cluster_centroids', content_model.cluster_centroids)
+                ids['content_quiz_ids'] = [_plain(quiz_id) for quiz_id in content_model.quiz_ids]
+                if content_model.index is not None:
+                    meta['content_model']['index'] = save_index('content_index', content_model.index)
+
+            popularity = snapshot.popularity
+            if popularity is not None:
+                meta['popularity'] = {}
+                save_array('popularity_scores', popularity.scores)
+                save_array('popularity_avg_ratings', popularity.avg_ratings)
+                save_array('popularity_counts', popularity.rating_counts)
+                # Each board family is stored as its keys plus concatenated positions with offsets
+                for board_name, boards in (('category', popularity.category_boards), ('level', popularity.level_boards)):
+                    keys = list(boards)
+                    positions = [np.asarray(boards[key], dtype=np.int64) for key in keys]
+                    meta['popularity'][f'{board_name}_keys'] = [_plain(key) for key in keys]
+                    save_array(f'{board_name}_board_offsets', np.cumsum([0] + [len(p) for p in positions]))
+                    save_array(f'{board_name}_board_positions',
+                               np.concatenate(positions) if positions else np.array([], dtype=np.int64))
+                ids['popularity_quiz_ids'] = [_plain(quiz_id) for quiz_id in popularity.quiz_ids.tolist()]
+
+            with open(os.path.join(temp_path, 'ids.json'), 'w', encoding='utf-8') as ids_file:
+                json.dump(ids, ids_file)
+            with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+                json.dump(meta, meta_file, indent=2)
+
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.rename(temp_path, path)
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+        # Point CURRENT at the new directory in one rename
+        current_temp = os.path.join(self.directory, f".{CURRENT_FILE}-{uuid.uuid4().hex}")
+        with open(current_temp, 'w', encoding='utf-8') as current_file:
+            current_file.write(name)
+        os.replace(current_temp, os.path.join(self.directory, CURRENT_FILE))
+
+        self._prune(keep=name)
+        logger.info(f"Saved model snapshot v{snapshot.version} to {path}")
+        return path
+
+    def _prune(self, keep: str):
+        """
+        Remove all but the keep_versions newest snapshot directories (never the current one)
+        """
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if not name.startswith('.') and os.path.isdir(os.path.join(self.directory, name))
+        )
+        for name in names[:-self.keep_versions]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def load(self, path: str = None, mmap: bool = True) -> ModelSnapshot:
+        """
+        Rebuild the snapshot saved in path (the current one by default), or return None if there is
+        none (or it has another format).
+        Arrays are memory-mapped read-only unless mmap is False; the KNN model is refit on the
+        stored features, which only indexes them, while the nearest-neighbor indexes are loaded as
+        saved (snapshots saved without them search exactly). The content model has no vectorizer, it is not
+        needed to serve requests and the next update replaces the model anyway.
+        """
+        path = path or self.current_path()
+        if path is None:
+            return None
+
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('format') != FORMAT_VERSION:
+            logger.warning(f"Ignoring model snapshot {path} saved in format {meta.get('format')}")
+            return None
+        with open(os.path.join(path, 'ids.json'), encoding='utf-8') as ids_file:
+            ids = json.load(ids_file)
+
+        def load_array(array_name):
+            array_path = os.path.join(path, f"{array_name}.npy")
+            try:
+                return np.load(array_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+            except ValueError:
+                # Empty arrays cannot be memory-mapped
+                return np.load(array_path, allow_pickle=False)
+
+        def load_saved_index(prefix, params, vectors):
+            array_names = [name[len(prefix) + 1:-4] for name in os.listdir(path)
+                           if name.startswith(f'{prefix}_') and name.endswith('.npy')]
+            return load_index(params, {name: load_array(f'{prefix}_{name}') for name in array_names}, vectors)
+
+        artifacts = {}
+
+        if 'user_item_matrix' in meta:
+            ratings = sp.csr_matrix(
+                (load_array('ratings_data'), load_array('ratings_indices'), load_array('ratings_indptr')),
+                shape=tuple(meta['user_item_matrix']['shape'])
+            )
+            user_ids = ids['user_ids'] if 'user_ids' in ids else load_array('user_ids')
+            artifacts['user_item_matrix'] = UserItemMatrix(ratings, user_ids, ids['matrix_quiz_ids'])
+
+        if 'item_neighbors' in meta:
+            n_items = meta['item_neighbors']['n_items']
+            matrix_t = sp.csr_matrix(
+                (load_array('neighbors_t_data'), load_array('neighbors_t_indices'), load_array('neighbors_t_indptr')),
+                shape=(n_items, n_items)
+            )
+            artifacts['item_neighbors'] = ItemNeighborStore(
+                load_array('neighbors_indptr'), load_array('neighbors_indices'),
+                load_array('neighbors_scores'), n_items, matrix_t=matrix_t
+            )
+
+        if 'knn' in meta:
+            knn_meta = meta['knn']
+            quiz_features = load_array('quiz_features')
+            knn_model = NearestNeighbors(n_neighbors=knn_meta['n_neighbors'], metric=knn_meta['metric'])
+            knn_model.fit(quiz_features)
+            scaler = None
+            if os.path.exists(os.path.join(path, 'scaler_mean.npy')):
+                scaler = StandardScaler()
+                scaler.mean_ = np.array(load_array('scaler_mean'))
+                scaler.scale_ = np.array(load_array('scaler_scale'))
+                scaler.var_ = np.array(load_array('scaler_var'))
+                scaler.n_features_in_ = len(scaler.mean_)
+                scaler.n_samples_seen_ = np.asarray(knn_meta['n_samples_seen'])
+                if knn_meta['feature_names']:
+                    scaler.feature_names_in_ = np.asarray(knn_meta['feature_names'], dtype=object)
+            feature_index = None
+            if 'index' in knn_meta:
+                feature_index = load_saved_index('feature_index', knn_meta['index'], normalize_vectors(quiz_features))
+            artifacts.update(knn_model=knn_model, scaler=scaler, quiz_ids=ids['knn_quiz_ids'],
+                             quiz_features=quiz_features, feature_index=feature_index)
+
+        if 'content_model' in meta:
+            content_meta = meta['content_model']
+            vectors = sp.csr_matrix(
+                (load_array('content_data'), load_array('content_indices'), load_array('content_indptr')),
+                shape=tuple(content_meta['shape'])
+            )
+            content_model = ContentModel(None, vectors, ids['content_quiz_ids'])
+            if content_meta['clustered']:
+                content_model.set_clusters(np.array(load_array('cluster_labels')),
+                                           np.array(load_array('cluster_centroids')))
+            if 'index' in content_meta:
+                content_model.index = load_saved_index('content_index', content_meta['index'], content_model.vectors)
+            artifacts['content_model'] = content_model
+
+        if 'popularity' in meta:
+            boards = {}
+            for board_name in ('category', 'level'):
+                offsets = load_array(f'{board_name}_board_offsets')
+                positions = load_array(f'{board_name}_board_positions')
+                boards[board_name] = {
+                    key: positions[offsets[i]:offsets[i + 1]]
+                    for i, key in enumerate(meta['popularity'][f'{board_name}_keys'])
+                }
+            artifacts['popularity'] = PopularityLeaderboard(
+                ids['popularity_quiz_ids'], load_array('popularity_scores'), load_array('popularity_avg_ratings'),
+                load_array('popularity_counts'), boards['category'], boards['level']
+            )
+
+        return ModelSnapshot(version=meta['version'], built_at=datetime.fromisoformat(meta['built_at']), **artifacts)
@@ -0,0 +1,110 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+class PlayHistoryIndex:
+    """
+    Quizzes each student has played (StudentQuizzes), kept in memory so content-based requests
+    exclude played quizzes without a database round trip.
+    Quiz ids are interned into an append-only code table and each student's history is a sorted
+    int32 array of codes. The first load reads the whole table; later refreshes only read rows
+    past the last seen Id, and every full_reload_every refreshes the index is rebuilt to pick up
+    deleted rows. Arrays are replaced, never modified, so readers need no lock.
+    """
+
+    PLAYED_QUERY = """
+        SELECT
+            sq.Id as student_quiz_id,
+            sq.StudentId as student_id,
+            sq.QuizId as quiz_id
+        FROM StudentQuizzes sq
+        WHERE sq.Id > :last_id
+        AND sq.Status IN ('Completed', 'Started', 'Exited', 'AutoSubmitted')
+    """
+
+    def __init__(self, engine, full_reload_every: int = 12):
+        self.engine = engine
+        self.full_reload_every = full_reload_every
+        self.last_id = None
+        self._refreshes_since_full_reload = 0
+        self._quiz_ids = []
+        self._quiz_codes = {}
+        self._played = {}
+        self._row_map = (None, 0, np.array([], dtype=np.int64))
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.last_id is not None
+
+    def refresh(self, full_reload: bool = False) -> int:
+        """
+        Merge StudentQuizzes rows added since the last refresh (or rebuild the index).
+        Returns the number of rows read.
+        """
+        with self._lock:
+            full_reload = (
+                full_reload or not self.loaded or
+                (self.full_reload_every and self._refreshes_since_full_reload >= self.full_reload_every)
+            )
+            last_id = 0 if full_reload else self.last_id
+            df = pd.read_sql(text(self.PLAYED_QUERY), self.engine, params={'last_id': int(last_id)})
+
+            played = {} if full_reload else dict(self._played)
+            if not df.empty:
+                codes = np.fromiter((self._intern(str(quiz_id)) for quiz_id in df['quiz_id']),
+                                    dtype=np.int32, count=len(df))
+                for student_id, group in pd.Series(codes).groupby(df['student_id'].to_numpy()):
+                    previous = played.get(student_id)
+                    new_codes = group.to_numpy(dtype=np.int32)
+                    played[student_id] = np.unique(new_codes if previous is None else np.concatenate([previous, new_codes]))
+                last_id = max(int(df['student_quiz_id'].max()), last_id)
+
+            self._played = played
+            self.last_id = last_id
+            self._refreshes_since_full_reload = 0 if full_reload else self._refreshes_since_full_reload + 1
+
+        logger.info(f"{'Loaded' if full_reload else 'Merged'} {len(df)} play history rows, "
+                    f"{len(played)} students, {len(self._quiz_ids)} quizzes")
+        return len(df)
+
+    def _intern(self, quiz_id: str) -> int:
+        code = self._quiz_codes.get(quiz_id)
+        if code is None:
+            code = len(self._quiz_ids)
+            self._quiz_ids.append(quiz_id)
+            self._quiz_codes[quiz_id] = code
+        return code
+
+    def played_codes(self, student_id) -> np.ndarray:
+        """
+        Sorted quiz codes the student has played (empty if none)
+        """
+        return self._played.get(student_id, np.array([], dtype=np.int32))
+
+    def played_quiz_ids(self, student_id) -> list:
+        return [self._quiz_ids[code] for code in self.played_codes(student_id)]
+
+    def content_rows(self, codes: np.ndarray, content_model) -> np.ndarray:
+        """
+        Row indices (ascending) of the played quizzes in the content model, skipping quizzes it
+        does not contain. The code -> row map is built once per content model and code table size.
+        """
+        if len(codes) == 0:
+            return np.array([], dtype=np.int64)
+
+        model, size, row_map = self._row_map
+        if model is not content_model or size <= codes[-1]:
+            size = len(self._quiz_ids)
+            row_map = np.fromiter((content_model.quiz_index.get(quiz_id, -1) for quiz_id in self._quiz_ids[:size]),
+                                  dtype=np.int64, count=size)
+            self._row_map = (content_model, size, row_map)
+
+        rows = row_map[codes]
+        return np.unique(rows[rows >= 0])
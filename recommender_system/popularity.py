@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+class PopularityLeaderboard:
+    """
+    Quizzes ranked by popularity (average rating, then rating count), built once per update from
+    the in-memory ratings so cold-start requests are served without touching the database.
+    Arrays are stored in ranked order; per-category and per-level boards are position arrays into them.
+    """
+
+    def __init__(self, quiz_ids, scores, avg_ratings, rating_counts, category_boards=None, level_boards=None):
+        self.quiz_ids = np.asarray(quiz_ids, dtype=object)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.avg_ratings = np.asarray(avg_ratings, dtype=np.float64)
+        self.rating_counts = np.asarray(rating_counts, dtype=np.int64)
+        self.category_boards = category_boards or {}
+        self.level_boards = level_boards or {}
+
+    @classmethod
+    def from_ratings(cls, ratings_df: pd.DataFrame, quiz_attributes: pd.DataFrame = None,
+                     prior_weight: float = 0.0) -> 'PopularityLeaderboard':
+        """
+        Rank quizzes from a (quiz_id, rating) DataFrame.
+        With prior_weight > 0 the score is the Bayesian average
+        (prior_weight * global mean + sum of ratings) / (prior_weight + count),
+        which keeps quizzes with one or two perfect ratings from topping the board.
+        quiz_attributes (quiz_id, category_id, level) enables the per-category and per-level boards.
+        """
+        if ratings_df is None or ratings_df.empty:
+            return cls([], [], [], [])
+
+        stats = ratings_df.assign(quiz_id=ratings_df['quiz_id'].astype(str)).groupby('quiz_id')['rating'].agg(['sum', 'count'])
+        rating_sums = stats['sum'].to_numpy(dtype=np.float64)
+        rating_counts = stats['count'].to_numpy(dtype=np.int64)
+        avg_ratings = rating_sums / rating_counts
+
+        if prior_weight > 0:
+            global_mean = rating_sums.sum() / rating_counts.sum()
+            scores = (prior_weight * global_mean + rating_sums) / (prior_weight + rating_counts)
+        else:
+            scores = avg_ratings
+
+        # Highest score first, then most ratings, then quiz id for a stable order
+        quiz_ids = stats.index.to_numpy(dtype=object)
+        order = np.lexsort((quiz_ids, -rating_counts, -scores))
+        quiz_ids = quiz_ids[order]
+
+        category_boards, level_boards = {}, {}
+        if quiz_attributes is not None and not quiz_attributes.empty:
+            attributes = quiz_attributes.assign(quiz_id=quiz_attributes['quiz_id'].astype(str)) \
+                .drop_duplicates('quiz_id').set_index('quiz_id').reindex(quiz_ids)
+            category_boards = cls._group_positions(attributes['category_id'])
+            level_boards = cls._group_positions(attributes['level'].str.lower())
+
+        return cls(quiz_ids, scores[order], avg_ratings[order], rating_counts[order], category_boards, level_boards)
+
+    @staticmethod
+    def _group_positions(values: pd.Series) -> dict:
+        """
+        {value: ranked positions (ascending)} for each non-null value
+        """
+        positions = pd.Series(np.arange(len(values)), index=values.to_numpy())
+        positions = positions[values.notna().to_numpy()]
+        return {key: group.to_numpy() for key, group in positions.groupby(level=0, sort=False)}
+
+    @property
+    def empty(self) -> bool:
+        return len(self.quiz_ids) == 0
+
+    def top(self, n: int, category_id=None, level: str = None) -> list:
+        """
+        Top n quizzes overall, or within a category and/or level
+        """
+        positions = None
+        if category_id is not None:
+            positions = self.category_boards.get(category_id, np.array([], dtype=np.int64))
+        if level is not None:
+            level_positions = self.level_boards.get(str(level).lower(), np.array([], dtype=np.int64))
+            positions = level_positions if positions is None else np.intersect1d(positions, level_positions)
+        if positions is None:
+            positions = np.arange(min(max(n, 0), len(self.quiz_ids)))
+        else:
+            positions = positions[:max(n, 0)]
+
+        return [{
+            'quiz_id': str(self.quiz_ids[pos]),
+            'predicted_rating': round(float(self.scores[pos]), 2),
+            'rating_count': int(self.rating_counts[pos]),
+            'method': 'popular'
+        } for pos in positions]
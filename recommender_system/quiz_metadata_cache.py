@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QuizMetadataCache:
+    """
+    In-process cache of quiz details keyed by quiz id, so response enrichment is a dictionary lookup.
+    The whole Quizzes table is preloaded during each model update when it changed (row count, newest
+    CreatedAt or a checksum of the served columns, since Quizzes has no UpdatedAt to catch in-place
+    edits) or the last preload is older than the TTL. Entries expire after ttl_seconds
+    and the least recently used ones are evicted beyond max_entries; misses are fetched in one
+    primary-key IN query.
+    """
+
+    DETAILS_QUERY = """
+        SELECT
+            Id as quiz_id,
+            Name as name,
+            Description as description,
+            CategoryId as category_id,
+            TotalQuestions as total_questions,
+            TimeInMinutes as time_in_minutes,
+            Level as level,
+            CreatedAt as created_at
+        FROM Quizzes
+    """
+
+    FETCH_CHUNK_SIZE = 1000
+
+    # SQL Server computes the checksum; other databases (SQLite has no CHECKSUM_AGG) read the whole
+    # table, hash the served columns here and reuse the rows for the preload
+    VERSION_QUERY = """
+        SELECT
+            COUNT(*) as quiz_count,
+            MAX(CreatedAt) as last_created_at,
+            CHECKSUM_AGG(BINARY_CHECKSUM(Id, Name, Description, CategoryId, TotalQuestions, TimeInMinutes, Level)) as checksum
+        FROM Quizzes
+    """
+
+    def __init__(self, engine, max_entries: int = 50000, ttl_seconds: float = 3600):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # {quiz key: (loaded_at, details or None for ids not in Quizzes)}, least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.preloaded_at = None
+        # Whether the database runs VERSION_QUERY (decided by dialect, so errors never switch it off)
+        self._server_checksum = engine.dialect.name == 'mssql'
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(quiz_id) -> str:
+        # GUIDs can come back in either case depending on the driver
+        return str(quiz_id).lower()
+
+    def _store(self, key: str, details, now: float):
+        self._entries[key] = (now, details)
+        self._entries.move_to_end(key)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load_version(self) -> tuple:
+        """
+        (row count, newest CreatedAt, checksum of the served columns) of Quizzes, used to tell
+        whether a preload is needed
+        """
+        if not self._server_checksum:
+            return self._details_version(self._load_details())
+        version_df = pd.read_sql(text(self.VERSION_QUERY), self.engine)
+        checksum = version_df['checksum'].iloc[0]
+        return (int(version_df['quiz_count'].iloc[0]), str(version_df['last_created_at'].iloc[0]),
+                None if pd.isna(checksum) else int(checksum))
+
+    def _load_details(self) -> pd.DataFrame:
+        return pd.read_sql(text(self.DETAILS_QUERY), self.engine)
+
+    @staticmethod
+    def _details_version(details: pd.DataFrame) -> tuple:
+        """
+        load_version() computed from the preloaded rows
+        """
+        served = details.drop(columns=['created_at']).astype(str)
+        # Order-independent: the sum of one hash per row (wrapping on overflow)
+        checksum = int(pd.util.hash_pandas_object(served, index=False).sum())
+        return len(details), str(details['created_at'].max()), checksum
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Preload every quiz if Quizzes changed since the last preload or the preload expired.
+        Returns True if the cache was reloaded. Database errors are raised; the next refresh retries.
+        """
+        quiz_df = None
+        if self._server_checksum:
+            version = self.load_version()
+        else:
+            quiz_df = self._load_details()
+            version = self._details_version(quiz_df)
+        expired = self.preloaded_at is None or time.monotonic() - self.preloaded_at > self.ttl_seconds
+        if not force and not expired and version == self.version:
+            return False
+
+        if quiz_df is None:
+            quiz_df = self._load_details()
+        rows = quiz_df.to_dict('records')
+        now = time.monotonic()
+        with self._lock:
+            self._entries.clear()
+            for details in rows:
+                self._store(self._key(details['quiz_id']), details, now)
+            self._evict()
+            self.version = version
+            self.preloaded_at = now
+        logger.info(f"Preloaded quiz metadata cache: {len(rows)} quizzes")
+        return True
+
+    def get_many(self, quiz_ids: list) -> dict:
+        """
+        {quiz_id: details or None} for the requested ids, fetching misses in one query
+        """
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for quiz_id in quiz_ids:
+                entry = self._entries.get(self._key(quiz_id))
+                if entry is not None and now - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(self._key(quiz_id))
+                    result[quiz_id] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(quiz_id)
+                    self.misses += 1
+
+        if missing:
+            fetched = self._fetch(missing)
+            if fetched is None:
+                # Database error: answer without details and retry on the next request
+                result.update({quiz_id: None for quiz_id in missing})
+                return result
+
+            with self._lock:
+                for quiz_id in missing:
+                    # Unknown ids are remembered as None so they do not hit the database on every request
+                    details = fetched.get(self._key(quiz_id))
+                    self._store(self._key(quiz_id), details, now)
+                    result[quiz_id] = details
+                self._evict()
+        return result
+
+    @metrics.timed('recommender_stage_seconds', stage='db_query')
+    def _fetch(self, quiz_ids: list) -> dict:
+        """
+        Load details for the given ids by primary key: {quiz key: details}, or None on a database error
+        """
+        query = text(self.DETAILS_QUERY + " WHERE Id IN :quiz_ids").bindparams(
+            bindparam('quiz_ids', expanding=True)
+        )
+        quiz_ids = [str(quiz_id) for quiz_id in quiz_ids]
+        fetched = {}
+        try:
+            # SQL Server allows about 2100 parameters per statement
+            for start in range(0, len(quiz_ids), self.FETCH_CHUNK_SIZE):
+                rows = pd.read_sql(query, self.engine, params={'quiz_ids': quiz_ids[start:start + self.FETCH_CHUNK_SIZE]})
+                fetched.update({self._key(details['quiz_id']): details for details in rows.to_dict('records')})
+        except Exception as e:
+            logger.error(f"Error fetching quiz details: {str(e)}")
+            return None
+        return fetched
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'version': list(self.version) if self.version else None
+        }
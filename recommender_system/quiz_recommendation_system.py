@@ -1,40 +1,271 @@
 import os
 import sys
+import contextlib
+import tempfile
 import threading
 import time
+import hmac
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import replace
 from datetime import datetime
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+import scipy.sparse as sp
 from sklearn.neighbors import NearestNeighbors
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sqlalchemy import create_engine, text
-from flask import Flask, jsonify, request, abort
+from flask import Flask, Response, g, jsonify, request, abort
 from flask_cors import CORS
 import logging
 from collections import defaultdict
+from user_item_matrix import UserItemMatrix
+from item_neighbors import compute_item_neighbors
+from ann_index import build_index, normalize_vectors, top_n_indices
+from recommendation_writer import RecommendationWriter
+from content_model import ContentModel
+from model_snapshot import ModelSnapshot
+from popularity import PopularityLeaderboard
+from quiz_metadata_cache import QuizMetadataCache
+from play_history import PlayHistoryIndex
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from metrics import metrics
+from update_trace import UpdateTrace, UpdateTraceLog
+from update_pipeline import UpdatePipeline
+from request_profiler import ProfileLog, ProfilerBusyError, RequestProfiler
+from model_store import ModelStore, TrainerLock
+from training_process import TrainingProcess
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def top_n_rows(scores: np.ndarray, n: int, candidate_mask: np.ndarray) -> list:
+    """
+    Row-wise top_n_indices for a (users x quizzes) score matrix, without a Python loop over rows.
+    Returns one index array per row, best first, ties broken by the lower index.
+    """
+    n_rows, n_items = scores.shape
+    k = min(n, n_items)
+    if k <= 0:
+        return [np.array([], dtype=np.int64) for _ in range(n_rows)]
+
+    masked = np.where(candidate_mask, scores, -np.inf)
+
+    # k-th best score per row, then everything above it plus the lowest-index ties to fill up to k
+    cutoff = -np.partition(-masked, k - 1, axis=1)[:, k - 1:k]
+    above = masked > cutoff
+    tied = (masked == cutoff) & np.isfinite(cutoff)
+    needed = k - above.sum(axis=1, keepdims=True)
+    keep = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+
+    rows, cols = np.nonzero(keep)
+    order = np.lexsort((cols, -masked[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    return np.split(cols, np.cumsum(np.bincount(rows, minlength=n_rows))[:-1])
+
+
 class QuizRecommendationSystem:
     """
     Recommendation system using Collaborative Filtering with KNN and Content-Based Filtering
     """
     
-    def __init__(self, connection_string: str, k_neighbors: int = 5):
+    def __init__(self, connection_string: str, k_neighbors: int = 5, full_reload_every: int = 12,
+                 similarity_top_k: int = 50, similarity_min_score: float = 0.0,
+                 similarity_dtype: str = 'float32', similarity_block_size: int = 512, similarity_workers: int = 1,
+                 batch_chunk_size: int = 256, materialize_recommendations: bool = True,
+                 materialize_top_n: int = 10, materialize_chunk_size: int = 500,
+                 cluster_minibatch_threshold: int = 5000, content_max_features: int = 200,
+                 popularity_prior_weight: float = 0.0, quiz_cache_max_entries: int = 50000,
+                 quiz_cache_ttl_seconds: float = 3600, response_cache_max_entries: int = 10000,
+                 response_cache_max_bytes: int = 64 * 1024 * 1024, single_flight_timeout: float = 30.0,
+                 update_trace_history: int = 50, update_trace_path: str = None,
+                 model_dir: str = None, model_keep_versions: int = 3, update_workers: int = 4,
+                 ann_method: str = 'ivf', ann_min_items: int = 5000, ann_probes: int = 8):
         self.connection_string = connection_string
         self.k_neighbors = k_neighbors
-        # Initialize engine
-        self.engine = create_engine(connection_string)
+        # Initialize engine (fast_executemany batches the RecommendedQuizzes inserts on SQL Server)
+        if connection_string.startswith('mssql+pyodbc'):
+            self.engine = create_engine(connection_string, fast_executemany=True)
+        else:
+            self.engine = create_engine(connection_string)
         
-        # Store user-item matrix and item similarity matrix
-        self.user_item_matrix = None
-        self.item_similarity_matrix = None
-        self.quiz_features = None
+        # Trained artifacts (user-item matrix, top-K item neighbors, KNN and content models) live in an
+        # immutable snapshot; updates build the next one off to the side and publish it with one swap
+        self.snapshot = ModelSnapshot()
+        self._publish_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        # One lazy content model build at a time (requests arriving before the first update)
+        self._content_build_lock = threading.Lock()
+        # Catalog size from which quizzes are clustered with MiniBatchKMeans (0 = always full KMeans)
+        self.cluster_minibatch_threshold = cluster_minibatch_threshold
+        # TF-IDF vocabulary size for the content vectors
+        self.content_max_features = content_max_features
+        # Bayesian prior weight for popularity scores (0 = plain average rating)
+        self.popularity_prior_weight = popularity_prior_weight
+        # Nearest-neighbor index over the content vectors and KNN features: 'ivf' (approximate) for
+        # catalogs of at least ann_min_items quizzes, searching ann_probes cells per query; 'exact' always scans
+        self.ann_method = ann_method
+        self.ann_min_items = ann_min_items
+        self.ann_probes = ann_probes
+
+        # Neighbor store settings: neighbors kept per quiz (0 = all), similarity floor,
+        # score dtype (float32 or float16), quizzes per similarity block and worker processes for
+        # the blocks (1 = in this process, 0 = one per CPU)
+        self.similarity_top_k = similarity_top_k
+        self.similarity_min_score = similarity_min_score
+        self.similarity_dtype = np.dtype(similarity_dtype)
+        self.similarity_block_size = similarity_block_size
+        self.similarity_workers = similarity_workers
+        # Users scored together per sparse product in batch recommendations
+        self.batch_chunk_size = batch_chunk_size
+
+        # Write-back of each user's top-N into RecommendedQuizzes after every model rebuild
+        self.materialize_recommendations_enabled = materialize_recommendations
+        self.materialize_top_n = materialize_top_n
+        self.recommendation_writer = RecommendationWriter(self.engine, chunk_size=materialize_chunk_size)
+        self._materialized_matrix = None
+
+        # Quiz details for response enrichment, preloaded on every update
+        self.quiz_metadata = QuizMetadataCache(
+            self.engine, max_entries=quiz_cache_max_entries, ttl_seconds=quiz_cache_ttl_seconds
+        )
+
+        # Responses per (user, method, n) for the served model version (0 entries disables)
+        self.response_cache = ResponseCache(max_entries=response_cache_max_entries, max_bytes=response_cache_max_bytes)
+        # Concurrent identical requests share one computation (waiters give up after the timeout)
+        self.single_flight = SingleFlight(timeout=single_flight_timeout)
+
+        # Quizzes each student has played, kept current by StudentQuizzes.Id watermark
+        self.play_history = PlayHistoryIndex(self.engine, full_reload_every=full_reload_every)
+
+        # In-memory rating store (one row per QuizFeedbacks.Id), kept current by delta loads
+        self.rating_store = None
+        self.last_feedback_id = None
+        self.last_feedback_created_on = None
+        # Force a full reload every N updates as a safety net (0 disables)
+        self.full_reload_every = full_reload_every
+        self._updates_since_full_reload = 0
+        # Threads running independent update stages (database reads, model fits) at the same time
+        self.update_workers = update_workers
+
+        # Traces of the last update runs (optionally appended to a JSON-lines file)
+        self.update_traces = UpdateTraceLog(max_traces=update_trace_history, jsonl_path=update_trace_path)
+
+        # Every published snapshot is saved here and loaded back on restart (None disables)
+        self.model_store = ModelStore(model_dir, keep_versions=model_keep_versions) if model_dir else None
+        # Directory of the saved snapshot being served, if it came from the model store
+        self._model_path = None
+        # Set in the training child process: the parent only sees saved snapshots, so a failed save
+        # fails the update, and the parent refreshes its own quiz details cache
+        self.training_child = False
         
         logger.info("Quiz Recommendation System initialized")
+
+    # Read-only views of the current snapshot
+    @property
+    def user_item_matrix(self) -> UserItemMatrix:
+        return self.snapshot.user_item_matrix
+
+    @property
+    def item_neighbors(self):
+        return self.snapshot.item_neighbors
+
+    @property
+    def knn_model(self):
+        return self.snapshot.knn_model
+
+    @property
+    def scaler(self):
+        return self.snapshot.scaler
+
+    @property
+    def quiz_ids(self) -> list:
+        return self.snapshot.quiz_ids
+
+    @property
+    def quiz_features(self):
+        return self.snapshot.quiz_features
+
+    @property
+    def content_model(self) -> ContentModel:
+        return self.snapshot.content_model
+
+    def publish_snapshot(self, **artifacts) -> ModelSnapshot:
+        """
+        Publish the next model snapshot with the given artifacts replaced (the others are carried
+        over from the current one). Requests see the new version as soon as the reference is swapped.
+        """
+        with self._publish_lock:
+            snapshot = self.snapshot.evolve(**artifacts)
+            self.snapshot = snapshot
+        logger.info(f"Published model snapshot v{snapshot.version}: {', '.join(sorted(artifacts)) or 'no changes'}")
+        return snapshot
+
+    def load_persisted_model(self) -> bool:
+        """
+        Serve the snapshot last saved to the model store until the first update publishes a fresh
+        one. Does nothing once a model has been published. Returns True if a snapshot was loaded.
+        """
+        if self.model_store is None:
+            return False
+        start = time.perf_counter()
+        try:
+            path = self.model_store.current_path()
+            snapshot = self.model_store.load(path) if path else None
+        except Exception as e:
+            logger.error(f"Error loading persisted model from {self.model_store.directory}: {str(e)}")
+            return False
+        if snapshot is None:
+            logger.info(f"No persisted model found in {self.model_store.directory}")
+            return False
+
+        with self._publish_lock:
+            if self.snapshot.version > 0:
+                return False
+            self.snapshot = snapshot
+            self._model_path = path
+        logger.info(f"Loaded persisted model snapshot v{snapshot.version} built at {snapshot.built_at} "
+                    f"in {time.perf_counter() - start:.3f}s")
+        return True
+
+    def reload_persisted_model(self) -> bool:
+        """
+        Swap in the model store's current snapshot if it is not the one being served (server role,
+        where a separate trainer process saves the snapshots). The play history and quiz details
+        are kept per process, so they are brought up to date at the same time.
+        Returns True if a new snapshot was swapped in.
+        """
+        if self.model_store is None:
+            return False
+        path = self.model_store.current_path()
+        if path is None or path == self._model_path:
+            return False
+        snapshot = self.model_store.load(path)
+        if snapshot is None:
+            return False
+
+        # Before the swap, so responses cached for the new version see the same history
+        if self.play_history.loaded:
+            try:
+                self.play_history.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing play history: {str(e)}")
+
+        with self._publish_lock:
+            generation = self.snapshot.generation
+            if snapshot.version <= self.snapshot.version:
+                generation += 1
+            self.snapshot = replace(snapshot, generation=generation)
+            self._model_path = path
+        logger.info(f"Reloaded model snapshot v{snapshot.version} from {path}")
+
+        try:
+            self.quiz_metadata.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing quiz metadata cache: {str(e)}")
+        return True
     
     def load_data(self):
         """
@@ -45,12 +276,13 @@ class QuizRecommendationSystem:
         # Query to get all quiz ratings with student and quiz IDs
         query = """
         SELECT 
+            rf.Id as feedback_id,
             rf.StudentId as student_id,
             rf.QuizId as quiz_id,
-            rf.Score as rating
+            rf.Score as rating,
+            rf.CreatedOn as created_on
         FROM QuizFeedbacks rf
         WHERE rf.Score IS NOT NULL
-        ORDER BY rf.StudentId, rf.QuizId
         """
         
         # Execute query and load data into DataFrame
@@ -64,56 +296,212 @@ class QuizRecommendationSystem:
         logger.info(f"Unique students: {df['student_id'].nunique()}, Unique quizzes: {df['quiz_id'].nunique()}")
         
         return df
+
+    def load_rating_deltas(self):
+        """
+        Load feedback rows added or edited since the last watermark.
+        Rows whose Score is NULL are returned too so removed ratings can be dropped.
+        """
+        # Edits go through the upsert in StudentQuizService, which bumps CreatedOn,
+        # so new rows are caught by Id and edited rows by CreatedOn. The CreatedOn
+        # bound is inclusive because merging is idempotent and timestamps can tie.
+        query = """
+        SELECT
+            rf.Id as feedback_id,
+            rf.StudentId as student_id,
+            rf.QuizId as quiz_id,
+            rf.Score as rating,
+            rf.CreatedOn as created_on
+        FROM QuizFeedbacks rf
+        WHERE rf.Id > :last_id OR rf.CreatedOn >= :last_created_on
+        """
+
+        delta_df = pd.read_sql(text(query), self.engine, params={
+            'last_id': int(self.last_feedback_id or 0),
+            'last_created_on': self.last_feedback_created_on or datetime(1900, 1, 1)
+        })
+
+        logger.info(f"Loaded {len(delta_df)} new or changed feedback rows since feedback Id {self.last_feedback_id}")
+        return delta_df
+
+    def refresh_ratings(self, full_reload: bool = False) -> tuple:
+        """
+        Bring the in-memory rating store up to date.
+        Returns (ratings DataFrame, whether the ratings changed).
+        """
+        needs_full_reload = (
+            full_reload or
+            self.rating_store is None or
+            (self.full_reload_every and self._updates_since_full_reload >= self.full_reload_every)
+        )
+        if needs_full_reload:
+            return self._full_reload_ratings(), True
+
+        changed = self._merge_rating_deltas(self.load_rating_deltas())
+
+        # Hard deletes and ratings cleared without touching CreatedOn are invisible to
+        # the watermark, so compare the store against a cheap aggregate over the table
+        if self._detect_rating_drift():
+            logger.warning("Rating store drifted from the database, falling back to a full reload")
+            return self._full_reload_ratings(), True
+
+        self._updates_since_full_reload += 1
+        return self.get_ratings_frame(), changed
+
+    def get_ratings_frame(self) -> pd.DataFrame:
+        """
+        Return the rating store in the (student_id, quiz_id, rating) shape used for matrix building
+        """
+        if self.rating_store is None or self.rating_store.empty:
+            return pd.DataFrame()
+        return self.rating_store[['student_id', 'quiz_id', 'rating']].reset_index(drop=True)
+
+    def _full_reload_ratings(self) -> pd.DataFrame:
+        """
+        Replace the rating store with a full read of QuizFeedbacks and reset the watermarks
+        """
+        df = self.load_data()
+        self.rating_store = pd.DataFrame(columns=['student_id', 'quiz_id', 'rating'])
+        self.rating_store.index.name = 'feedback_id'
+        self.last_feedback_id = None
+        self.last_feedback_created_on = None
+        self._updates_since_full_reload = 0
+
+        if not df.empty:
+            self._merge_rating_deltas(df)
+
+        return self.get_ratings_frame()
+
+    def _merge_rating_deltas(self, delta_df: pd.DataFrame) -> bool:
+        """
+        Upsert scored rows into the rating store, drop rows whose score was cleared,
+        and advance the watermarks. Returns True if the store contents changed.
+        """
+        if delta_df.empty:
+            return False
+
+        delta_df = delta_df.copy()
+        delta_df['quiz_id'] = delta_df['quiz_id'].astype(str)
+        delta_df['created_on'] = pd.to_datetime(delta_df['created_on'], errors='coerce')
+        delta_df = delta_df.drop_duplicates('feedback_id', keep='last').set_index('feedback_id')
+
+        scored = delta_df.loc[delta_df['rating'].notna(), ['student_id', 'quiz_id', 'rating']]
+        cleared_ids = delta_df.index[delta_df['rating'].isna()]
+
+        existing = self.rating_store.reindex(scored.index)
+        upserted_count = int((
+            existing['rating'].isna() |
+            (existing['rating'] != scored['rating']) |
+            (existing['student_id'] != scored['student_id']) |
+            (existing['quiz_id'] != scored['quiz_id'])
+        ).sum())
+        removed_count = int(self.rating_store.index.isin(cleared_ids).sum())
+        changed = upserted_count > 0 or removed_count > 0
+
+        if changed:
+            untouched = self.rating_store.drop(index=delta_df.index, errors='ignore')
+            self.rating_store = pd.concat([untouched, scored]) if not untouched.empty else scored.copy()
+            self.rating_store.index.name = 'feedback_id'
+
+        # Advance the watermarks
+        max_id = int(delta_df.index.max())
+        self.last_feedback_id = max(max_id, self.last_feedback_id or 0)
+        max_created_on = delta_df['created_on'].max()
+        if pd.notna(max_created_on):
+            max_created_on = max_created_on.to_pydatetime()
+            if self.last_feedback_created_on is None or max_created_on > self.last_feedback_created_on:
+                self.last_feedback_created_on = max_created_on
+
+        if changed:
+            logger.info(f"Merged rating deltas: {upserted_count} added or edited, {removed_count} removed, "
+                        f"{len(self.rating_store)} ratings in store")
+        return changed
+
+    def _detect_rating_drift(self) -> bool:
+        """
+        Compare the rating count and score sum in the store with the database
+        """
+        if self.last_feedback_id is None:
+            return False
+
+        # Bound by the watermark so rows inserted after the delta query don't count as drift
+        query = """
+        SELECT
+            COUNT(rf.Score) as rating_count,
+            COALESCE(SUM(rf.Score), 0) as score_sum
+        FROM QuizFeedbacks rf
+        WHERE rf.Score IS NOT NULL AND rf.Id <= :last_id
+        """
+
+        try:
+            check_df = pd.read_sql(text(query), self.engine, params={'last_id': int(self.last_feedback_id)})
+        except Exception as e:
+            logger.error(f"Error checking rating store drift: {str(e)}")
+            return True
+
+        db_count = int(check_df['rating_count'].iloc[0])
+        db_sum = float(check_df['score_sum'].iloc[0])
+        store_count = len(self.rating_store)
+        store_sum = float(self.rating_store['rating'].sum()) if store_count else 0.0
+
+        if db_count != store_count or abs(db_sum - store_sum) > 1e-6:
+            logger.info(f"Rating drift detected: database has {db_count} ratings (sum {db_sum}), "
+                        f"store has {store_count} (sum {store_sum})")
+            return True
+        return False
     
-    def build_user_item_matrix(self, df):
+    def build_user_item_matrix(self, df, publish: bool = True) -> UserItemMatrix:
         """
-        Build user-item matrix for collaborative filtering
+        Build sparse user-item matrix for collaborative filtering.
+        With publish=True it replaces the served matrix right away (dropping the item neighbors,
+        which belong to the previous matrix); update_recommendations publishes all artifacts together.
         """
-        if df.empty:
-            self.user_item_matrix = pd.DataFrame()
-            return
+        # Sparse CSR ratings with int32 row/column maps (see user_item_matrix.py)
+        user_item_matrix = UserItemMatrix.from_ratings(df)
         
-        # Create pivot table for user-item matrix
-        self.user_item_matrix = df.pivot_table(
-            index='student_id',
-            columns='quiz_id',
-            values='rating',
-            fill_value=0
-        )
+        logger.info(f"Built user-item matrix: {user_item_matrix.shape} with {user_item_matrix.nnz} ratings")
         
-        logger.info(f"Built user-item matrix: {self.user_item_matrix.shape}")
+        if publish:
+            self.publish_snapshot(user_item_matrix=user_item_matrix, item_neighbors=None)
+        return user_item_matrix
         
-    def compute_item_similarity(self):
+    def compute_item_similarity(self, user_item_matrix: UserItemMatrix = None, publish: bool = True):
         """
-        Compute item-to-item similarity matrix using cosine similarity
+        Compute the top-K item-to-item neighbors using cosine similarity
+        (for the served user-item matrix unless one is given)
         """
-        if self.user_item_matrix is None or self.user_item_matrix.empty:
+        if user_item_matrix is None:
+            user_item_matrix = self.snapshot.user_item_matrix
+        if user_item_matrix is None or user_item_matrix.empty:
             logger.warning("User-item matrix is empty, cannot compute similarity")
-            return
+            return None
         
-        # Transpose the user-item matrix so items become rows
-        item_matrix = self.user_item_matrix.T  # Shape: (num_items, num_users)
+        # Sparse item matrix so quizzes become rows
+        item_matrix = user_item_matrix.item_matrix  # Shape: (num_items, num_users)
         
-        # Calculate cosine similarity between items
+        # Calculate cosine similarity block by block, keeping only the top-K neighbors per quiz
+        # (indexed by user_item_matrix.quiz_index)
         logger.info("Computing item similarities using cosine similarity...")
-        self.item_similarity_matrix = cosine_similarity(item_matrix)
-        
-        # Convert to DataFrame with quiz IDs as index/columns
-        self.item_similarity_matrix = pd.DataFrame(
-            self.item_similarity_matrix,
-            index=self.user_item_matrix.columns,
-            columns=self.user_item_matrix.columns
+        item_neighbors = compute_item_neighbors(
+            item_matrix,
+            top_k=self.similarity_top_k,
+            min_similarity=self.similarity_min_score,
+            block_size=self.similarity_block_size,
+            dtype=self.similarity_dtype,
+            workers=self.similarity_workers
         )
         
-        logger.info(f"Computed item similarity matrix: {self.item_similarity_matrix.shape}")
+        logger.info(f"Computed item neighbors: {item_neighbors.nnz} pairs for {item_neighbors.n_items} quizzes "
+                    f"({item_neighbors.nbytes / 1024:.1f} KB)")
+        
+        if publish:
+            self.publish_snapshot(user_item_matrix=user_item_matrix, item_neighbors=item_neighbors)
+        return item_neighbors
     
-    def fit_knn_model(self, df):
+    def load_quiz_features(self) -> pd.DataFrame:
         """
-        Train KNN model on the quiz features for enhanced recommendations
+        Load every quiz with its attributes and rating aggregates, the input of the KNN model
         """
-        if df.empty:
-            return
-
         # Get unique quizzes with their features - using the correct table name 'Quizzes'
         # Primary query for SQL Server (with CAST for GUID handling)
         quiz_query = """
@@ -153,11 +541,23 @@ class QuizRecommendationSystem:
             except Exception as e:
                 logger.error(f"Failed to load quiz data: {str(e)}")
                 quiz_df = pd.DataFrame(columns=['quiz_id', 'category_id', 'TotalQuestions', 'TimeInMinutes', 'Level', 'avg_rating', 'rating_count'])
+        return quiz_df
+
+    def fit_knn_model(self, df, publish: bool = True, quiz_df: pd.DataFrame = None) -> dict:
+        """
+        Train KNN model on the quiz features for enhanced recommendations
+        (loaded with load_quiz_features() unless quiz_df is given).
+        Returns the KNN artifacts (knn_model, scaler, quiz_ids, quiz_features), or None if there is no quiz data.
+        """
+        if df.empty:
+            return None
+        if quiz_df is None:
+            quiz_df = self.load_quiz_features()
 
         # Only continue if we have quiz data
         if quiz_df.empty:
             logger.warning("No quiz data found for KNN model")
-            return
+            return None
 
         # Prepare features for KNN
         features_df = quiz_df.copy()
@@ -172,77 +572,66 @@ class QuizRecommendationSystem:
 
         # Normalize features
         from sklearn.preprocessing import StandardScaler
-        self.scaler = StandardScaler()
-        features_scaled = self.scaler.fit_transform(features_df)
+        scaler = StandardScaler()
+        features_scaled = scaler.fit_transform(features_df)
 
         # Fit KNN model
         n_neighbors = min(self.k_neighbors, len(features_df))
         if n_neighbors < 2:
             n_neighbors = 2  # Need at least 2 neighbors for KNN to work properly
 
-        self.knn_model = NearestNeighbors(n_neighbors=n_neighbors, metric='cosine')
-        self.knn_model.fit(features_scaled)
+        knn_model = NearestNeighbors(n_neighbors=n_neighbors, metric='cosine')
+        knn_model.fit(features_scaled)
+
+        # Cosine index over the unit-length features, used instead of the brute-force KNN when approximate
+        feature_index = build_index(normalize_vectors(features_scaled), method=self.ann_method,
+                                    min_items=self.ann_min_items, n_probe=self.ann_probes)
+
+        # Keep quiz IDs for reference
+        knn_artifacts = {
+            'knn_model': knn_model,
+            'scaler': scaler,
+            'quiz_ids': quiz_df['quiz_id'].tolist(),
+            'quiz_features': features_scaled,
+            'feature_index': feature_index
+        }
 
-        # Store quiz IDs for reference
-        self.quiz_ids = quiz_df['quiz_id'].tolist()
-        self.quiz_features = features_scaled
+        logger.info(f"Trained KNN model with {len(knn_artifacts['quiz_ids'])} quizzes")
 
-        logger.info(f"Trained KNN model with {len(self.quiz_ids)} quizzes")
+        if publish:
+            self.publish_snapshot(**knn_artifacts)
+        return knn_artifacts
 
-    def recommend_for_user(self, user_id: int, n_recommendations: int = 5) -> list:
+    @metrics.timed('recommender_function_seconds', function='recommend_for_user')
+    def recommend_for_user(self, user_id: int, n_recommendations: int = 5, snapshot: ModelSnapshot = None) -> list:
         """
         Recommend quizzes for a specific user using Item-Based CF + KNN
         """
-        if self.user_item_matrix is None or self.user_item_matrix.empty:
+        snapshot = self.snapshot if snapshot is None else snapshot
+        user_item_matrix = snapshot.user_item_matrix
+        if user_item_matrix is None or user_item_matrix.empty:
             logger.warning("No user-item matrix available for recommendations")
             return []
         
-        if user_id not in self.user_item_matrix.index:
+        if user_id not in user_item_matrix.user_index:
             logger.info(f"User {user_id} not found in the dataset, returning popular quizzes")
-            return self.get_popular_quizzes(n_recommendations)
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
         
-        # Get user's ratings
-        user_ratings = self.user_item_matrix.loc[user_id]
-        
-        # Find rated quizzes
-        rated_mask = user_ratings != 0
-        rated_quiz_ids = user_ratings[rated_mask].index.tolist()
+        # Get user's ratings straight from the sparse row
+        rated_indices, rated_values = user_item_matrix.user_ratings(user_id)
+        rated_values = rated_values.astype(np.float64)
         
         # If user has not rated anything, return popular quizzes
-        if not rated_quiz_ids:
+        if len(rated_indices) == 0:
             logger.info(f"User {user_id} has not rated any quizzes, returning popular quizzes")
-            return self.get_popular_quizzes(n_recommendations)
-        
-        # Calculate predicted ratings for unrated quizzes
-        recommendations = {}
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
         
-        for quiz_id in self.user_item_matrix.columns:
-            if user_ratings[quiz_id] == 0:  # Only for unrated quizzes
-                # Get similar items
-                if self.item_similarity_matrix is not None:
-                    similar_items = self.item_similarity_matrix[quiz_id].sort_values(ascending=False)
-                    
-                    # Calculate weighted sum of ratings from similar items user has rated
-                    weighted_sum = 0
-                    similarity_sum = 0
-                    
-                    for sim_item_id in similar_items.index:
-                        if sim_item_id in rated_quiz_ids:
-                            similarity_score = similar_items[sim_item_id]
-                            user_rating = user_ratings[sim_item_id]
-                            
-                            weighted_sum += similarity_score * user_rating
-                            similarity_sum += abs(similarity_score)
-                    
-                    if similarity_sum > 0:
-                        predicted_rating = weighted_sum / similarity_sum
-                        recommendations[quiz_id] = predicted_rating
+        # Predict every unrated quiz at once and keep the top N
+        predicted_ratings, has_prediction = self.predict_ratings(rated_indices, rated_values, snapshot)
+        top_indices = top_n_indices(predicted_ratings, n_recommendations, has_prediction)
         
-        # Sort recommendations by predicted rating
-        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-        
-        # Take top N recommendations
-        top_recommendations = sorted_recommendations[:min(n_recommendations, len(sorted_recommendations))]
+        quiz_ids = user_item_matrix.quiz_ids
+        top_recommendations = [(quiz_ids[idx], float(predicted_ratings[idx])) for idx in top_indices]
         
         final_recommendations = []
         for quiz_id, predicted_rating in top_recommendations:
@@ -262,9 +651,138 @@ class QuizRecommendationSystem:
         print(f"Generated {len(final_recommendations)} recommendations for user {user_id}: {recommended_quiz_ids}")
         return final_recommendations
     
-    def get_popular_quizzes(self, n_recommendations: int = 5) -> list:
+    def predict_ratings(self, rated_indices: np.ndarray, rated_values: np.ndarray,
+                        snapshot: ModelSnapshot = None) -> tuple:
+        """
+        Item-based CF prediction for all quizzes of one user:
+        sum(similarity * rating) / sum(|similarity|) over the quizzes the user rated.
+        Returns (predicted ratings, mask of unrated quizzes that have a prediction).
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        item_neighbors = snapshot.item_neighbors
+        n_items = snapshot.user_item_matrix.shape[1]
+        if item_neighbors is None or len(rated_indices) == 0:
+            return np.zeros(n_items), np.zeros(n_items, dtype=bool)
+
+        rating_vector = np.zeros(n_items)
+        rating_vector[rated_indices] = rated_values
+        rated_mask = np.zeros(n_items)
+        rated_mask[rated_indices] = 1.0
+
+        # Similarity matrix x rating vector and |similarity| x rated mask over the stored neighbors
+        weighted_sum = item_neighbors.matrix @ rating_vector
+        similarity_sum = item_neighbors.abs_matrix @ rated_mask
+
+        has_prediction = similarity_sum > 0
+        has_prediction[rated_indices] = False  # Only for unrated quizzes
+
+        predicted_ratings = np.zeros(n_items)
+        np.divide(weighted_sum, similarity_sum, out=predicted_ratings, where=has_prediction)
+        return predicted_ratings, has_prediction
+
+    def predict_ratings_batch(self, rows: np.ndarray, snapshot: ModelSnapshot = None) -> tuple:
+        """
+        predict_ratings for several users (rows of the user-item matrix) at once:
+        one sparse (users x quizzes) x (quizzes x quizzes) product for the weighted sums
+        and one for the similarity sums.
+        Returns (predicted ratings, mask of unrated quizzes that have a prediction), both users x quizzes.
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        item_neighbors = snapshot.item_neighbors
+        ratings = snapshot.user_item_matrix.ratings[rows].astype(np.float64)
+        rated_mask = ratings.copy()
+        rated_mask.data[:] = 1.0
+
+        # Row i of the neighbor matrix holds quiz i's neighbors, so multiply by its transpose
+        weighted_sum = (ratings @ item_neighbors.matrix_t).toarray()
+        similarity_sum = (rated_mask @ item_neighbors.abs_matrix_t).toarray()
+
+        has_prediction = similarity_sum > 0
+        has_prediction[rated_mask.nonzero()] = False  # Only for unrated quizzes
+
+        predicted_ratings = np.zeros(weighted_sum.shape)
+        np.divide(weighted_sum, similarity_sum, out=predicted_ratings, where=has_prediction)
+        return predicted_ratings, has_prediction
+
+    @metrics.timed('recommender_function_seconds', function='recommend_for_users')
+    def recommend_for_users(self, user_ids: list, n_recommendations: int = 5, snapshot: ModelSnapshot = None) -> dict:
+        """
+        Batch version of recommend_for_user: {user_id: recommendations}.
+        Users are scored batch_chunk_size at a time with sparse matrix products.
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        user_item_matrix = snapshot.user_item_matrix
+        if user_item_matrix is None or user_item_matrix.empty:
+            logger.warning("No user-item matrix available for recommendations")
+            return {user_id: [] for user_id in user_ids}
+
+        results = {}
+        popular = None
+        known_users = []
+        for user_id in user_ids:
+            if user_id in user_item_matrix.user_index:
+                known_users.append(user_id)
+            else:
+                # Unknown users get the popular quizzes, fetched once for the whole batch
+                if popular is None:
+                    popular = self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
+                results[user_id] = [dict(rec) for rec in popular]
+
+        if snapshot.item_neighbors is None:
+            results.update({user_id: [] for user_id in known_users})
+            return results
+
+        quiz_ids = user_item_matrix.quiz_ids
+        for start in range(0, len(known_users), self.batch_chunk_size):
+            chunk = known_users[start:start + self.batch_chunk_size]
+            rows = np.array([user_item_matrix.user_index[user_id] for user_id in chunk])
+
+            predicted_ratings, has_prediction = self.predict_ratings_batch(rows, snapshot)
+            top_indices = top_n_rows(predicted_ratings, n_recommendations, has_prediction)
+
+            for i, user_id in enumerate(chunk):
+                results[user_id] = [{
+                    'quiz_id': str(quiz_ids[idx]),
+                    'predicted_rating': round(float(predicted_ratings[i, idx]), 2)
+                } for idx in top_indices[i]]
+
+        logger.info(f"Generated batch CF recommendations for {len(user_ids)} users "
+                    f"({len(known_users)} scored, {len(user_ids) - len(known_users)} popular)")
+        return results
+
+    @metrics.timed('recommender_function_seconds', function='get_popular_quizzes')
+    def get_popular_quizzes(self, n_recommendations: int = 5, category_id: int = None, level: str = None,
+                            snapshot: ModelSnapshot = None) -> list:
         """
-        Get popular quizzes based on average rating and number of ratings
+        Get popular quizzes based on average rating and number of ratings,
+        optionally within a category and/or level
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        popularity = snapshot.popularity
+        if popularity is not None:
+            # Slice of the leaderboard built during the last update, no database call
+            recommendations = popularity.top(n_recommendations, category_id=category_id, level=level)
+        elif category_id is None and level is None:
+            recommendations = self._query_popular_quizzes(n_recommendations)
+        else:
+            logger.warning("Popularity leaderboard not built yet, no category/level popular quizzes available")
+            recommendations = []
+
+        # Print the predicted ratings for popular quizzes
+        print(f"\nPopular Quizzes Recommendations:")
+        for i, rec in enumerate(recommendations, 1):
+            print(f"  {i}. Quiz ID: {rec['quiz_id']} | Predicted Rating: {rec['predicted_rating']} | Rating Count: {rec.get('rating_count', 0)}")
+
+        # Log the popular quiz IDs
+        popular_quiz_ids = [rec['quiz_id'] for rec in recommendations]
+        logger.info(f"Popular quizzes recommended: {popular_quiz_ids}")
+        print(f"Popular quiz IDs from database: {popular_quiz_ids}")
+        return recommendations
+
+    @metrics.timed('recommender_stage_seconds', stage='db_query')
+    def _query_popular_quizzes(self, n_recommendations: int) -> list:
+        """
+        Popular quizzes straight from the database, used before the first leaderboard is built
         """
         # Query to get quiz popularity metrics
         query = """
@@ -293,17 +811,40 @@ class QuizRecommendationSystem:
                 'rating_count': int(row['rating_count']),
                 'method': 'popular'  # Add method field for consistency
             })
+        return recommendations
 
-        # Print the predicted ratings for popular quizzes
-        print(f"\nPopular Quizzes Recommendations:")
-        for i, rec in enumerate(recommendations, 1):
-            print(f"  {i}. Quiz ID: {rec['quiz_id']} | Predicted Rating: {rec['predicted_rating']} | Rating Count: {rec.get('rating_count', 0)}")
+    def get_quiz_attributes(self) -> pd.DataFrame:
+        """
+        Category and level of every quiz, for the per-category and per-level leaderboards
+        """
+        query = """
+        SELECT
+            q.Id as quiz_id,
+            q.CategoryId as category_id,
+            q.Level as level
+        FROM Quizzes q
+        """
 
-        # Log the popular quiz IDs
-        popular_quiz_ids = [rec['quiz_id'] for rec in recommendations]
-        logger.info(f"Popular quizzes recommended: {popular_quiz_ids}")
-        print(f"Popular quiz IDs from database: {popular_quiz_ids}")
-        return recommendations
+        try:
+            return pd.read_sql(text(query), self.engine)
+        except Exception as e:
+            logger.error(f"Error loading quiz attributes: {str(e)}")
+            return pd.DataFrame()
+
+    def build_popularity(self, df, publish: bool = True, quiz_attributes: pd.DataFrame = None) -> PopularityLeaderboard:
+        """
+        Rank quizzes by popularity from the rating frame (overall, per category and per level)
+        """
+        if quiz_attributes is None:
+            quiz_attributes = self.get_quiz_attributes()
+        popularity = PopularityLeaderboard.from_ratings(
+            df, quiz_attributes, prior_weight=self.popularity_prior_weight
+        )
+        logger.info(f"Built popularity leaderboard: {len(popularity.quiz_ids)} quizzes, "
+                    f"{len(popularity.category_boards)} categories, {len(popularity.level_boards)} levels")
+        if publish:
+            self.publish_snapshot(popularity=popularity)
+        return popularity
 
     def get_quiz_details(self, quiz_ids):
         """
@@ -311,71 +852,350 @@ class QuizRecommendationSystem:
         """
         if not quiz_ids:
             return []
+        return [details for details in self.get_quiz_details_map(quiz_ids).values() if details is not None]
 
-        # Create parameterized query to get quiz details
-        placeholders = ','.join([f"'{qid}'" for qid in quiz_ids])
-        query = f"""
-        SELECT
-            Id as quiz_id,
-            Name as name,
-            Description as description,
-            CategoryId as category_id,
-            TotalQuestions as total_questions,
-            TimeInMinutes as time_in_minutes,
-            Level as level,
-            CreatedAt as created_at
-        FROM Quizzes
-        WHERE CAST(Id AS VARCHAR(MAX)) IN ({placeholders})
+    def get_quiz_details_map(self, quiz_ids) -> dict:
         """
-
-        try:
-            quiz_details_df = pd.read_sql(query, self.engine)
-            return quiz_details_df.to_dict('records')
-        except Exception as e:
-            logger.error(f"Error fetching quiz details: {str(e)}")
-            return []
+        {quiz_id: details or None} from the quiz metadata cache
+        """
+        if not quiz_ids:
+            return {}
+        return self.quiz_metadata.get_many(list(dict.fromkeys(quiz_ids)))
     
-    def update_recommendations(self):
+    def update_recommendations(self, full_reload: bool = False):
         """
-        Update the recommendation system with latest data
+        Update the recommendation system with latest data.
+        All artifacts are rebuilt off to the side and published as one new snapshot.
+        Each run is recorded as an UpdateTrace (stage durations and data volumes) in update_traces.
         """
-        logger.info("Updating recommendation system...")
+        with self._update_lock:
+            logger.info("Updating recommendation system...")
+            trace = UpdateTrace(full_reload=full_reload)
+            error = None
+            try:
+                self._run_update(trace, full_reload)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                trace.finish(self.snapshot.version, error)
+                self.update_traces.add(trace)
+                logger.info(trace.summary())
+
+    def _run_update(self, trace: UpdateTrace, full_reload: bool):
+        # Independent database reads run concurrently, then each fit as soon as its inputs are loaded:
+        #   load -> matrix -> similarity; load + quiz attributes -> popularity;
+        #   load + quiz features -> knn; quizzes + categories -> content; play history
+        pipeline = UpdatePipeline(trace, max_workers=self.update_workers)
+
+        def load_ratings(stage):
+            # Merge rating changes since the last update (or reload everything)
+            df, ratings_changed = self.refresh_ratings(full_reload=full_reload)
+            stage.update(rows=len(df), ratings_changed=ratings_changed)
+            return df, ratings_changed
+
+        def load_quiz_features(stage):
+            quiz_df = self.load_quiz_features()
+            stage['rows'] = len(quiz_df)
+            return quiz_df
+
+        def load_quiz_attributes(stage):
+            quiz_attributes = self.get_quiz_attributes()
+            stage['rows'] = len(quiz_attributes)
+            return quiz_attributes
+
+        def load_quiz_content(stage):
+            quizzes_df = self.get_all_quizzes_with_content()
+            stage['rows'] = len(quizzes_df)
+            return quizzes_df
+
+        def load_quiz_categories(stage):
+            quiz_categories = self.get_all_quiz_categories()
+            stage['quizzes'] = len(quiz_categories)
+            return quiz_categories
+
+        def refresh_play_history(stage):
+            # Merge new StudentQuizzes rows (before publishing, so responses cached for the new
+            # version see the same history)
+            stage['rows'] = self.play_history.refresh(full_reload=full_reload)
+
+        def has_ratings(load, **inputs):
+            return not load[0].empty
+
+        def needs_rebuild(load):
+            df, ratings_changed = load
+            if df.empty:
+                return False
+            if not ratings_changed and self.snapshot.user_item_matrix is not None:
+                logger.info("No rating changes since last update, keeping user-item matrix and similarities")
+                return False
+            return True
+
+        def build_matrix(stage, load):
+            user_item_matrix = self.build_user_item_matrix(load[0], publish=False)
+            stage.update(users=user_item_matrix.shape[0], quizzes=user_item_matrix.shape[1],
+                         nnz=user_item_matrix.nnz)
+            return user_item_matrix
+
+        def compute_similarity(stage, matrix):
+            item_neighbors = self.compute_item_similarity(matrix, publish=False)
+            stage.update(quizzes=item_neighbors.n_items, neighbors=item_neighbors.nnz,
+                         bytes=item_neighbors.nbytes)
+            return item_neighbors
+
+        def build_popularity(stage, load, load_quiz_attributes):
+            # Rank quizzes for cold-start requests
+            popularity = self.build_popularity(load[0], publish=False, quiz_attributes=load_quiz_attributes)
+            stage['quizzes'] = len(popularity.quiz_ids)
+            return popularity
+
+        def fit_knn(stage, load, load_quiz_features):
+            knn_artifacts = self.fit_knn_model(load[0], publish=False, quiz_df=load_quiz_features)
+            if knn_artifacts is not None:
+                stage.update(quizzes=len(knn_artifacts['quiz_ids']),
+                             features=knn_artifacts['quiz_features'].shape[1],
+                             index=knn_artifacts['feature_index'].kind,
+                             recall_at_10=knn_artifacts['feature_index'].recall_at_k)
+            return knn_artifacts
+
+        def build_content(stage, load_quiz_content, load_quiz_categories):
+            # The content model does not depend on ratings; if it fails the previous one is kept
+            content_model = self.build_content_model(publish=False, quizzes_df=load_quiz_content,
+                                                     quiz_categories=load_quiz_categories)
+            stage.update(quizzes=len(content_model.quiz_ids), features=content_model.n_features,
+                         nnz=content_model.vectors.nnz, clusters=len(content_model.cluster_members),
+                         index=content_model.index.kind, recall_at_10=content_model.index.recall_at_k)
+            return content_model
+
+        pipeline.add('load', load_ratings)
+        pipeline.add('load_quiz_features', load_quiz_features)
+        pipeline.add('load_quiz_attributes', load_quiz_attributes)
+        pipeline.add('load_quiz_content', load_quiz_content)
+        pipeline.add('load_quiz_categories', load_quiz_categories)
+        pipeline.add('play_history', refresh_play_history, optional=True)
+        pipeline.add('matrix', build_matrix, after=('load',), condition=needs_rebuild)
+        pipeline.add('similarity', compute_similarity, after=('matrix',))
+        pipeline.add('popularity', build_popularity, after=('load', 'load_quiz_attributes'), condition=has_ratings)
+        pipeline.add('knn', fit_knn, after=('load', 'load_quiz_features'), condition=has_ratings)
+        pipeline.add('content', build_content, after=('load_quiz_content', 'load_quiz_categories'), optional=True)
+        results = pipeline.run()
+
+        df = results['load'][0]
+        if df.empty:
+            logger.warning("No data available to update the recommendation system")
+        artifacts = {}
+        if 'matrix' in results:
+            artifacts['user_item_matrix'] = results['matrix']
+            artifacts['item_neighbors'] = results['similarity']
+        if 'popularity' in results:
+            artifacts['popularity'] = results['popularity']
+        if results.get('knn') is not None:
+            artifacts.update(results['knn'])
+        if 'content' in results:
+            artifacts['content_model'] = results['content']
         
-        # Load latest data
-        df = self.load_data()
+        # Swap in the new model for all requests at once
+        snapshot = self.publish_snapshot(**artifacts)
+        
+        # Save it for warm restarts
+        if self.model_store is not None and artifacts:
+            with trace.stage('persist') as stage:
+                try:
+                    stage['path'] = self.model_store.save(snapshot)
+                except Exception as e:
+                    logger.error(f"Error saving model snapshot: {str(e)}")
+                    stage['error'] = str(e)
+                    if self.training_child:
+                        raise
+        
+        # Preload quiz details if Quizzes changed
+        if not self.training_child:
+            with trace.stage('quiz_metadata') as stage:
+                try:
+                    stage['reloaded'] = self.quiz_metadata.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing quiz metadata cache: {str(e)}")
+                    stage['error'] = str(e)
         
         if not df.empty:
-            # Build user-item matrix
-            self.build_user_item_matrix(df)
-            
-            # Compute item similarities
-            self.compute_item_similarity()
-            
-            # Fit KNN model on quiz features
-            self.fit_knn_model(df)
+            # Write the new top-N lists back to RecommendedQuizzes
+            if self.materialize_recommendations_enabled and self._materialized_matrix is not snapshot.user_item_matrix:
+                with trace.stage('materialize') as stage:
+                    stage['users_rewritten'] = self.materialize_recommendations(snapshot)
             
             logger.info("Recommendation system updated successfully")
-        else:
-            logger.warning("No data available to update the recommendation system")
     
-    def get_user_recommendations_with_knn(self, user_id: int, n_recommendations: int = 5) -> dict:
+    def materialize_recommendations(self, snapshot: ModelSnapshot = None) -> int:
+        """
+        Compute top-N for every user in the user-item matrix with the batch engine and write the
+        lists that changed to RecommendedQuizzes. Returns the number of users rewritten.
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        if snapshot.user_item_matrix is None or snapshot.item_neighbors is None:
+            return 0
+
+        try:
+            user_ids = snapshot.user_item_matrix.index.tolist()
+            recommendations = self.recommend_for_users(user_ids, self.materialize_top_n, snapshot)
+            rewritten = self.recommendation_writer.write(recommendations)
+            self._materialized_matrix = snapshot.user_item_matrix
+            return rewritten
+        except Exception as e:
+            # Keep serving from memory, the next rebuild retries the write-back
+            logger.error(f"Error materializing recommendations: {str(e)}")
+            return 0
+
+    @metrics.timed('recommender_function_seconds', function='get_user_recommendations_with_knn')
+    def get_user_recommendations_with_knn(self, user_id: int, n_recommendations: int = 5,
+                                          snapshot: ModelSnapshot = None) -> dict:
         """
         Enhanced recommendation combining Item-Based CF and KNN
         """
-        cf_recommendations = self.recommend_for_user(user_id, n_recommendations * 2)  # Get more candidates
+        # Pin one model snapshot for the whole request
+        snapshot = self.snapshot if snapshot is None else snapshot
+        cf_recommendations = self.recommend_for_user(user_id, n_recommendations * 2, snapshot)  # Get more candidates
         
-        if not cf_recommendations and self.knn_model is not None:
+        if not cf_recommendations and snapshot.knn_model is not None:
             # If collaborative filtering yields no results, use KNN on features
             logger.info(f"No CF recommendations for user {user_id}, falling back to KNN")
-            return self._recommend_by_knn_features(user_id, n_recommendations)
+            return self._recommend_by_knn_features(user_id, n_recommendations, snapshot)
         
         # Enhance with KNN for similar items
-        enhanced_recommendations = []
-        user_quiz_ids = []
+        enhanced_recommendations = self._explain_recommendations(user_id, cf_recommendations, snapshot)
         
-        if user_id in self.user_item_matrix.index:
-            user_ratings = self.user_item_matrix.loc[user_id]
-            user_quiz_ids = user_ratings[user_ratings > 0].index.tolist()
+        # Print the predicted ratings for enhanced recommendations
+        print(f"\nEnhanced Collaborative Filtering Recommendations for User {user_id}:")
+        for i, rec in enumerate(enhanced_recommendations[:n_recommendations], 1):
+            print(f"  {i}. Quiz ID: {rec['quiz_id']} | Predicted Rating: {rec['predicted_rating']}")
+
+        # Log the recommended quiz IDs
+        recommended_quiz_ids = [rec['quiz_id'] for rec in enhanced_recommendations[:n_recommendations]]
+        logger.info(f"Recommended quizzes for user {user_id}: {recommended_quiz_ids}")
+        print(f"Recommended quiz IDs from database for user {user_id}: {recommended_quiz_ids}")
+
+        # Limit to required number
+        return {
+            'user_id': user_id,
+            'recommendations': enhanced_recommendations[:n_recommendations],
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @metrics.timed('recommender_function_seconds', function='get_batch_recommendations_with_knn')
+    def get_batch_recommendations_with_knn(self, user_ids: list, n_recommendations: int = 5,
+                                           snapshot: ModelSnapshot = None) -> dict:
+        """
+        Batch version of get_user_recommendations_with_knn: {user_id: response}
+        """
+        # Pin one model snapshot for the whole batch
+        snapshot = self.snapshot if snapshot is None else snapshot
+        cf_batch = self.recommend_for_users(user_ids, n_recommendations, snapshot)
+
+        batch_recommendations = {}
+        for user_id in user_ids:
+            cf_recommendations = cf_batch.get(user_id, [])
+            if not cf_recommendations and snapshot.knn_model is not None:
+                # If collaborative filtering yields no results, use KNN on features
+                batch_recommendations[user_id] = self._recommend_by_knn_features(user_id, n_recommendations, snapshot)
+                continue
+
+            batch_recommendations[user_id] = {
+                'user_id': user_id,
+                'recommendations': self._explain_recommendations(
+                    user_id, cf_recommendations[:n_recommendations], snapshot
+                ),
+                'timestamp': datetime.now().isoformat()
+            }
+
+        return batch_recommendations
+
+    def get_recommendations(self, user_id: int, n_recommendations: int = 5,
+                            method: str = 'collaborative_filtering', use_cache: bool = True) -> dict:
+        """
+        Recommendations for one user with the given method, served from the response cache
+        while the model version is unchanged. Concurrent misses for the same key are computed once.
+        use_cache=False always computes in the calling thread (used when profiling a request).
+        The snapshot is read once, so the response is computed from and cached under one version.
+        """
+        snapshot = self.snapshot
+        key = (user_id, method, n_recommendations)
+        if not use_cache:
+            return self._compute_and_cache(key, snapshot)
+        response = self.response_cache.get(key, snapshot.cache_version)
+        if response is None:
+            response = self.single_flight.do((key, snapshot.cache_version), self._compute_and_cache, key, snapshot)
+        return response
+
+    def _compute_and_cache(self, key: tuple, snapshot: ModelSnapshot) -> dict:
+        user_id, method, n_recommendations = key
+        with metrics.timer('recommender_stage_seconds', stage='scoring'):
+            response = self._compute_recommendations(user_id, n_recommendations, method, snapshot)
+        self.response_cache.put(key, snapshot.cache_version, response)
+        return response
+
+    def get_batch_recommendations(self, user_ids: list, n_recommendations: int = 5,
+                                  method: str = 'collaborative_filtering', use_cache: bool = True) -> dict:
+        """
+        Batch version of get_recommendations: {user_id: response}, computing only cache misses
+        """
+        snapshot = self.snapshot
+        version = snapshot.cache_version
+        batch_recommendations, missing = {}, []
+        for user_id in user_ids:
+            response = self.response_cache.get((user_id, method, n_recommendations), version) if use_cache else None
+            if response is None:
+                missing.append(user_id)
+            else:
+                batch_recommendations[user_id] = response
+
+        if missing:
+            if method in ('content_based', 'content_based_advanced') and not use_cache:
+                computed = {user_id: self._compute_and_cache((user_id, method, n_recommendations), snapshot)
+                            for user_id in dict.fromkeys(missing)}
+            elif method in ('content_based', 'content_based_advanced'):
+                computed = {user_id: self.single_flight.do(
+                    ((user_id, method, n_recommendations), version),
+                    self._compute_and_cache, (user_id, method, n_recommendations), snapshot
+                ) for user_id in dict.fromkeys(missing)}
+            else:
+                # Collaborative filtering (also the default): score all users together
+                with metrics.timer('recommender_stage_seconds', stage='scoring'):
+                    computed = self.get_batch_recommendations_with_knn(missing, n_recommendations, snapshot)
+                for user_id, response in computed.items():
+                    self.response_cache.put((user_id, method, n_recommendations), version, response)
+            batch_recommendations.update(computed)
+
+        # Keep the requested order
+        return {user_id: batch_recommendations[user_id] for user_id in user_ids}
+
+    def _compute_recommendations(self, user_id: int, n_recommendations: int, method: str,
+                                 snapshot: ModelSnapshot = None) -> dict:
+        """
+        Run the recommendation method for one user: content_based, content_based_advanced or
+        collaborative_filtering (the default)
+        """
+        if method == 'content_based':
+            recommendations = self.content_based_recommend(user_id, n_recommendations, snapshot)
+        elif method == 'content_based_advanced':
+            recommendations = self.content_based_recommend_with_clustering(user_id, n_recommendations, snapshot)
+        else:
+            return self.get_user_recommendations_with_knn(user_id, n_recommendations, snapshot)
+
+        # Format the response to match expected structure
+        return {
+            'user_id': user_id,
+            'recommendations': recommendations,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    @metrics.timed('recommender_function_seconds', function='explain_recommendations')
+    def _explain_recommendations(self, user_id: int, cf_recommendations: list, snapshot: ModelSnapshot) -> list:
+        """
+        Attach the user's rated quizzes that are meaningfully similar to each recommendation
+        """
+        enhanced_recommendations = []
+        user_item_matrix, item_neighbors = snapshot.user_item_matrix, snapshot.item_neighbors
+        user_quiz_indices, _ = user_item_matrix.user_ratings(user_id)
+        quiz_index = user_item_matrix.quiz_index
         
         for rec in cf_recommendations:
             quiz_id = rec['quiz_id']
@@ -383,15 +1203,13 @@ class QuizRecommendationSystem:
             
             # Add context based on similar quizzes user liked
             similar_to_user_rated = []
-            for rated_quiz_id in user_quiz_ids:
-                if (self.item_similarity_matrix is not None and 
-                    rated_quiz_id in self.item_similarity_matrix.columns and 
-                    quiz_id in self.item_similarity_matrix.index):
-                    similarity = self.item_similarity_matrix.loc[quiz_id, rated_quiz_id]
+            if item_neighbors is not None and quiz_id in quiz_index:
+                similarities = item_neighbors.similarities_to(quiz_index[quiz_id], user_quiz_indices)
+                for rated_idx, similarity in zip(user_quiz_indices, similarities):
                     if similarity > 0.1:  # Only if similarity is meaningful
                         similar_to_user_rated.append({
-                            'quiz_id': str(rated_quiz_id),
-                            'similarity': round(similarity, 3)
+                            'quiz_id': str(user_item_matrix.quiz_ids[rated_idx]),
+                            'similarity': round(float(similarity), 3)
                         })
             
             enhanced_recommendations.append({
@@ -400,69 +1218,59 @@ class QuizRecommendationSystem:
                 'similar_rated_quiz_ids': similar_to_user_rated
             })
         
-        # Print the predicted ratings for enhanced recommendations
-        print(f"\nEnhanced Collaborative Filtering Recommendations for User {user_id}:")
-        for i, rec in enumerate(enhanced_recommendations[:n_recommendations], 1):
-            print(f"  {i}. Quiz ID: {rec['quiz_id']} | Predicted Rating: {rec['predicted_rating']}")
+        return enhanced_recommendations
 
-        # Log the recommended quiz IDs
-        recommended_quiz_ids = [rec['quiz_id'] for rec in enhanced_recommendations[:n_recommendations]]
-        logger.info(f"Recommended quizzes for user {user_id}: {recommended_quiz_ids}")
-        print(f"Recommended quiz IDs from database for user {user_id}: {recommended_quiz_ids}")
-
-        # Limit to required number
-        return {
-            'user_id': user_id,
-            'recommendations': enhanced_recommendations[:n_recommendations],
-            'timestamp': datetime.now().isoformat()
-        }
-    
-    def _recommend_by_knn_features(self, user_id: int, n_recommendations: int) -> dict:
+    @metrics.timed('recommender_function_seconds', function='recommend_by_knn_features')
+    def _recommend_by_knn_features(self, user_id: int, n_recommendations: int, snapshot: ModelSnapshot) -> dict:
         """
         Recommend using KNN based on quiz features when CF is not applicable
         """
         recommendations = []
+        knn_model, knn_quiz_ids, quiz_features = snapshot.knn_model, snapshot.quiz_ids, snapshot.quiz_features
+        feature_index = snapshot.feature_index
+
+        def nearest_quizzes(avg_features, n_neighbors):
+            # Approximate index for large catalogs, otherwise the brute-force KNN model
+            query_norm = np.linalg.norm(avg_features)
+            if feature_index is not None and feature_index.approximate and query_norm > 0:
+                return feature_index.search(avg_features / query_norm, n_neighbors)[0]
+            return knn_model.kneighbors([avg_features], n_neighbors=n_neighbors)[1][0]
 
         # First, get user's rated quizzes if possible
-        user_rated_quiz_ids = []
-        if user_id in self.user_item_matrix.index:
-            user_ratings = self.user_item_matrix.loc[user_id]
-            user_rated_quiz_ids = user_ratings[user_ratings > 0].index.tolist()
+        user_ratings = snapshot.user_item_matrix.user_rating_map(user_id) if snapshot.user_item_matrix is not None else {}
+        user_rated_quiz_ids = list(user_ratings)
 
         # If we have the KNN model and quiz features, recommend based on user's preferences
-        if hasattr(self, 'knn_model') and hasattr(self, 'quiz_features') and self.quiz_features is not None:
+        if knn_model is not None and quiz_features is not None:
             # If user has rated some quizzes, find similar quizzes to those
             if user_rated_quiz_ids:
                 # Find features for quizzes the user has rated
                 user_rated_indices = [
-                    i for i, quiz_id in enumerate(self.quiz_ids)
-                    if str(quiz_id) in user_rated_quiz_ids
+                    i for i, quiz_id in enumerate(knn_quiz_ids)
+                    if str(quiz_id) in user_ratings
                 ]
 
                 # Get average profile of quizzes user likes (only highly rated ones)
                 high_rated_indices = [
-                    i for i, quiz_id in enumerate(self.quiz_ids)
-                    if str(quiz_id) in user_rated_quiz_ids and
+                    i for i, quiz_id in enumerate(knn_quiz_ids)
+                    if str(quiz_id) in user_ratings and
                        user_ratings[str(quiz_id)] >= 4  # Only highly rated
                 ]
 
                 if high_rated_indices:
                     # Use the average feature vector of highly rated quizzes as the basis
-                    avg_features = np.mean([self.quiz_features[i] for i in high_rated_indices], axis=0)
+                    avg_features = np.mean([quiz_features[i] for i in high_rated_indices], axis=0)
 
                     # Find nearest neighbors to this averaged profile
-                    distances, indices = self.knn_model.kneighbors(
-                        [avg_features],
-                        n_neighbors=min(len(self.quiz_features), n_recommendations * 3)
-                    )
+                    indices = nearest_quizzes(avg_features, min(len(quiz_features), n_recommendations * 3))
 
                     # Get recommendations from the nearest neighbors that user hasn't rated
-                    for neighbor_idx in indices[0]:
-                        neighbor_quiz_id = self.quiz_ids[neighbor_idx]
+                    for neighbor_idx in indices:
+                        neighbor_quiz_id = knn_quiz_ids[neighbor_idx]
                         neighbor_quiz_str = str(neighbor_quiz_id)
 
                         # Only recommend if user hasn't rated this quiz and not already in recommendations
-                        if (neighbor_quiz_str not in user_rated_quiz_ids and
+                        if (neighbor_quiz_str not in user_ratings and
                            neighbor_quiz_str not in [r['quiz_id'] for r in recommendations]):
 
                             # Estimate rating based on similarity
@@ -480,18 +1288,15 @@ class QuizRecommendationSystem:
                                 break
                 elif user_rated_indices:
                     # If no high ratings, use all rated quizzes as basis
-                    avg_features = np.mean([self.quiz_features[i] for i in user_rated_indices], axis=0)
+                    avg_features = np.mean([quiz_features[i] for i in user_rated_indices], axis=0)
 
-                    distances, indices = self.knn_model.kneighbors(
-                        [avg_features],
-                        n_neighbors=min(len(self.quiz_features), n_recommendations * 2)
-                    )
+                    indices = nearest_quizzes(avg_features, min(len(quiz_features), n_recommendations * 2))
 
-                    for neighbor_idx in indices[0]:
-                        neighbor_quiz_id = self.quiz_ids[neighbor_idx]
+                    for neighbor_idx in indices:
+                        neighbor_quiz_id = knn_quiz_ids[neighbor_idx]
                         neighbor_quiz_str = str(neighbor_quiz_id)
 
-                        if (neighbor_quiz_str not in user_rated_quiz_ids and
+                        if (neighbor_quiz_str not in user_ratings and
                            neighbor_quiz_str not in [r['quiz_id'] for r in recommendations]):
 
                             estimated_rating = self._estimate_rating_from_similarity(
@@ -508,7 +1313,7 @@ class QuizRecommendationSystem:
                                 break
             else:
                 # If user has not rated any quizzes, return popular ones based on overall ratings
-                recommendations = [r for r in self.get_popular_quizzes(n_recommendations)]
+                recommendations = [r for r in self.get_popular_quizzes(n_recommendations, snapshot=snapshot)]
 
         # Print the predicted ratings for KNN-based recommendations
         print(f"\nKNN-Based Recommendations for User {user_id}:")
@@ -549,26 +1354,21 @@ class QuizRecommendationSystem:
         # Default fallback
         return 4.0
 
-    def get_user_played_quizzes(self, user_id: int) -> list:
+    def get_play_history(self) -> PlayHistoryIndex:
         """
-        Get quizzes that the user has played from the StudentQuizzes table
+        Return the play-history index, loading it on first use
         """
-        logger.info(f"Getting played quizzes for user {user_id}")
+        if not self.play_history.loaded:
+            self.play_history.refresh()
+        return self.play_history
 
-        # Query to get quizzes the user has started or completed
-        query = """
-        SELECT DISTINCT
-            sq.QuizId as quiz_id
-        FROM StudentQuizzes sq
-        WHERE sq.StudentId = ?
-        AND sq.Status IN ('Completed', 'Started', 'Exited', 'AutoSubmitted')
+    def get_user_played_quizzes(self, user_id: int) -> list:
+        """
+        Get quizzes that the user has played (StudentQuizzes), from the in-memory play history
         """
-
         try:
-            # Use pandas' parameter format which works with both SQLite and SQL Server
-            df = pd.read_sql_query(query, self.engine, params=(user_id,))
-            played_quiz_ids = df['quiz_id'].tolist() if not df.empty else []
-            logger.info(f"User {user_id} has played {len(played_quiz_ids)} quizzes: {played_quiz_ids}")
+            played_quiz_ids = self.get_play_history().played_quiz_ids(user_id)
+            logger.info(f"User {user_id} has played {len(played_quiz_ids)} quizzes")
             return played_quiz_ids
         except Exception as e:
             logger.error(f"Error getting played quizzes for user {user_id}: {str(e)}")
@@ -670,11 +1470,19 @@ class QuizRecommendationSystem:
         """
         Create content-based feature vectors for quizzes based on their content using ML vectorization
         """
+        content_model = self.fit_content_model(quizzes_df)
+        return content_model.vectors, content_model.quiz_ids
+
+    def fit_content_model(self, quizzes_df: pd.DataFrame, all_quiz_categories: dict = None) -> ContentModel:
+        """
+        Fit the TF-IDF vectorizer over the quizzes' combined content and return the content model
+        """
         if quizzes_df.empty:
-            return np.array([]), []
+            return ContentModel(None, sp.csr_matrix((0, 0)), [])
 
         # Get all categories efficiently in one query
-        all_quiz_categories = self.get_all_quiz_categories()
+        if all_quiz_categories is None:
+            all_quiz_categories = self.get_all_quiz_categories()
 
         # Create a combined content string for each quiz
         content_strings = []
@@ -701,77 +1509,100 @@ class QuizRecommendationSystem:
 
         # Use TF-IDF to vectorize the content with more features for better ML performance
         if content_strings:
-            # Increase max_features to capture more nuanced content differences
+            # TF-IDF vectors stay sparse, so max_features can grow without densifying the catalog
             tfidf = TfidfVectorizer(
                 stop_words='english',
-                max_features=200,  # Increased for better representation
+                max_features=self.content_max_features,
                 ngram_range=(1, 2),  # Include bigrams for better context
                 lowercase=True,
                 strip_accents='unicode'
             )
             content_matrix = tfidf.fit_transform(content_strings)
-            return content_matrix.toarray(), quiz_ids
+            return ContentModel(tfidf, content_matrix, quiz_ids)
         else:
-            return np.array([]), []
+            return ContentModel(None, sp.csr_matrix((0, 0)), [])
 
-    def content_based_recommend(self, user_id: int, n_recommendations: int = 5) -> list:
+    def build_content_model(self, publish: bool = True, quizzes_df: pd.DataFrame = None,
+                            quiz_categories: dict = None) -> ContentModel:
+        """
+        Fit the content model served to content-based requests (loading the active quizzes and
+        their categories unless given)
+        """
+        if quizzes_df is None:
+            quizzes_df = self.get_all_quizzes_with_content()
+        content_model = self.fit_content_model(quizzes_df, quiz_categories)
+        content_model.fit_clusters(self.cluster_minibatch_threshold)
+        content_model.build_index(self.ann_method, self.ann_min_items, self.ann_probes)
+        logger.info(f"Built content model: {len(content_model.quiz_ids)} quizzes, "
+                    f"{content_model.n_features} features ({content_model.vectors.nnz} non-zeros), "
+                    f"{len(content_model.cluster_members)} clusters")
+        if publish:
+            self.publish_snapshot(content_model=content_model)
+        return content_model
+
+    def get_content_model(self, snapshot: ModelSnapshot = None) -> ContentModel:
+        """
+        Return the content model of the snapshot (the served one by default), building it on first use.
+        Concurrent first requests wait for a single build instead of each fitting and publishing one.
+        """
+        snapshot = self.snapshot if snapshot is None else snapshot
+        content_model = snapshot.content_model
+        if content_model is None:
+            with self._content_build_lock:
+                # Built by another request while this one waited
+                content_model = self.snapshot.content_model
+                if content_model is None:
+                    content_model = self.build_content_model()
+        return content_model
+
+    @metrics.timed('recommender_function_seconds', function='content_based_recommend')
+    def content_based_recommend(self, user_id: int, n_recommendations: int = 5,
+                               snapshot: ModelSnapshot = None) -> list:
         """
         Enhanced content-based recommendation algorithm using vector similarity ML approach
         """
         logger.info(f"Generating content-based recommendations for user {user_id}")
+        snapshot = self.snapshot if snapshot is None else snapshot
 
-        # 1. Get quizzes the user has played from StudentQuizzes table
-        played_quiz_ids = self.get_user_played_quizzes(user_id)
-        if not played_quiz_ids:
+        # 1. Get quizzes the user has played from the in-memory play history
+        try:
+            play_history = self.get_play_history()
+        except Exception as e:
+            logger.error(f"Error loading play history: {str(e)}")
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
+        played_quiz_codes = play_history.played_codes(user_id)
+        if len(played_quiz_codes) == 0:
             logger.info(f"User {user_id} has not played any quizzes, returning popular quizzes")
-            return self.get_popular_quizzes(n_recommendations)
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
 
-        # 2. Get all quizzes with content features
-        all_quizzes_df = self.get_all_quizzes_with_content()
-        if all_quizzes_df.empty:
+        # 2. Get the content model (quiz vectors for all active quizzes), fitted during updates
+        content_model = self.get_content_model(snapshot)
+        if content_model.empty:
             logger.warning("No quizzes found for content-based recommendation")
-            return self.get_popular_quizzes(n_recommendations)
-
-        # 3. Vectorize all quizzes based on content (including name, description, level, questions, time, categories)
-        content_vectors, quiz_ids = self.vectorize_quizzes_content(all_quizzes_df)
-        if content_vectors.size == 0:
-            logger.warning("No content vectors generated for content-based recommendation")
-            return self.get_popular_quizzes(n_recommendations)
-
-        # 4. Get vectors for played quizzes
-        played_quiz_indices = []
-        played_quiz_vectors = []
-        for i, quiz_id in enumerate(quiz_ids):
-            if quiz_id in played_quiz_ids:
-                played_quiz_indices.append(i)
-                played_quiz_vectors.append(content_vectors[i])
-
-        if not played_quiz_vectors:
-            logger.warning("No content vectors found for played quizzes")
-            return self.get_popular_quizzes(n_recommendations)
-
-        # 5. Calculate user profile as the average of played quiz vectors
-        user_profile = np.mean(played_quiz_vectors, axis=0).reshape(1, -1)
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
+        quiz_ids = content_model.quiz_ids
 
-        # 6. Calculate cosine similarity between user profile and all quizzes
-        similarities = cosine_similarity(user_profile, content_vectors)[0]
+        # 3. Get vectors for played quizzes
+        played_quiz_indices = play_history.content_rows(played_quiz_codes, content_model)
 
-        # 7. Create similarity scores for all quizzes
-        quiz_similarities = [(quiz_ids[i], similarities[i]) for i in range(len(quiz_ids))]
+        if len(played_quiz_indices) == 0:
+            logger.warning("No content vectors found for played quizzes")
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
 
-        # 8. Sort by similarity score (highest first)
-        quiz_similarities.sort(key=lambda x: x[1], reverse=True)
+        # 4-5. Find the top N quizzes the user has not played yet by cosine similarity to the user profile
+        # (average of played quiz vectors), highest first, through the content model's index
+        candidate_mask = np.ones(len(quiz_ids), dtype=bool)
+        candidate_mask[played_quiz_indices] = False
+        top_indices, similarities = content_model.search(played_quiz_indices, n_recommendations, candidate_mask)
 
-        # 9. Filter out quizzes the user has already played and take top N
         recommendations = []
-        for quiz_id, similarity_score in quiz_similarities:
-            if quiz_id not in played_quiz_ids and len(recommendations) < n_recommendations:
-                recommendations.append({
-                    'quiz_id': quiz_id,
-                    'predicted_rating': round(similarity_score * 5.0, 2),  # Scale similarity to rating range
-                    'similarity_score': round(similarity_score, 3),
-                    'method': 'content_based_ml'
-                })
+        for idx, similarity in zip(top_indices, similarities):
+            recommendations.append({
+                'quiz_id': quiz_ids[idx],
+                'predicted_rating': round(similarity * 5.0, 2),  # Scale similarity to rating range
+                'similarity_score': round(similarity, 3),
+                'method': 'content_based_ml'
+            })
 
         # Print the predicted ratings for debugging/output
         print(f"\nContent-Based Recommendations for User {user_id}:")
@@ -781,116 +1612,77 @@ class QuizRecommendationSystem:
         logger.info(f"Generated {len(recommendations)} content-based recommendations using ML vector similarity for user {user_id}")
         return recommendations
 
-    def content_based_recommend_with_clustering(self, user_id: int, n_recommendations: int = 5) -> list:
+    @metrics.timed('recommender_function_seconds', function='content_based_recommend_with_clustering')
+    def content_based_recommend_with_clustering(self, user_id: int, n_recommendations: int = 5,
+                                               snapshot: ModelSnapshot = None) -> list:
         """
         Advanced content-based recommendation using clustering and vector similarity
         """
         logger.info(f"Generating advanced content-based recommendations with clustering for user {user_id}")
+        snapshot = self.snapshot if snapshot is None else snapshot
 
-        # 1. Get quizzes the user has played from StudentQuizzes table
-        played_quiz_ids = self.get_user_played_quizzes(user_id)
-        if not played_quiz_ids:
+        # 1. Get quizzes the user has played from the in-memory play history
+        try:
+            play_history = self.get_play_history()
+        except Exception as e:
+            logger.error(f"Error loading play history: {str(e)}")
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
+        played_quiz_codes = play_history.played_codes(user_id)
+        if len(played_quiz_codes) == 0:
             logger.info(f"User {user_id} has not played any quizzes, returning popular quizzes")
-            return self.get_popular_quizzes(n_recommendations)
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
 
-        # 2. Get all quizzes with content features
-        all_quizzes_df = self.get_all_quizzes_with_content()
-        if all_quizzes_df.empty:
+        # 2. Get the content model (quiz vectors for all active quizzes), fitted during updates
+        content_model = self.get_content_model(snapshot)
+        if content_model.empty:
             logger.warning("No quizzes found for content-based recommendation")
-            return self.get_popular_quizzes(n_recommendations)
-
-        # 3. Vectorize all quizzes based on content
-        content_vectors, quiz_ids = self.vectorize_quizzes_content(all_quizzes_df)
-        if content_vectors.size == 0:
-            logger.warning("No content vectors generated for content-based recommendation")
-            return self.get_popular_quizzes(n_recommendations)
-
-        # 4. Get vectors for played quizzes
-        played_quiz_indices = []
-        played_quiz_vectors = []
-        for i, quiz_id in enumerate(quiz_ids):
-            if quiz_id in played_quiz_ids:
-                played_quiz_indices.append(i)
-                played_quiz_vectors.append(content_vectors[i])
-
-        if not played_quiz_vectors:
-            logger.warning("No content vectors found for played quizzes")
-            return self.get_popular_quizzes(n_recommendations)
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
+        quiz_ids = content_model.quiz_ids
+
+        # 3. Get vectors for played quizzes
+        played_quiz_indices = play_history.content_rows(played_quiz_codes, content_model)
 
-        # 5. Use K-means clustering to group similar quizzes
-        from sklearn.cluster import KMeans
+        if len(played_quiz_indices) == 0:
+            logger.warning("No content vectors found for played quizzes")
+            return self.get_popular_quizzes(n_recommendations, snapshot=snapshot)
 
-        # Determine optimal number of clusters (up to 10% of total quizzes)
-        n_clusters = min(max(3, len(content_vectors) // 10), 10)
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(content_vectors)
+        # 4. Find which precomputed clusters the user's played quizzes belong to
+        user_cluster_indices = np.unique(content_model.cluster_labels[played_quiz_indices])
 
-        # 6. Find which clusters the user's played quizzes belong to
-        user_cluster_indices = set()
-        for idx in played_quiz_indices:
-            user_cluster_indices.add(cluster_labels[idx])
+        # 5. Calculate similarity of all quizzes to the user profile (average of played quiz vectors)
+        similarities = content_model.profile_similarities(played_quiz_indices)
 
-        # 7. Calculate user profile as the average of played quiz vectors
-        user_profile = np.mean(played_quiz_vectors, axis=0).reshape(1, -1)
+        # Quizzes that can still be recommended (not played, not picked yet)
+        candidate_mask = np.ones(len(quiz_ids), dtype=bool)
+        candidate_mask[played_quiz_indices] = False
 
-        # 8. Calculate similarities within user's preferred clusters
+        # 6. Rank quizzes within the user's preferred clusters
         recommendations = []
         for cluster_idx in user_cluster_indices:
-            # Get all quizzes in this cluster
-            cluster_quiz_indices = [i for i, label in enumerate(cluster_labels) if label == cluster_idx]
-
-            # Calculate similarities for quizzes in this cluster
-            cluster_vectors = content_vectors[cluster_quiz_indices]
-            cluster_quiz_ids = [quiz_ids[i] for i in cluster_quiz_indices]
-
-            # Calculate similarity to user profile
-            cluster_similarities = cosine_similarity(user_profile, cluster_vectors)[0]
-
-            # Create similarity pairs
-            cluster_similarities_pairs = [(cluster_quiz_ids[i], cluster_similarities[i]) for i in range(len(cluster_quiz_ids))]
-
-            # Sort by similarity
-            cluster_similarities_pairs.sort(key=lambda x: x[1], reverse=True)
-
-            # Add top similar quizzes from this cluster that user hasn't played
-            for quiz_id, similarity_score in cluster_similarities_pairs:
-                if (quiz_id not in played_quiz_ids and
-                    len(recommendations) < n_recommendations and
-                    quiz_id not in [rec['quiz_id'] for rec in recommendations]):
-
-                    recommendations.append({
-                        'quiz_id': quiz_id,
-                        'predicted_rating': round(similarity_score * 5.0, 2),
-                        'similarity_score': round(similarity_score, 3),
-                        'method': 'content_based_ml_cluster'
-                    })
-
-                    if len(recommendations) >= n_recommendations:
-                        break
-
-            if len(recommendations) >= n_recommendations:
+            remaining = n_recommendations - len(recommendations)
+            if remaining <= 0:
                 break
 
-        # 9. If we don't have enough recommendations, fall back to general similarity approach
-        if len(recommendations) < n_recommendations:
-            # Calculate overall similarities for remaining slots
-            similarities = cosine_similarity(user_profile, content_vectors)[0]
-            quiz_similarities = [(quiz_ids[i], similarities[i]) for i in range(len(quiz_ids))]
-            quiz_similarities.sort(key=lambda x: x[1], reverse=True)
-
-            for quiz_id, similarity_score in quiz_similarities:
-                if (quiz_id not in played_quiz_ids and
-                    quiz_id not in [rec['quiz_id'] for rec in recommendations]):
-
-                    recommendations.append({
-                        'quiz_id': quiz_id,
-                        'predicted_rating': round(similarity_score * 5.0, 2),
-                        'similarity_score': round(similarity_score, 3),
-                        'method': 'content_based_ml_fallback'
-                    })
+            members = content_model.cluster_members[cluster_idx]
+            top_members = members[top_n_indices(similarities[members], remaining, candidate_mask[members])]
+            for idx in top_members:
+                candidate_mask[idx] = False
+                recommendations.append({
+                    'quiz_id': quiz_ids[idx],
+                    'predicted_rating': round(similarities[idx] * 5.0, 2),
+                    'similarity_score': round(similarities[idx], 3),
+                    'method': 'content_based_ml_cluster'
+                })
 
-                    if len(recommendations) >= n_recommendations:
-                        break
+        # 7. If we don't have enough recommendations, fall back to general similarity approach
+        remaining = n_recommendations - len(recommendations)
+        for idx in top_n_indices(similarities, remaining, candidate_mask):
+            recommendations.append({
+                'quiz_id': quiz_ids[idx],
+                'predicted_rating': round(similarities[idx] * 5.0, 2),
+                'similarity_score': round(similarities[idx], 3),
+                'method': 'content_based_ml_fallback'
+            })
 
         # Print the predicted ratings for debugging/output
         print(f"\nAdvanced Content-Based Recommendations (with Clustering) for User {user_id}:")
@@ -908,26 +1700,209 @@ CORS(app)
 
 # Configuration
 try:
-    from config import DATABASE_CONNECTION_STRING
+    import config
 except ImportError:
-    # Fallback to environment variable or default
-    DATABASE_CONNECTION_STRING = os.getenv('DATABASE_CONNECTION_STRING',
-        'mssql+pyodbc://@./BlazingQuiz'
-        '?driver=ODBC+Driver+17+for+SQL+Server'
-        '&trusted_connection=yes')  # Default SQL Server connection
+    config = None
+
+
+def get_setting(name, default):
+    """
+    Read a setting from config.py, falling back to an environment variable or the default
+    """
+    if config is not None and hasattr(config, name):
+        return getattr(config, name)
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ('1', 'true', 'yes')
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+
+DATABASE_CONNECTION_STRING = get_setting('DATABASE_CONNECTION_STRING',
+    'mssql+pyodbc://@./BlazingQuiz'
+    '?driver=ODBC+Driver+17+for+SQL+Server'
+    '&trusted_connection=yes')  # Default SQL Server connection
 
 # Initialize recommendation system
 rec_system = QuizRecommendationSystem(
     connection_string=DATABASE_CONNECTION_STRING,
-    k_neighbors=5
+    k_neighbors=5,
+    full_reload_every=get_setting('FULL_RELOAD_EVERY_N_UPDATES', 12),
+    similarity_top_k=get_setting('SIMILARITY_TOP_K', 50),
+    similarity_min_score=get_setting('SIMILARITY_MIN_SCORE', 0.0),
+    similarity_dtype=get_setting('SIMILARITY_DTYPE', 'float32'),
+    similarity_block_size=get_setting('SIMILARITY_BLOCK_SIZE', 512),
+    similarity_workers=get_setting('SIMILARITY_WORKERS', 1),
+    batch_chunk_size=get_setting('BATCH_CHUNK_SIZE', 256),
+    materialize_recommendations=get_setting('MATERIALIZE_RECOMMENDATIONS', True),
+    materialize_top_n=get_setting('MATERIALIZE_TOP_N', 10),
+    materialize_chunk_size=get_setting('MATERIALIZE_CHUNK_SIZE', 500),
+    cluster_minibatch_threshold=get_setting('CLUSTER_MINIBATCH_THRESHOLD', 5000),
+    content_max_features=get_setting('CONTENT_MAX_FEATURES', 200),
+    popularity_prior_weight=get_setting('POPULARITY_PRIOR_WEIGHT', 0.0),
+    quiz_cache_max_entries=get_setting('QUIZ_CACHE_MAX_ENTRIES', 50000),
+    quiz_cache_ttl_seconds=get_setting('QUIZ_CACHE_TTL_SECONDS', 3600),
+    response_cache_max_entries=get_setting('RESPONSE_CACHE_MAX_ENTRIES', 10000),
+    response_cache_max_bytes=get_setting('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+    single_flight_timeout=get_setting('SINGLE_FLIGHT_TIMEOUT_SECONDS', 30.0),
+    update_trace_history=get_setting('UPDATE_TRACE_HISTORY', 50),
+    update_trace_path=get_setting('UPDATE_TRACE_PATH', None),
+    model_dir=get_setting('MODEL_DIR', None),
+    model_keep_versions=get_setting('MODEL_KEEP_VERSIONS', 3),
+    update_workers=get_setting('UPDATE_WORKERS', 4),
+    ann_method=get_setting('ANN_METHOD', 'ivf'),
+    ann_min_items=get_setting('ANN_MIN_ITEMS', 5000),
+    ann_probes=get_setting('ANN_PROBES', 8)
 )
 
+# Serve the last saved model right away, the first update replaces it
+rec_system.load_persisted_model()
+
+# Process role: 'standalone' trains and serves in one process. With a shared MODEL_DIR, one
+# 'trainer' process retrains and saves snapshots, and 'server' processes (e.g. the workers of a
+# prefork server) map them read-only and reload when a new one is saved
+MODEL_ROLE = get_setting('MODEL_ROLE', 'standalone')
+MODEL_POLL_SECONDS = get_setting('MODEL_POLL_SECONDS', 10)
+if MODEL_ROLE not in ('standalone', 'trainer', 'server'):
+    raise ValueError(f"Unknown MODEL_ROLE '{MODEL_ROLE}', expected standalone, trainer or server")
+if MODEL_ROLE != 'standalone' and rec_system.model_store is None:
+    raise ValueError(f"MODEL_ROLE '{MODEL_ROLE}' requires MODEL_DIR")
+# A standalone process retrains in a child process and only swaps in the saved snapshot
+TRAIN_IN_SUBPROCESS = get_setting('TRAIN_IN_SUBPROCESS', True)
+
+# Token required in the X-Admin-Token header by /admin endpoints (unset = admin endpoints disabled)
+ADMIN_TOKEN = get_setting('ADMIN_TOKEN', None)
+
+
+def admin_token_error():
+    """
+    Error response if the request does not carry the admin token, otherwise None
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN is not set)'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), str(ADMIN_TOKEN)):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    return None
+
+
+# Profiles of requests made with ?profile=1 or the X-Profile: 1 header (admin only)
+PROFILE_TOP_N = get_setting('PROFILE_TOP_N', 25)
+recent_profiles = ProfileLog(max_profiles=get_setting('PROFILE_HISTORY', 20))
+
+
+def profiling_requested() -> bool:
+    return request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def request_profiler(enabled: bool):
+    """
+    A RequestProfiler for a profiled request, or a no-op context (yielding None) otherwise
+    """
+    return RequestProfiler(top_n=PROFILE_TOP_N) if enabled else contextlib.nullcontext()
+
+
+def record_profile(profiler: RequestProfiler, **context) -> dict:
+    profile = {**context, **profiler.report()}
+    recent_profiles.add(profile)
+    return profile
+
+
+def cache_hit_ratio(stats: dict) -> float:
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits'] / lookups if lookups else 0.0
+
+
+def snapshot_age_seconds():
+    built_at = rec_system.snapshot.built_at
+    return (datetime.now() - built_at).total_seconds() if built_at else None
+
+
+metrics.enabled = get_setting('METRICS_ENABLED', True)
+metrics.gauge('recommender_model_version', lambda: rec_system.snapshot.version,
+              'Version of the served model snapshot')
+metrics.gauge('recommender_model_snapshot_age_seconds', snapshot_age_seconds,
+              'Seconds since the served model snapshot was built')
+metrics.gauge('recommender_cache_hit_ratio', lambda: {
+    (('cache', 'response'),): cache_hit_ratio(rec_system.response_cache.stats()),
+    (('cache', 'quiz_metadata'),): cache_hit_ratio(rec_system.quiz_metadata.stats())
+}, 'Hit ratio of the response and quiz metadata caches since start')
+metrics.gauge('recommender_cache_entries', lambda: {
+    (('cache', 'response'),): rec_system.response_cache.stats()['entries'],
+    (('cache', 'quiz_metadata'),): rec_system.quiz_metadata.stats()['entries']
+}, 'Entries in the response and quiz metadata caches')
+metrics.gauge('recommender_coalesced_requests_total', lambda: rec_system.single_flight.stats()['coalesced'],
+              'Requests that waited on an identical in-flight request', metric_type='counter')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.before_request
+def ensure_model_watcher():
+    # Workers forked after import (e.g. gunicorn --preload) need their own watcher thread
+    if MODEL_ROLE == 'server':
+        start_model_watcher()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if request.url_rule is not None and request.url_rule.rule != '/metrics':
+        labels = {'endpoint': request.url_rule.rule, 'method': getattr(g, 'recommendation_method', '')}
+        metrics.inc('recommender_requests_total', status=str(response.status_code), **labels)
+        metrics.observe('recommender_request_seconds', time.perf_counter() - g.request_started, **labels)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    snapshot = rec_system.snapshot
     return jsonify({
         'status': 'healthy',
+        'model_version': snapshot.version,
+        'model_built_at': snapshot.built_at.isoformat() if snapshot.built_at else None,
+        'model_role': MODEL_ROLE,
+        'response_cache': rec_system.response_cache.stats(),
+        'request_coalescing': rec_system.single_flight.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@app.route('/admin/update-traces', methods=['GET'])
+def get_update_traces():
+    """Recent update_recommendations() traces, newest first"""
+    error = admin_token_error()
+    if error is not None:
+        return error
+
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'traces': rec_system.update_traces.recent(limit),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@app.route('/admin/profiles', methods=['GET'])
+def get_profiles():
+    """Profiles of recent requests made with ?profile=1, newest first"""
+    error = admin_token_error()
+    if error is not None:
+        return error
+
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'profiles': recent_profiles.recent(limit),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -939,49 +1914,66 @@ def get_recommendations(user_id):
         n_recommendations = int(request.args.get('n', 5))  # Number of recommendations, default 5
         method = request.args.get('method', 'collaborative_filtering')  # Method: content_based, collaborative_filtering
 
-        # Use the appropriate recommendation method
-        if method == 'content_based':
-            recommendations_data = rec_system.content_based_recommend(user_id, n_recommendations)
-            # Format the response to match expected structure
-            recommendations_data = {
-                'user_id': user_id,
-                'recommendations': recommendations_data,
-                'timestamp': datetime.now().isoformat()
-            }
-        elif method == 'content_based_advanced':
-            recommendations_data = rec_system.content_based_recommend_with_clustering(user_id, n_recommendations)
-            # Format the response to match expected structure
-            recommendations_data = {
-                'user_id': user_id,
-                'recommendations': recommendations_data,
-                'timestamp': datetime.now().isoformat()
-            }
-        elif method == 'collaborative_filtering':
-            recommendations_data = rec_system.get_user_recommendations_with_knn(user_id, n_recommendations)
-        else:
-            # Default to collaborative filtering method
-            recommendations_data = rec_system.get_user_recommendations_with_knn(user_id, n_recommendations)
-
-        # Add detailed quiz information to recommendations
-        if 'recommendations' in recommendations_data:
-            quiz_ids = [rec['quiz_id'] for rec in recommendations_data['recommendations']]
-            quiz_details = rec_system.get_quiz_details(quiz_ids)
+        g.recommendation_method = method
+
+        # Profiling is admin only and bypasses the response cache
+        profile = profiling_requested()
+        if profile:
+            error = admin_token_error()
+            if error is not None:
+                return error
+
+        with request_profiler(profile) as profiler:
+            # Use the appropriate recommendation method (responses are cached per model version)
+            recommendations_data = rec_system.get_recommendations(user_id, n_recommendations, method, use_cache=not profile)
+
+            # Add detailed quiz information to recommendations (cache lookups), copying the cached response
+            if 'recommendations' in recommendations_data:
+                with metrics.timer('recommender_stage_seconds', stage='enrichment'):
+                    quiz_ids = [rec['quiz_id'] for rec in recommendations_data['recommendations']]
+                    details_map = rec_system.get_quiz_details_map(quiz_ids)
+
+                    # Add details to each recommendation
+                    recommendations_data = {**recommendations_data, 'recommendations': [
+                        {**rec, 'quiz_details': details_map.get(rec['quiz_id'])}
+                        for rec in recommendations_data['recommendations']
+                    ]}
+
+        if profiler is not None:
+            recommendations_data = {**recommendations_data, 'profile': record_profile(
+                profiler, endpoint=request.path, user_id=user_id, method=method, n=n_recommendations
+            )}
+
+        with metrics.timer('recommender_stage_seconds', stage='serialization'):
+            return jsonify(recommendations_data)
+
+    except ProfilerBusyError as e:
+        return jsonify({'error': str(e)}), 429
+    except FutureTimeoutError:
+        logger.error(f"Timed out waiting for recommendations for user {user_id}")
+        return jsonify({'error': 'Timed out waiting for recommendations'}), 503
+    except Exception as e:
+        logger.error(f"Error getting recommendations for user {user_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-            # Create a map of quiz_id to details
-            details_map = {str(detail['quiz_id']): detail for detail in quiz_details}
 
-            # Add details to each recommendation
-            for rec in recommendations_data['recommendations']:
-                quiz_id = rec['quiz_id']
-                if quiz_id in details_map:
-                    rec['quiz_details'] = details_map[quiz_id]
-                else:
-                    rec['quiz_details'] = None
+@app.route('/api/recommendations/popular', methods=['GET'])
+def get_popular_recommendations():
+    """Get the most popular quizzes, optionally within a category and/or level"""
+    try:
+        n_recommendations = int(request.args.get('n', 5))  # Number of recommendations, default 5
+        category_id = request.args.get('category_id', type=int)
+        level = request.args.get('level')
 
-        return jsonify(recommendations_data)
+        return jsonify({
+            'recommendations': rec_system.get_popular_quizzes(n_recommendations, category_id=category_id, level=level),
+            'category_id': category_id,
+            'level': level,
+            'timestamp': datetime.now().isoformat()
+        })
 
     except Exception as e:
-        logger.error(f"Error getting recommendations for user {user_id}: {str(e)}")
+        logger.error(f"Error getting popular quizzes: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
@@ -993,60 +1985,108 @@ def get_batch_recommendations():
         user_ids = data.get('user_ids', [])
         n_recommendations = data.get('n', 5)
         method = data.get('method', 'collaborative_filtering')  # Method: content_based, collaborative_filtering
+        g.recommendation_method = method
+
+        # Profiling is admin only and bypasses the response cache
+        profile = profiling_requested()
+        if profile:
+            error = admin_token_error()
+            if error is not None:
+                return error
+
+        with request_profiler(profile) as profiler:
+            # Per-user responses come from the response cache, misses are computed together
+            batch_recommendations = rec_system.get_batch_recommendations(
+                user_ids, n_recommendations, method, use_cache=not profile
+            )
 
-        batch_recommendations = {}
-        for user_id in user_ids:
-            # Use the appropriate recommendation method
-            if method == 'content_based':
-                recommendations = rec_system.content_based_recommend(user_id, n_recommendations)
-                # Format the response to match expected structure
-                recommendations = {
-                    'user_id': user_id,
-                    'recommendations': recommendations,
-                    'timestamp': datetime.now().isoformat()
-                }
-            elif method == 'content_based_advanced':
-                recommendations = rec_system.content_based_recommend_with_clustering(user_id, n_recommendations)
-                # Format the response to match expected structure
-                recommendations = {
-                    'user_id': user_id,
-                    'recommendations': recommendations,
-                    'timestamp': datetime.now().isoformat()
+            # Add detailed quiz information from the cache for the whole batch
+            with metrics.timer('recommender_stage_seconds', stage='enrichment'):
+                quiz_ids = [
+                    rec['quiz_id']
+                    for recommendations in batch_recommendations.values()
+                    for rec in recommendations.get('recommendations', [])
+                ]
+                details_map = rec_system.get_quiz_details_map(quiz_ids)
+
+                # Add details to each recommendation, copying the cached responses
+                batch_recommendations = {
+                    user_id: {**recommendations, 'recommendations': [
+                        {**rec, 'quiz_details': details_map.get(rec['quiz_id'])}
+                        for rec in recommendations.get('recommendations', [])
+                    ]} if 'recommendations' in recommendations else recommendations
+                    for user_id, recommendations in batch_recommendations.items()
                 }
-            elif method == 'collaborative_filtering':
-                recommendations = rec_system.get_user_recommendations_with_knn(user_id, n_recommendations)
-            else:
-                # Default to collaborative filtering method
-                recommendations = rec_system.get_user_recommendations_with_knn(user_id, n_recommendations)
-
-            # Add detailed quiz information to recommendations
-            if 'recommendations' in recommendations:
-                quiz_ids = [rec['quiz_id'] for rec in recommendations['recommendations']]
-                quiz_details = rec_system.get_quiz_details(quiz_ids)
-
-                # Create a map of quiz_id to details
-                details_map = {str(detail['quiz_id']): detail for detail in quiz_details}
-
-                # Add details to each recommendation
-                for rec in recommendations['recommendations']:
-                    quiz_id = rec['quiz_id']
-                    if quiz_id in details_map:
-                        rec['quiz_details'] = details_map[quiz_id]
-                    else:
-                        rec['quiz_details'] = None
 
-            batch_recommendations[user_id] = recommendations
-
-        return jsonify({
+        response_data = {
             'batch_recommendations': batch_recommendations,
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if profiler is not None:
+            response_data['profile'] = record_profile(
+                profiler, endpoint=request.path, users=len(user_ids), method=method, n=n_recommendations
+            )
+
+        with metrics.timer('recommender_stage_seconds', stage='serialization'):
+            return jsonify(response_data)
 
+    except ProfilerBusyError as e:
+        return jsonify({'error': str(e)}), 429
+    except FutureTimeoutError:
+        logger.error("Timed out waiting for batch recommendations")
+        return jsonify({'error': 'Timed out waiting for recommendations'}), 503
     except Exception as e:
         logger.error(f"Error getting batch recommendations: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+def train_snapshot(model_dir: str) -> dict:
+    """
+    Training process task: update this process's recommender, which saves the snapshot to
+    model_dir. Returns the update trace.
+    A new child (the first one, or a replacement after a crash) starts from the store's current
+    snapshot, so its versions continue after the ones already served instead of restarting at 1.
+    A snapshot that cannot be saved fails the run, so the parent reports the error.
+    """
+    rec_system.training_child = True
+    if rec_system.model_store is None:
+        rec_system.model_store = ModelStore(model_dir, keep_versions=get_setting('MODEL_KEEP_VERSIONS', 3))
+        rec_system.load_persisted_model()
+    rec_system.update_recommendations()
+    return rec_system.update_traces.recent(1)[0]
+
+
+training_process = None
+
+
+def update_in_training_process():
+    """
+    Retrain in the training process and swap in the snapshot it saved. Without MODEL_DIR the
+    snapshots are handed over through a temporary directory.
+    """
+    global training_process
+    if training_process is None:
+        if rec_system.model_store is None:
+            rec_system.model_store = ModelStore(tempfile.mkdtemp(prefix='quiz-models-'), keep_versions=2)
+        training_process = TrainingProcess(train_snapshot)
+
+    record = training_process.run(rec_system.model_store.directory)
+    start = time.perf_counter()
+    rec_system.reload_persisted_model()
+    record['stages'].append({'name': 'swap', 'duration': round(time.perf_counter() - start, 4)})
+    rec_system.update_traces.add_record(record)
+
+
+def retrain():
+    """
+    Run one model update, in the training process unless disabled or in the trainer role
+    """
+    if MODEL_ROLE == 'standalone' and TRAIN_IN_SUBPROCESS:
+        update_in_training_process()
+    else:
+        rec_system.update_recommendations()
+
+
 def continuous_update():
     """
     Function to continuously update recommendations every 5 minutes
@@ -1056,7 +2096,7 @@ def continuous_update():
     # Update recommendations initially
     try:
         logger.info("Performing initial recommendation system update...")
-        rec_system.update_recommendations()
+        retrain()
     except Exception as e:
         logger.error(f"Error during initial update: {str(e)}")
 
@@ -1067,7 +2107,7 @@ def continuous_update():
 
             # Update the recommendation system with latest data
             logger.info("Starting periodic recommendation system update...")
-            rec_system.update_recommendations()
+            retrain()
             logger.info("Periodic recommendation system update completed.")
 
         except Exception as e:
@@ -1086,11 +2126,81 @@ def start_continuous_updater():
     logger.info("Continuous updater thread started.")
 
 
-if __name__ == '__main__':
-    # Start the continuous updater in a background thread
-    start_continuous_updater()
+# Held for the life of the process that saves snapshots to MODEL_DIR
+trainer_lock = None
+
+
+def claim_model_dir() -> bool:
+    """
+    Take the trainer lock on MODEL_DIR so no other process saves snapshots there.
+    Returns False if another trainer holds it.
+    """
+    global trainer_lock
+    if rec_system.model_store is None:
+        return True
+    lock = TrainerLock(rec_system.model_store.directory)
+    if not lock.acquire():
+        logger.error(f"Another trainer is saving snapshots to {rec_system.model_store.directory} ({lock.path})")
+        return False
+    trainer_lock = lock
+    return True
+
+
+def run_trainer():
+    """
+    Trainer role: retrain every 5 minutes and save each snapshot to MODEL_DIR, without serving requests
+    """
+    if not claim_model_dir():
+        sys.exit(1)
+    logger.info(f"Training into {rec_system.model_store.directory}")
+    continuous_update()
+
+
+model_watcher_pid = None
+model_watcher_lock = threading.Lock()
+
+
+def watch_model_store():
+    """
+    Server role: poll MODEL_DIR and swap in each snapshot the trainer saves
+    """
+    while True:
+        time.sleep(MODEL_POLL_SECONDS)
+        try:
+            rec_system.reload_persisted_model()
+        except Exception as e:
+            logger.error(f"Error reloading model from {rec_system.model_store.directory}: {str(e)}")
 
-    # Start Flask app
-    port = int(os.getenv('PORT', 5000))
-    logger.info(f"Starting Flask app on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
+
+def start_model_watcher():
+    """
+    Start the model watcher thread once per process
+    """
+    global model_watcher_pid
+    with model_watcher_lock:
+        if model_watcher_pid == os.getpid():
+            return
+        model_watcher_pid = os.getpid()
+    threading.Thread(target=watch_model_store, daemon=True).start()
+    logger.info(f"Watching {rec_system.model_store.directory} for new model snapshots (pid {model_watcher_pid})")
+
+
+if MODEL_ROLE == 'server':
+    start_model_watcher()
+
+
+if __name__ == '__main__':
+    if MODEL_ROLE == 'trainer':
+        # Retrain in the foreground, the server processes answer requests
+        run_trainer()
+    else:
+        if MODEL_ROLE == 'standalone':
+            # Start the continuous updater in a background thread
+            if not claim_model_dir():
+                sys.exit(1)
+            start_continuous_updater()
+
+        # Start Flask app
+        port = int(os.getenv('PORT', 5000))
+        logger.info(f"Starting Flask app on port {port}")
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationWriter:
+    """
+    Materializes precomputed top-N recommendations into the RecommendedQuizzes table so the
+    web tier can read them straight from SQL.
+    Keeps the last written ranking per user in memory and only rewrites users whose
+    ranking or predicted ratings changed.
+    """
+
+    DELETE_QUERY = text(
+        "DELETE FROM RecommendedQuizzes WHERE UserId IN :user_ids"
+    ).bindparams(bindparam('user_ids', expanding=True))
+
+    INSERT_QUERY = text("""
+        INSERT INTO RecommendedQuizzes (UserId, QuizId, PredictedRating, CreatedAt)
+        VALUES (:user_id, :quiz_id, :predicted_rating, :created_at)
+    """)
+
+    def __init__(self, engine, chunk_size: int = 500):
+        self.engine = engine
+        # Users rewritten per transaction (also bounds the DELETE ... IN list)
+        self.chunk_size = chunk_size
+        # {user_id: ((quiz_id, predicted_rating), ...)} as last written, None until seeded
+        self.written = None
+
+    def load_written(self) -> dict:
+        """
+        Seed the in-memory state from what is currently in RecommendedQuizzes
+        """
+        query = """
+        SELECT UserId AS user_id, QuizId AS quiz_id, PredictedRating AS predicted_rating
+        FROM RecommendedQuizzes
+        ORDER BY UserId, Id
+        """
+        written = {}
+        with self.engine.connect() as conn:
+            for user_id, quiz_id, predicted_rating in conn.execute(text(query)):
+                written.setdefault(int(user_id), []).append(
+                    (str(quiz_id), round(float(predicted_rating), 2))
+                )
+        self.written = {user_id: tuple(rows) for user_id, rows in written.items()}
+        logger.info(f"Loaded materialized recommendations for {len(self.written)} users")
+        return self.written
+
+    def write(self, recommendations: dict) -> int:
+        """
+        Write {user_id: [{'quiz_id', 'predicted_rating'}, ...]} (best first) to RecommendedQuizzes.
+        Users that no longer get recommendations have their rows removed.
+        Each changed user's rows are deleted and re-inserted in the same transaction, so readers
+        see either the old or the new list. Returns the number of users rewritten.
+        """
+        if self.written is None:
+            self.load_written()
+
+        target = {
+            int(user_id): tuple((str(rec['quiz_id']), round(float(rec['predicted_rating']), 2)) for rec in recs)
+            for user_id, recs in recommendations.items()
+        }
+        changed_users = [user_id for user_id, rows in target.items() if self.written.get(user_id, ()) != rows]
+        changed_users += [user_id for user_id in self.written if user_id not in target]
+
+        created_at = datetime.utcnow()
+        for start in range(0, len(changed_users), self.chunk_size):
+            chunk = changed_users[start:start + self.chunk_size]
+            insert_rows = [
+                {'user_id': user_id, 'quiz_id': quiz_id, 'predicted_rating': predicted_rating, 'created_at': created_at}
+                for user_id in chunk
+                for quiz_id, predicted_rating in target.get(user_id, ())
+            ]
+            with self.engine.begin() as conn:
+                conn.execute(self.DELETE_QUERY, {'user_ids': chunk})
+                if insert_rows:
+                    # A list of parameter sets runs as executemany (fast_executemany on SQL Server)
+                    conn.execute(self.INSERT_QUERY, insert_rows)
+
+            for user_id in chunk:
+                if target.get(user_id):
+                    self.written[user_id] = target[user_id]
+                else:
+                    self.written.pop(user_id, None)
+
+        logger.info(f"Materialized recommendations: {len(changed_users)} of {len(target)} users rewritten")
+        return len(changed_users)
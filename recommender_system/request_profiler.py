@@ -0,0 +1,110 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metrics import metrics
+
+# One profiled request at a time: the interpreter's profiler hooks are process-wide on newer Pythons
+_profiling_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+class RequestProfiler:
+    """
+    Runs one request under cProfile and collects the stage timings recorded through the metrics
+    hooks in the same thread. report() returns the wall-clock time, the per-stage breakdown and the
+    top_n functions by cumulative time. Only used when a request asks for it, so normal requests
+    pay nothing.
+    """
+
+    def __init__(self, top_n: int = 25):
+        self.top_n = top_n
+        self.wall_seconds = None
+        self.observations = []
+        self._profile = None
+        self._capture = None
+
+    def __enter__(self):
+        if not _profiling_lock.acquire(blocking=False):
+            raise ProfilerBusyError("Another request is being profiled")
+        self._capture = metrics.capture()
+        self.observations = self._capture.__enter__()
+        self._profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        self.wall_seconds = time.perf_counter() - self._start
+        self._capture.__exit__(exc_type, exc, tb)
+        _profiling_lock.release()
+        return False
+
+    def stage_breakdown(self) -> list:
+        """
+        Wall-clock seconds and call count per instrumented stage/function, in first-seen order
+        """
+        stages = {}
+        for name, labels, seconds in self.observations:
+            key = (name,) + tuple(sorted(labels.items()))
+            stage = stages.get(key)
+            if stage is None:
+                stage = stages[key] = {'metric': name, **labels, 'seconds': 0.0, 'calls': 0}
+            stage['seconds'] += seconds
+            stage['calls'] += 1
+        for stage in stages.values():
+            stage['seconds'] = round(stage['seconds'], 6)
+        return list(stages.values())
+
+    def hotspots(self) -> list:
+        """
+        Top functions by cumulative time
+        """
+        stats = pstats.Stats(self._profile).sort_stats('cumulative')
+        hotspots = []
+        for func in stats.fcn_list[:self.top_n]:
+            primitive_calls, total_calls, total_time, cumulative_time, _ = stats.stats[func]
+            filename, line, function = func
+            hotspots.append({
+                'function': f"{os.path.basename(filename)}:{line}({function})" if line else function,
+                'calls': total_calls,
+                'total_seconds': round(total_time, 6),
+                'cumulative_seconds': round(cumulative_time, 6)
+            })
+        return hotspots
+
+    def report(self) -> dict:
+        return {
+            'profiled_at': datetime.now().isoformat(),
+            'wall_seconds': round(self.wall_seconds, 6),
+            'stages': self.stage_breakdown(),
+            'hotspots': self.hotspots()
+        }
+
+
+class ProfileLog:
+    """
+    The last max_profiles request profiles, for retrieval after the fact
+    """
+
+    def __init__(self, max_profiles: int = 20):
+        self.profiles = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self._lock:
+            self.profiles.append(profile)
+
+    def recent(self, limit: int = None) -> list:
+        with self._lock:
+            profiles = list(self.profiles)
+        profiles.reverse()
+        return profiles[:limit] if limit else profiles
@@ -0,0 +1,84 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of recommendation responses keyed by (user_id, method, n) for one model
+    version. A lookup or store with a newer version drops every entry, so responses never outlive
+    the snapshot they were computed from; lookups for an older version (requests still running on
+    the previous snapshot) are misses and their stores are ignored. Versions only need to be
+    ordered, e.g. ModelSnapshot.cache_version.
+    Entries are evicted least recently used first beyond max_entries or max_bytes (approximate
+    JSON size). Cached responses are shared, callers must not modify them.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        # {(user_id, method, n): (size, response)}, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _sync_version(self, version: int) -> bool:
+        """
+        Switch to a newer model version (clearing the cache). Returns False for an older version.
+        """
+        if self.version is None or version > self.version:
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+        return version == self.version
+
+    def get(self, key: tuple, version: int):
+        """
+        Cached response for key under the given model version, or None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key) if self._sync_version(version) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, version: int, response):
+        if not self.enabled:
+            return
+        size = len(json.dumps(response, default=str))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if not self._sync_version(version):
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[key] = (size, response)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._bytes -= self._entries.popitem(last=False)[1][0]
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'model_version': self.version
+        }
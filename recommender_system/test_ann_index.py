@@ -0,0 +1,96 @@
+"""
+Test script for the nearest-neighbor indexes against exact search
+"""
+import os
+import sys
+import numpy as np
+import scipy.sparse as sp
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ann_index import ExactIndex, IVFIndex, build_index, load_index, normalize_vectors, recall_at_k, top_n_indices
+
+
+def make_topic_vectors(n_items=4000, n_terms=120, n_topics=40, seed=3):
+    """
+    Sparse unit-length vectors grouped into topics, like TF-IDF vectors of quizzes
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.random((n_topics, n_terms)) ** 6
+    dense = topics[rng.integers(0, n_topics, n_items)] * rng.random((n_items, n_terms))
+    dense[dense < np.quantile(dense, 0.9)] = 0
+    return normalize_vectors(sp.csr_matrix(dense))
+
+
+def test_ann_index():
+    """
+    Check exact search ties and masks, IVF recall and fallbacks, and the saved index round trip
+    """
+    vectors = make_topic_vectors()
+    rng = np.random.default_rng(5)
+    # User-like profiles: the normalized mean of three random rows
+    profiles = np.vstack([np.asarray(vectors[rows].sum(axis=0))
+                          for rows in rng.integers(0, vectors.shape[0], (50, 3))])
+    queries = normalize_vectors(profiles)
+
+    exact = ExactIndex(vectors)
+    mask = np.ones(vectors.shape[0], dtype=bool)
+    mask[::2] = False
+    top, scores = exact.search(queries[0], 10, mask)
+    expected = top_n_indices(np.asarray(vectors @ queries[0]).ravel(), 10, mask)
+    assert np.array_equal(top, expected) and np.all(top % 2 == 1)
+    assert np.all(np.diff(scores) <= 0)
+    print("OK - Exact search matches top_n_indices over every row and honours the candidate mask")
+
+    index = build_index(vectors, method='ivf', min_items=1000, n_probe=8)
+    assert isinstance(index, IVFIndex) and index.n_lists == int(np.sqrt(vectors.shape[0]))
+    assert index.list_offsets[-1] == vectors.shape[0]
+    assert np.array_equal(np.sort(index.list_rows), np.arange(vectors.shape[0]))
+    recall = recall_at_k(index, exact, queries, 10)
+    assert recall >= 0.9 and index.recall_at_k >= 0.9, (recall, index.recall_at_k)
+    top, scores = index.search(queries[0], 10, mask)
+    assert len(top) == 10 and np.all(top % 2 == 1)
+    assert np.allclose(scores, np.asarray(vectors[top] @ queries[0]).ravel())
+    print(f"OK - IVF index over {vectors.shape[0]} rows: recall@10 {recall:.3f} (estimated {index.recall_at_k})")
+
+    blockwise = IVFIndex.build(vectors, n_probe=8, block_size=300)
+    assert np.array_equal(IVFIndex._assign(vectors, index.centroids, 300),
+                          np.asarray(vectors @ index.centroids.T).argmax(axis=1).ravel())
+    assert np.array_equal(blockwise.list_rows, index.list_rows)
+    print("OK - Blockwise assignment matches scoring every row at once")
+
+    # Too few candidates in the probed cells: more cells are searched until k are found
+    narrow = IVFIndex(vectors, index.centroids, index.list_offsets, index.list_rows, n_probe=1)
+    sparse_mask = np.zeros(vectors.shape[0], dtype=bool)
+    sparse_mask[rng.choice(vectors.shape[0], 30, replace=False)] = True
+    top, _ = narrow.search(queries[1], 20, sparse_mask)
+    assert len(top) == 20 and np.all(sparse_mask[top])
+    top, _ = narrow.search(queries[1], 50, sparse_mask)
+    assert sorted(top.tolist()) == np.flatnonzero(sparse_mask).tolist()
+    print("OK - Searches widen to more cells when the probed ones hold too few candidates")
+
+    assert isinstance(build_index(vectors, method='ivf', min_items=5000), ExactIndex)
+    assert isinstance(build_index(vectors, method='exact', min_items=0), ExactIndex)
+    try:
+        build_index(vectors, method='hnsw')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+    print("OK - Small catalogs and method 'exact' fall back to exact search, unknown methods are rejected")
+
+    features = normalize_vectors(np.random.default_rng(9).standard_normal((3000, 6)))
+    feature_index = build_index(features, method='ivf', min_items=1000)
+    restored = load_index(dict(feature_index.params(), recall_at_k=feature_index.recall_at_k),
+                          feature_index.arrays(), features)
+    for query in features[:20]:
+        assert np.array_equal(restored.search(query, 15)[0], feature_index.search(query, 15)[0])
+    assert restored.recall_at_k == feature_index.recall_at_k
+    assert isinstance(load_index(ExactIndex(features).params(), {}, features), ExactIndex)
+    print("OK - Dense feature index is restored from its params and arrays")
+
+    print("\nAll nearest-neighbor index checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_ann_index()
@@ -0,0 +1,122 @@
+"""
+Test script checking the vectorized item-based CF scoring against the original weighted-sum loop
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from item_neighbors import compute_item_neighbors
+from quiz_recommendation_system import QuizRecommendationSystem
+
+
+def make_sample_ratings(n_users=60, n_quizzes=40, seed=7):
+    """
+    Build a random sparse set of 1-5 ratings
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for student_id in range(1, n_users + 1):
+        for quiz in rng.choice(n_quizzes, size=rng.integers(1, 10), replace=False):
+            rows.append((student_id, f"quiz-{quiz:03d}", int(rng.integers(1, 6))))
+    return pd.DataFrame(rows, columns=['student_id', 'quiz_id', 'rating'])
+
+
+def reference_predictions(df, user_id):
+    """
+    The original dense pivot_table + per-quiz loop, kept here as the reference
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    matrix = df.pivot_table(index='student_id', columns='quiz_id', values='rating', fill_value=0)
+    similarity = pd.DataFrame(cosine_similarity(matrix.T), index=matrix.columns, columns=matrix.columns)
+    user_ratings = matrix.loc[user_id]
+    rated_quiz_ids = user_ratings[user_ratings != 0].index.tolist()
+
+    predictions = {}
+    for quiz_id in matrix.columns:
+        if user_ratings[quiz_id] == 0:
+            similar_items = similarity[quiz_id]
+            weighted_sum = sum(similar_items[r] * user_ratings[r] for r in rated_quiz_ids)
+            similarity_sum = sum(abs(similar_items[r]) for r in rated_quiz_ids)
+            if similarity_sum > 0:
+                predictions[quiz_id] = weighted_sum / similarity_sum
+    return predictions
+
+
+def test_vectorized_cf_matches_reference():
+    df = make_sample_ratings()
+
+    # Keep every neighbor so the pruned store is exact
+    rec_system = QuizRecommendationSystem('sqlite://', k_neighbors=3, similarity_top_k=0)
+    rec_system.build_user_item_matrix(df)
+    rec_system.compute_item_similarity()
+
+    for user_id in rec_system.user_item_matrix.index[:20]:
+        expected = reference_predictions(df, user_id)
+        rated_indices, rated_values = rec_system.user_item_matrix.user_ratings(user_id)
+        predicted, has_prediction = rec_system.predict_ratings(rated_indices, rated_values.astype(np.float64))
+
+        quiz_ids = rec_system.user_item_matrix.quiz_ids
+        actual = {quiz_ids[i]: predicted[i] for i in np.flatnonzero(has_prediction)}
+        assert set(actual) == set(expected), f"Different candidate quizzes for user {user_id}"
+        for quiz_id, rating in expected.items():
+            # Similarities are stored as float32
+            assert abs(actual[quiz_id] - rating) < 1e-5, f"Prediction mismatch for user {user_id}, quiz {quiz_id}"
+
+        # Top-N must be the best predictions in descending order
+        top = rec_system.recommend_for_user(user_id, 5)
+        best = sorted(expected.values(), reverse=True)[:5]
+        assert np.allclose([rec['predicted_rating'] for rec in top], [round(r, 2) for r in best], atol=0.011)
+
+    print("OK - Vectorized CF predictions match the weighted-sum loop")
+    return True
+
+
+def test_top_k_neighbor_store():
+    df = make_sample_ratings()
+
+    rec_system = QuizRecommendationSystem('sqlite://', k_neighbors=3, similarity_top_k=5,
+                                          similarity_min_score=0.05, similarity_block_size=7)
+    rec_system.build_user_item_matrix(df)
+    rec_system.compute_item_similarity()
+    store = rec_system.item_neighbors
+
+    from sklearn.metrics.pairwise import cosine_similarity
+    full = cosine_similarity(rec_system.user_item_matrix.item_matrix)
+    np.fill_diagonal(full, -1)
+
+    for item_idx in range(store.n_items):
+        neighbor_indices, neighbor_scores = store.neighbors(item_idx)
+        assert len(neighbor_indices) <= 5 and np.all(neighbor_scores > 0.05)
+        assert np.all(np.diff(neighbor_indices) > 0) and item_idx not in neighbor_indices
+        assert np.allclose(neighbor_scores, full[item_idx, neighbor_indices], atol=1e-6)
+        # Nothing better than the weakest kept neighbor was dropped (unless the row is full)
+        if len(neighbor_indices) < 5:
+            assert np.sum(full[item_idx] > 0.05) == len(neighbor_indices)
+
+    print(f"OK - Neighbor store keeps top-5 per quiz: {store.nnz} pairs, {store.nbytes} bytes")
+    return True
+
+
+def test_parallel_neighbor_store_matches_serial():
+    df = make_sample_ratings(n_users=200, n_quizzes=90)
+
+    rec_system = QuizRecommendationSystem('sqlite://', similarity_top_k=10, similarity_block_size=16)
+    item_matrix = rec_system.build_user_item_matrix(df, publish=False).item_matrix
+    serial = compute_item_neighbors(item_matrix, top_k=10, block_size=16)
+    parallel = compute_item_neighbors(item_matrix, top_k=10, block_size=16, workers=3)
+
+    assert np.array_equal(serial.indptr, parallel.indptr)
+    assert np.array_equal(serial.indices, parallel.indices)
+    assert np.array_equal(serial.scores, parallel.scores)
+    print(f"OK - Blocks computed by 3 worker processes match the serial store ({parallel.nnz} pairs)")
+    return True
+
+
+if __name__ == "__main__":
+    test_vectorized_cf_matches_reference()
+    test_top_k_neighbor_store()
+    test_parallel_neighbor_store_matches_serial()
@@ -0,0 +1,74 @@
+"""
+Test script for the watermark-based delta loading of QuizFeedbacks
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quiz_recommendation_system import QuizRecommendationSystem
+
+
+def test_delta_loading():
+    """
+    Run inserts, edits, cleared scores and deletes against a copy of quiz_app.db
+    and check that the rating store always matches the table
+    """
+    source_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_app.db')
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'quiz_app_delta.db')
+    shutil.copy(source_db, db_path)
+
+    rec_system = QuizRecommendationSystem(f'sqlite:///{db_path}', k_neighbors=3)
+    conn = sqlite3.connect(db_path)
+
+    def scored_rows():
+        return conn.execute("SELECT COUNT(*) FROM QuizFeedbacks WHERE Score IS NOT NULL").fetchone()[0]
+
+    try:
+        df, changed = rec_system.refresh_ratings()
+        assert changed and len(df) == scored_rows()
+        print(f"OK - Initial load: {len(df)} ratings, watermark Id {rec_system.last_feedback_id}")
+
+        df, changed = rec_system.refresh_ratings()
+        assert not changed
+        print("OK - No changes detected when the table is unchanged")
+
+        quiz_id = conn.execute("SELECT QuizId FROM QuizFeedbacks LIMIT 1").fetchone()[0]
+        conn.execute(
+            "INSERT INTO QuizFeedbacks (StudentId, QuizId, Score, CreatedOn) VALUES (?, ?, ?, ?)",
+            (999, quiz_id, 5, '2099-01-01 00:00:00')
+        )
+        conn.commit()
+        df, changed = rec_system.refresh_ratings()
+        assert changed and len(df) == scored_rows()
+        print("OK - New feedback row merged")
+
+        feedback_id = conn.execute("SELECT MIN(Id) FROM QuizFeedbacks WHERE Score IS NOT NULL").fetchone()[0]
+        conn.execute("UPDATE QuizFeedbacks SET Score = 1, CreatedOn = '2099-01-02 00:00:00' WHERE Id = ?", (feedback_id,))
+        conn.commit()
+        df, changed = rec_system.refresh_ratings()
+        assert changed and rec_system.rating_store.loc[feedback_id, 'rating'] == 1
+        print("OK - Edited score merged")
+
+        conn.execute("UPDATE QuizFeedbacks SET Score = NULL WHERE Id = ?", (feedback_id,))
+        conn.execute("DELETE FROM QuizFeedbacks WHERE StudentId = 999")
+        conn.commit()
+        df, changed = rec_system.refresh_ratings()
+        assert changed and len(df) == scored_rows()
+        assert feedback_id not in rec_system.rating_store.index
+        print("OK - Cleared and deleted scores picked up by drift detection")
+
+        print("\nAll delta loading checks passed!")
+        return True
+    finally:
+        conn.close()
+        rec_system.engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_delta_loading()
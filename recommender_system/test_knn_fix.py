@@ -34,22 +34,22 @@ if not df.empty:
         print('KNN model fitted successfully!')
         
         # Check if the attributes exist
-        if hasattr(rec_system, 'knn_model'):
+        if rec_system.knn_model is not None:
             print('OK - knn_model attribute exists')
         else:
             print('ERROR - knn_model attribute missing')
 
-        if hasattr(rec_system, 'scaler'):
+        if rec_system.scaler is not None:
             print('OK - scaler attribute exists')
         else:
             print('ERROR - scaler attribute missing')
 
-        if hasattr(rec_system, 'quiz_ids'):
+        if rec_system.quiz_ids is not None:
             print(f'OK - quiz_ids attribute exists ({len(rec_system.quiz_ids)} quizzes)')
         else:
             print('ERROR - quiz_ids attribute missing')
 
-        if hasattr(rec_system, 'quiz_features'):
+        if rec_system.quiz_features is not None:
             print(f'OK - quiz_features attribute exists')
         else:
             print('ERROR - quiz_features attribute missing')
@@ -0,0 +1,61 @@
+"""
+Test script for the Prometheus-style metrics registry
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry
+
+
+def test_metrics_registry():
+    """
+    Check counters, histogram buckets, timers, callback gauges and the disabled switch
+    """
+    registry = MetricsRegistry()
+    registry.describe('requests_total', 'Requests served')
+    registry.inc('requests_total', endpoint='/health', status='200')
+    registry.inc('requests_total', endpoint='/health', status='200')
+    registry.observe('stage_seconds', 0.003, stage='scoring')
+    registry.observe('stage_seconds', 0.2, stage='scoring')
+
+    @registry.timed('function_seconds', function='double')
+    def double(value):
+        return value * 2
+
+    assert double(21) == 42
+    with registry.timer('stage_seconds', stage='serialization'):
+        pass
+    registry.gauge('cache_hit_ratio', lambda: {(('cache', 'response'),): 0.75})
+    registry.gauge('broken_gauge', lambda: 1 / 0)
+
+    text = registry.render()
+    assert '# HELP requests_total Requests served' in text
+    assert 'requests_total{endpoint="/health",status="200"} 2' in text
+    assert 'stage_seconds_bucket{stage="scoring",le="0.005"} 1' in text
+    assert 'stage_seconds_bucket{stage="scoring",le="0.25"} 2' in text
+    assert 'stage_seconds_bucket{stage="scoring",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="serialization"} 1' in text
+    assert 'function_seconds_count{function="double"} 1' in text
+    assert 'cache_hit_ratio{cache="response"} 0.75' in text
+    assert 'broken_gauge' not in text
+    print("OK - Counters, histograms, timers and gauges rendered in the text format")
+
+    registry.inc('label_escaping_total', path='a"b\\c')
+    assert 'label_escaping_total{path="a\\"b\\\\c"} 1' in registry.render()
+    print("OK - Label values escaped")
+
+    disabled = MetricsRegistry(enabled=False)
+    disabled.inc('requests_total')
+    with disabled.timer('stage_seconds', stage='scoring'):
+        pass
+    assert disabled.render() == '\n'
+    print("OK - Nothing recorded while disabled")
+
+    print("\nAll metrics checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_metrics_registry()
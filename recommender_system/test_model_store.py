@@ -0,0 +1,135 @@
+"""
+Test script for saving and loading model snapshots
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ann_index import IVFIndex, build_index, normalize_vectors
+from content_model import ContentModel
+from item_neighbors import compute_item_neighbors
+from model_snapshot import ModelSnapshot
+from model_store import ModelStore, TrainerLock
+from popularity import PopularityLeaderboard
+from user_item_matrix import UserItemMatrix
+
+
+def build_snapshot() -> ModelSnapshot:
+    ratings_df = pd.DataFrame({
+        'student_id': [1, 1, 2, 2, 3, 3, 3],
+        'quiz_id': ['q1', 'q2', 'q1', 'q3', 'q2', 'q3', 'q4'],
+        'rating': [5.0, 3.0, 4.0, 2.0, 5.0, 4.0, 1.0]
+    })
+    attributes = pd.DataFrame({
+        'quiz_id': ['q1', 'q2', 'q3', 'q4'],
+        'category_id': [1, 2, 1, 2],
+        'level': ['Easy', 'Hard', 'Easy', 'Medium']
+    })
+    matrix = UserItemMatrix.from_ratings(ratings_df)
+    neighbors = compute_item_neighbors(matrix.item_matrix, top_k=2)
+
+    features = pd.DataFrame({'category_id': [1, 2, 1, 2], 'TotalQuestions': [10, 20, 15, 5]})
+    scaler = StandardScaler()
+    quiz_features = scaler.fit_transform(features)
+    knn_model = NearestNeighbors(n_neighbors=2, metric='cosine').fit(quiz_features)
+
+    vectors = sp.csr_matrix(np.array([[1.0, 0, 0], [0, 1.0, 0], [0.6, 0.8, 0], [0, 0, 1.0]]))
+    content_model = ContentModel(None, vectors, ['q1', 'q2', 'q3', 'q4'])
+    content_model.set_clusters(np.array([0, 1, 0, 1], dtype=np.int32), np.array([[0.8, 0.4, 0], [0, 0.5, 0.5]]))
+    content_model.build_index('ivf', min_items=1, n_probe=1)
+
+    return ModelSnapshot().evolve(
+        user_item_matrix=matrix, item_neighbors=neighbors, knn_model=knn_model, scaler=scaler,
+        quiz_ids=['q1', 'q2', 'q3', 'q4'], quiz_features=quiz_features,
+        feature_index=build_index(normalize_vectors(quiz_features), 'ivf', min_items=1, n_probe=1),
+        content_model=content_model,
+        popularity=PopularityLeaderboard.from_ratings(ratings_df, attributes)
+    )
+
+
+def test_model_store():
+    """
+    Check the round trip of every artifact, memory mapping, CURRENT switching and pruning
+    """
+    temp_dir = tempfile.mkdtemp()
+
+    try:
+        store = ModelStore(temp_dir, keep_versions=2)
+        assert store.load() is None
+        print("OK - Empty store loads nothing")
+
+        snapshot = build_snapshot()
+        store.save(snapshot)
+        loaded = store.load()
+
+        assert loaded.version == snapshot.version and loaded.built_at == snapshot.built_at
+        assert (loaded.user_item_matrix.ratings != snapshot.user_item_matrix.ratings).nnz == 0
+        assert loaded.user_item_matrix.user_index == snapshot.user_item_matrix.user_index
+        assert loaded.user_item_matrix.quiz_index == snapshot.user_item_matrix.quiz_index
+        assert isinstance(loaded.item_neighbors.scores, np.memmap)
+        assert (loaded.item_neighbors.matrix != snapshot.item_neighbors.matrix).nnz == 0
+        assert (loaded.item_neighbors.matrix_t != snapshot.item_neighbors.matrix_t).nnz == 0
+        print("OK - User-item matrix and item neighbors round-trip (memory-mapped)")
+
+        query = snapshot.quiz_features[:1]
+        assert np.array_equal(loaded.knn_model.kneighbors(query)[1], snapshot.knn_model.kneighbors(query)[1])
+        assert np.allclose(loaded.scaler.transform(pd.DataFrame({'category_id': [2], 'TotalQuestions': [12]})),
+                           snapshot.scaler.transform(pd.DataFrame({'category_id': [2], 'TotalQuestions': [12]})))
+        assert loaded.quiz_ids == snapshot.quiz_ids
+        assert isinstance(loaded.feature_index, IVFIndex)
+        unit_query = normalize_vectors(query)[0]
+        assert np.array_equal(loaded.feature_index.search(unit_query, 3)[0], snapshot.feature_index.search(unit_query, 3)[0])
+        print("OK - KNN model, scaler, feature index and feature quiz ids restored")
+
+        content_model = loaded.content_model
+        assert content_model.quiz_index == snapshot.content_model.quiz_index
+        assert np.allclose(content_model.profile_similarities(np.array([0, 2])),
+                           snapshot.content_model.profile_similarities(np.array([0, 2])))
+        assert [members.tolist() for members in content_model.cluster_members] == [[0, 2], [1, 3]]
+        assert content_model.index.kind == 'ivf' and content_model.index.recall_at_k == snapshot.content_model.index.recall_at_k
+        for rows in (np.array([0]), np.array([1, 3])):
+            assert np.array_equal(content_model.search(rows, 2)[0], snapshot.content_model.search(rows, 2)[0])
+        print("OK - Content vectors, clusters and index restored")
+
+        for kwargs in ({}, {'category_id': 1}, {'level': 'easy'}, {'category_id': 2, 'level': 'hard'}):
+            assert loaded.popularity.top(3, **kwargs) == snapshot.popularity.top(3, **kwargs)
+        print("OK - Popularity leaderboard and boards restored")
+
+        for _ in range(3):
+            snapshot = snapshot.evolve()
+            path = store.save(snapshot)
+        assert store.current_path() == path and store.load().version == snapshot.version
+        saved = [name for name in os.listdir(temp_dir) if name != 'CURRENT']
+        assert len(saved) == 2
+        print(f"OK - CURRENT follows the newest save, old versions pruned ({sorted(saved)})")
+
+        partial = ModelStore(temp_dir).save(ModelSnapshot(version=9, popularity=PopularityLeaderboard([], [], [], [])))
+        loaded = ModelStore(temp_dir).load(mmap=False)
+        assert os.path.basename(partial).endswith('-v000009') and loaded.user_item_matrix is None
+        assert loaded.popularity.empty
+        print("OK - Snapshots with missing artifacts round-trip")
+
+        first, second = TrainerLock(temp_dir), TrainerLock(temp_dir)
+        assert first.acquire() and not second.acquire()
+        first.release()
+        assert second.acquire()
+        second.release()
+        print("OK - Only one trainer holds the model directory")
+
+        print("\nAll model store checks passed!")
+        return True
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_model_store()
@@ -0,0 +1,70 @@
+"""
+Test script for the in-memory play-history index
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from play_history import PlayHistoryIndex
+
+
+class StubContentModel:
+    def __init__(self, quiz_ids):
+        self.quiz_index = {quiz_id: row for row, quiz_id in enumerate(quiz_ids)}
+
+
+def test_play_history_index():
+    """
+    Check the initial load, watermark merges, content row mapping and the full rebuild
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'play_history.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE StudentQuizzes (Id INTEGER PRIMARY KEY AUTOINCREMENT, StudentId INTEGER, QuizId TEXT, Status TEXT)")
+    conn.executemany("INSERT INTO StudentQuizzes (StudentId, QuizId, Status) VALUES (?, ?, ?)", [
+        (1, 'q3', 'Completed'), (1, 'q1', 'Started'), (1, 'q3', 'Exited'), (2, 'q2', 'AutoSubmitted')
+    ])
+    conn.commit()
+    engine = create_engine(f'sqlite:///{db_path}')
+
+    try:
+        index = PlayHistoryIndex(engine, full_reload_every=2)
+        assert index.refresh() == 4
+        assert sorted(index.played_quiz_ids(1)) == ['q1', 'q3']
+        assert index.played_codes(1).dtype.name == 'int32'
+        assert len(index.played_codes(99)) == 0
+        print("OK - Initial load, one sorted code array per student")
+
+        conn.execute("INSERT INTO StudentQuizzes (StudentId, QuizId, Status) VALUES (1, 'q4', 'Started')")
+        conn.commit()
+        assert index.refresh() == 1
+        assert sorted(index.played_quiz_ids(1)) == ['q1', 'q3', 'q4']
+        print("OK - Only rows past the Id watermark are read")
+
+        content_model = StubContentModel(['q4', 'q2', 'q3'])
+        assert index.content_rows(index.played_codes(1), content_model).tolist() == [0, 2]
+        print("OK - Played quizzes mapped to content model rows, unknown quizzes skipped")
+
+        conn.execute("DELETE FROM StudentQuizzes WHERE QuizId = 'q4'")
+        conn.commit()
+        assert index.refresh() == 0
+        assert index.refresh() == 4
+        assert sorted(index.played_quiz_ids(1)) == ['q1', 'q3']
+        print("OK - Periodic full rebuild drops deleted rows")
+
+        print("\nAll play history checks passed!")
+        return True
+    finally:
+        conn.close()
+        engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_play_history_index()
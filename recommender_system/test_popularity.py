@@ -0,0 +1,53 @@
+"""
+Test script for the in-memory popularity leaderboard
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from popularity import PopularityLeaderboard
+
+
+def make_ratings():
+    ratings = pd.DataFrame({
+        'quiz_id': ['a', 'a', 'a', 'a', 'b', 'c', 'c', 'd', 'd'],
+        'rating': [5, 5, 5, 4, 5, 4, 4, 2, 3]
+    })
+    attributes = pd.DataFrame({
+        'quiz_id': ['a', 'b', 'c', 'd'],
+        'category_id': [1, 2, 1, 1],
+        'level': ['Easy', 'Hard', 'easy', 'Medium']
+    })
+    return ratings, attributes
+
+
+def test_popularity_leaderboard():
+    """
+    Check the ranking (average, then count), the category/level boards and Bayesian smoothing
+    """
+    ratings, attributes = make_ratings()
+
+    leaderboard = PopularityLeaderboard.from_ratings(ratings, attributes)
+    assert [rec['quiz_id'] for rec in leaderboard.top(10)] == ['b', 'a', 'c', 'd']
+    assert leaderboard.top(2)[1] == {'quiz_id': 'a', 'predicted_rating': 4.75, 'rating_count': 4, 'method': 'popular'}
+    print("OK - Ranked by average rating, then rating count")
+
+    assert [rec['quiz_id'] for rec in leaderboard.top(10, category_id=1)] == ['a', 'c', 'd']
+    assert [rec['quiz_id'] for rec in leaderboard.top(10, level='EASY')] == ['a', 'c']
+    assert [rec['quiz_id'] for rec in leaderboard.top(1, category_id=1, level='medium')] == ['d']
+    assert leaderboard.top(5, category_id=99) == []
+    print("OK - Per-category and per-level leaderboards")
+
+    smoothed = PopularityLeaderboard.from_ratings(ratings, attributes, prior_weight=3)
+    assert [rec['quiz_id'] for rec in smoothed.top(10)] == ['a', 'b', 'c', 'd']
+    print("OK - Bayesian smoothing ranks a single 5-star rating below a consistently well-rated quiz")
+
+    print("\nAll popularity leaderboard checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_popularity_leaderboard()
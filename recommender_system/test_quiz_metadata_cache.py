@@ -0,0 +1,120 @@
+"""
+Test script for the in-process quiz metadata cache
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quiz_metadata_cache import QuizMetadataCache
+
+
+def create_quizzes(db_path, count):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE Quizzes (
+            Id TEXT PRIMARY KEY, Name TEXT, Description TEXT, CategoryId INTEGER,
+            TotalQuestions INTEGER, TimeInMinutes INTEGER, Level TEXT, CreatedAt DATETIME
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO Quizzes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(f'QUIZ-{i}', f'Quiz {i}', 'description', i % 3, 10, 5, 'Easy', f'2024-01-{i + 1:02d}')
+         for i in range(count)]
+    )
+    conn.commit()
+    return conn
+
+
+def test_quiz_metadata_cache():
+    """
+    Check preloading, hit/miss counting, reload on a Quizzes insert or edit, negative caching and LRU eviction
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'quiz_metadata.db')
+    conn = create_quizzes(db_path, 5)
+    engine = create_engine(f'sqlite:///{db_path}')
+
+    try:
+        cache = QuizMetadataCache(engine)
+        assert cache.refresh()
+        assert cache.stats()['entries'] == 5
+        assert not cache.refresh()
+        print("OK - Preloaded once, skipped while Quizzes is unchanged")
+
+        details = cache.get_many(['quiz-1', 'QUIZ-2'])
+        assert details['quiz-1']['name'] == 'Quiz 1'
+        assert details['QUIZ-2']['category_id'] == 2
+        assert (cache.hits, cache.misses) == (2, 0)
+        print("OK - Lookups are served from memory, ids matched case-insensitively")
+
+        conn.execute("INSERT INTO Quizzes VALUES ('QUIZ-5', 'Quiz 5', 'new', 1, 10, 5, 'Hard', '2024-02-01')")
+        conn.commit()
+        assert cache.refresh()
+        assert cache.get_many(['QUIZ-5'])['QUIZ-5']['level'] == 'Hard'
+        print("OK - New quizzes trigger a reload")
+
+        conn.execute("UPDATE Quizzes SET Name = 'Quiz 1 (edited)' WHERE Id = 'QUIZ-1'")
+        conn.commit()
+        assert cache.refresh()
+        assert cache.get_many(['QUIZ-1'])['QUIZ-1']['name'] == 'Quiz 1 (edited)'
+        conn.execute("UPDATE Quizzes SET Level = 'Medium', TimeInMinutes = 15 WHERE Id = 'QUIZ-2'")
+        conn.commit()
+        assert cache.refresh()
+        assert cache.get_many(['QUIZ-2'])['QUIZ-2']['level'] == 'Medium'
+        assert not cache.refresh()
+        print("OK - In-place edits of served columns trigger a reload")
+
+        conn.execute("ALTER TABLE Quizzes RENAME TO QuizzesMoved")
+        conn.commit()
+        try:
+            cache.refresh()
+            assert False, 'expected a database error'
+        except Exception as e:
+            assert 'Quizzes' in str(e)
+        finally:
+            conn.execute("ALTER TABLE QuizzesMoved RENAME TO Quizzes")
+            conn.commit()
+        conn.execute("UPDATE Quizzes SET Description = 'changed' WHERE Id = 'QUIZ-3'")
+        conn.commit()
+        assert cache.refresh()
+        assert cache.get_many(['QUIZ-3'])['QUIZ-3']['description'] == 'changed'
+        print("OK - A failed version check is retried on the next refresh")
+
+        assert cache.get_many(['missing'])['missing'] is None
+        misses = cache.misses
+        assert cache.get_many(['missing'])['missing'] is None
+        assert cache.misses == misses
+        print("OK - Unknown ids are cached as missing")
+
+        small_cache = QuizMetadataCache(engine, max_entries=2)
+        small_cache.get_many(['QUIZ-0', 'QUIZ-1'])
+        small_cache.get_many(['QUIZ-0'])
+        small_cache.get_many(['QUIZ-3'])
+        assert small_cache.stats()['entries'] == 2
+        misses = small_cache.misses
+        small_cache.get_many(['QUIZ-0'])
+        small_cache.get_many(['QUIZ-1'])
+        assert small_cache.misses == misses + 1
+        print("OK - Least recently used entries are evicted")
+
+        expired_cache = QuizMetadataCache(engine, ttl_seconds=0)
+        expired_cache.refresh()
+        assert expired_cache.refresh()
+        print("OK - Expired preloads are reloaded")
+
+        print("\nAll quiz metadata cache checks passed!")
+        return True
+    finally:
+        conn.close()
+        engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_quiz_metadata_cache()
@@ -0,0 +1,84 @@
+"""
+Test script for materializing top-N recommendations into RecommendedQuizzes
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quiz_recommendation_system import QuizRecommendationSystem
+
+
+def test_recommendation_writer():
+    """
+    Materialize recommendations for a copy of quiz_app.db and check that only
+    changed users are rewritten and the table matches the in-memory top-N
+    """
+    source_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_app.db')
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'quiz_app_materialize.db')
+    shutil.copy(source_db, db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS RecommendedQuizzes (
+            Id INTEGER PRIMARY KEY AUTOINCREMENT, UserId INTEGER, QuizId TEXT,
+            PredictedRating DECIMAL(18,2), CreatedAt DATETIME
+        )
+    """)
+    conn.commit()
+
+    rec_system = QuizRecommendationSystem(f'sqlite:///{db_path}', k_neighbors=3, materialize_top_n=5)
+
+    def table_rows(user_id):
+        rows = conn.execute(
+            "SELECT QuizId, PredictedRating FROM RecommendedQuizzes WHERE UserId = ? ORDER BY Id", (user_id,)
+        ).fetchall()
+        return [(str(quiz_id), round(float(rating), 2)) for quiz_id, rating in rows]
+
+    try:
+        rec_system.refresh_ratings()
+        rec_system.build_user_item_matrix(rec_system.get_ratings_frame())
+        rec_system.compute_item_similarity()
+
+        rewritten = rec_system.materialize_recommendations()
+        user_ids = rec_system.user_item_matrix.index.tolist()
+        expected = rec_system.recommend_for_users(user_ids, 5)
+        for user_id in user_ids:
+            assert table_rows(user_id) == [(rec['quiz_id'], rec['predicted_rating']) for rec in expected[user_id]]
+        print(f"OK - Initial write-back: {rewritten} users written")
+
+        rec_system._materialized_matrix = None
+        assert rec_system.materialize_recommendations() == 0
+        print("OK - Unchanged recommendations are not rewritten")
+
+        # A fresh instance seeds its state from the table instead of rewriting everything
+        fresh_system = QuizRecommendationSystem(f'sqlite:///{db_path}', k_neighbors=3, materialize_top_n=5)
+        fresh_system.publish_snapshot(
+            user_item_matrix=rec_system.user_item_matrix, item_neighbors=rec_system.item_neighbors
+        )
+        assert fresh_system.materialize_recommendations() == 0
+        fresh_system.engine.dispose()
+        print("OK - Restarted writer picks up the existing rows")
+
+        user_id = user_ids[0]
+        rec_system.recommendation_writer.written[user_id] = ()
+        conn.execute("DELETE FROM RecommendedQuizzes WHERE UserId = ?", (user_id,))
+        conn.commit()
+        assert rec_system.recommendation_writer.write(expected) == 1
+        assert len(table_rows(user_id)) == len(expected[user_id])
+        print("OK - Only the changed user is rewritten")
+
+        print("\nAll recommendation write-back checks passed!")
+        return True
+    finally:
+        conn.close()
+        rec_system.engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_recommendation_writer()
@@ -0,0 +1,72 @@
+"""
+Test script for the opt-in request profiler
+"""
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import metrics
+from request_profiler import ProfileLog, ProfilerBusyError, RequestProfiler
+
+
+@metrics.timed('recommender_function_seconds', function='score')
+def score(values):
+    return sorted(values, reverse=True)[:5]
+
+
+def test_request_profiler():
+    """
+    Check the stage breakdown, hotspots, the one-at-a-time guard and the profile log
+    """
+    with RequestProfiler(top_n=10) as profiler:
+        for _ in range(3):
+            score(list(range(1000)))
+        with metrics.timer('recommender_stage_seconds', stage='enrichment'):
+            pass
+
+    report = profiler.report()
+    stages = {stage.get('function') or stage.get('stage'): stage for stage in report['stages']}
+    assert stages['score']['calls'] == 3 and stages['enrichment']['calls'] == 1
+    assert any('score' in hotspot['function'] for hotspot in report['hotspots'])
+    assert len(report['hotspots']) <= 10 and report['wall_seconds'] > 0
+    print(f"OK - Stage breakdown and {len(report['hotspots'])} hotspots in {report['wall_seconds']}s")
+
+    with metrics.capture() as observations:
+        score([1, 2, 3])
+    assert len(observations) == 1
+    score([1, 2, 3])
+    assert len(observations) == 1
+    print("OK - Observations are only captured inside the profiled context")
+
+    errors = []
+    with RequestProfiler():
+        thread = threading.Thread(target=lambda: errors.append(_try_profile()))
+        thread.start()
+        thread.join()
+    assert errors == ['busy']
+    assert _try_profile() == 'ok'
+    print("OK - Only one request is profiled at a time")
+
+    profile_log = ProfileLog(max_profiles=2)
+    for user_id in (1, 2, 3):
+        profile_log.add({'user_id': user_id})
+    assert [profile['user_id'] for profile in profile_log.recent()] == [3, 2]
+    print("OK - Recent profiles kept for retrieval")
+
+    print("\nAll request profiler checks passed!")
+    return True
+
+
+def _try_profile():
+    try:
+        with RequestProfiler():
+            pass
+        return 'ok'
+    except ProfilerBusyError:
+        return 'busy'
+
+
+if __name__ == "__main__":
+    test_request_profiler()
@@ -0,0 +1,71 @@
+"""
+Test script for the model-version-keyed response cache
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache
+
+
+def make_response(user_id, n=3):
+    return {'user_id': user_id, 'recommendations': [{'quiz_id': f'q{i}', 'predicted_rating': 4.0} for i in range(n)]}
+
+
+def test_response_cache():
+    """
+    Check hits and misses, invalidation on a newer model version, and LRU eviction by count and size
+    """
+    cache = ResponseCache(max_entries=2)
+    assert cache.get((1, 'collaborative_filtering', 5), version=1) is None
+    cache.put((1, 'collaborative_filtering', 5), 1, make_response(1))
+    assert cache.get((1, 'collaborative_filtering', 5), version=1) == make_response(1)
+    assert cache.get((1, 'content_based', 5), version=1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    print("OK - Responses cached per (user, method, n)")
+
+    cache.put((1, 'collaborative_filtering', 5), 0, make_response(1))
+    assert cache.stats()['entries'] == 1
+    assert cache.get((1, 'collaborative_filtering', 5), version=2) is None
+    assert cache.stats()['entries'] == 0
+    print("OK - A new model version drops cached responses, stale stores are ignored")
+
+    cache.put((1, 'collaborative_filtering', 5), 2, make_response(1))
+    assert cache.get((1, 'collaborative_filtering', 5), version=1) is None
+    cache.put((1, 'collaborative_filtering', 5), 1, make_response(1, n=2))
+    assert cache.version == 2 and cache.get((1, 'collaborative_filtering', 5), version=2) == make_response(1)
+    print("OK - Requests still on an older version miss without clearing or storing")
+
+    rolled_back = ResponseCache()
+    rolled_back.put((1, 'content_based', 5), (0, 7), make_response(1))
+    assert rolled_back.get((1, 'content_based', 5), version=(1, 3)) is None
+    assert rolled_back.stats()['entries'] == 0 and rolled_back.version == (1, 3)
+    print("OK - A bumped generation replaces a higher version number (rolled back model)")
+
+    for user_id in (1, 2):
+        cache.put((user_id, 'collaborative_filtering', 5), 2, make_response(user_id))
+    cache.get((1, 'collaborative_filtering', 5), version=2)
+    cache.put((3, 'collaborative_filtering', 5), 2, make_response(3))
+    assert cache.get((2, 'collaborative_filtering', 5), version=2) is None
+    assert cache.get((1, 'collaborative_filtering', 5), version=2) is not None
+    print("OK - Least recently used response evicted beyond max_entries")
+
+    size_capped = ResponseCache(max_entries=100, max_bytes=1000)
+    for user_id in range(20):
+        size_capped.put((user_id, 'content_based', 3), 1, make_response(user_id))
+    stats = size_capped.stats()
+    assert 0 < stats['bytes'] <= 1000 and stats['evictions'] > 0
+    print(f"OK - Memory cap respected ({stats['entries']} entries, {stats['bytes']} bytes)")
+
+    disabled = ResponseCache(max_entries=0)
+    disabled.put((1, 'collaborative_filtering', 5), 1, make_response(1))
+    assert disabled.get((1, 'collaborative_filtering', 5), version=1) is None
+    print("OK - max_entries=0 disables the cache")
+
+    print("\nAll response cache checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_response_cache()
@@ -0,0 +1,78 @@
+"""
+Test script for single-flight coalescing of identical concurrent requests
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_single_flight():
+    """
+    Check that concurrent calls share one computation, errors reach every waiter and waiters time out
+    """
+    flight = SingleFlight(timeout=5)
+    calls, results = [], []
+
+    def compute(user_id):
+        calls.append(user_id)
+        time.sleep(0.2)
+        return {'user_id': user_id}
+
+    run_concurrently(8, lambda: results.append(flight.do(('user', 1), compute, 1)))
+    assert len(calls) == 1 and results == [{'user_id': 1}] * 8
+    assert flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 7}
+    print("OK - 8 concurrent identical calls ran one computation")
+
+    flight.do(('user', 1), compute, 1)
+    assert len(calls) == 2
+    print("OK - Finished calls are not kept")
+
+    errors = []
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError('database unavailable')
+
+    def call_failing():
+        try:
+            flight.do('failing', failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_concurrently(4, call_failing)
+    assert errors == ['database unavailable'] * 4
+    print("OK - The leader's exception is raised to every waiter")
+
+    impatient = SingleFlight(timeout=0.05)
+    outcomes = []
+
+    def call_slow():
+        try:
+            outcomes.append(impatient.do('slow', time.sleep, 0.5))
+        except FutureTimeoutError:
+            outcomes.append('timeout')
+
+    run_concurrently(3, call_slow)
+    assert sorted(outcomes, key=str) == [None, 'timeout', 'timeout']
+    print("OK - Waiters give up after the timeout")
+
+    print("\nAll single-flight checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_single_flight()
@@ -0,0 +1,134 @@
+"""
+Test script for the training child process
+"""
+import os
+import sys
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_store import ModelStore
+from training_process import TrainingProcess
+
+
+def child_state(value):
+    """
+    Task run in the child: remember values across runs and report the child's pid
+    """
+    history = globals().setdefault('history', [])
+    history.append(value)
+    return os.getpid(), list(history)
+
+
+def fail(value):
+    raise ValueError(f'bad value {value}')
+
+
+def crash(*_):
+    os._exit(1)
+
+
+def train_copy(db_path, model_dir):
+    """
+    Task run in the child: train_snapshot() against a copy of quiz_app.db
+    """
+    import quiz_recommendation_system
+    from quiz_recommendation_system import QuizRecommendationSystem, train_snapshot
+    if quiz_recommendation_system.rec_system.connection_string != f'sqlite:///{db_path}':
+        quiz_recommendation_system.rec_system = QuizRecommendationSystem(
+            f'sqlite:///{db_path}', k_neighbors=3, materialize_recommendations=False
+        )
+    return train_snapshot(model_dir)
+
+
+def test_training_process():
+    """
+    Check that tasks run in one long-lived child, errors are re-raised and a dead child is replaced
+    """
+    process = TrainingProcess(child_state)
+    try:
+        first_pid, _ = process.run(1)
+        second_pid, history = process.run(2)
+        assert first_pid != os.getpid() and first_pid == second_pid
+        assert history == [1, 2]
+        print("OK - Runs share one child process that keeps its state")
+
+        process.task = fail
+        try:
+            process.run(3)
+            assert False, 'expected ValueError'
+        except ValueError as e:
+            assert str(e) == 'bad value 3'
+        process.task = child_state
+        assert process.run(4)[0] == first_pid
+        print("OK - Task errors are re-raised and the child keeps running")
+
+        process.task = crash
+        try:
+            process.run(5)
+            assert False, 'expected BrokenProcessPool'
+        except BrokenProcessPool:
+            pass
+        process.task = child_state
+        new_pid, history = process.run(6)
+        assert new_pid != first_pid and history == [6]
+        print("OK - A dead child is replaced on the next run")
+
+        print("\nAll training process checks passed!")
+        return True
+    finally:
+        process.shutdown()
+
+
+def test_training_process_versions():
+    """
+    Check that a replacement child continues the snapshot versions saved by the one that died,
+    and that the child skips the quiz details refresh and fails runs whose snapshot is not saved
+    """
+    source_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_app.db')
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, 'quiz_app_training.db')
+    model_dir = os.path.join(temp_dir, 'models')
+    shutil.copy(source_db, db_path)
+
+    process = TrainingProcess(train_copy)
+    try:
+        records = [process.run(db_path, model_dir) for _ in range(2)]
+        versions = [record['model_version'] for record in records]
+        assert versions == [1, 2], versions
+        stage_names = [stage['name'] for stage in records[-1]['stages']]
+        assert 'persist' in stage_names and 'quiz_metadata' not in stage_names
+
+        process.task = crash
+        try:
+            process.run(db_path, model_dir)
+            assert False, 'expected BrokenProcessPool'
+        except BrokenProcessPool:
+            pass
+        process.task = train_copy
+        version = process.run(db_path, model_dir)['model_version']
+        assert version > versions[-1], (versions, version)
+        assert ModelStore(model_dir).load().version == version
+        print(f"OK - Replacement child continues from v{versions[-1]} with v{version}")
+
+        # A model directory that cannot be written fails the run in the parent
+        blocked_dir = os.path.join(temp_dir, 'not-a-directory')
+        open(blocked_dir, 'w').close()
+        process.shutdown()
+        try:
+            process.run(db_path, blocked_dir)
+            assert False, 'expected the save to fail'
+        except OSError:
+            pass
+        print("OK - A snapshot the child cannot save fails the run")
+        return True
+    finally:
+        process.shutdown()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_training_process()
+    test_training_process_versions()
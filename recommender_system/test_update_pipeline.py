@@ -0,0 +1,86 @@
+"""
+Test script for the staged update pipeline
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from update_pipeline import UpdatePipeline
+from update_trace import UpdateTrace
+
+
+def test_update_pipeline():
+    """
+    Check dependency order, overlapping independent stages, skips and failure handling
+    """
+    trace = UpdateTrace()
+    pipeline = UpdatePipeline(trace, max_workers=4)
+    both_loading = threading.Barrier(2, timeout=5)
+
+    def load(value):
+        def stage_fn(stage):
+            # Both loads must be running at the same time to pass the barrier
+            both_loading.wait()
+            stage['rows'] = value
+            return value
+        return stage_fn
+
+    pipeline.add('load_a', load(2))
+    pipeline.add('load_b', load(3))
+    pipeline.add('product', lambda stage, load_a, load_b: load_a * load_b, after=('load_a', 'load_b'))
+    pipeline.add('unchanged', lambda stage, load_a: 'rebuilt', after=('load_a',), condition=lambda load_a: load_a > 5)
+    pipeline.add('after_unchanged', lambda stage, unchanged: unchanged, after=('unchanged',))
+    pipeline.add('flaky', lambda stage: 1 / 0, optional=True)
+    pipeline.add('after_flaky', lambda stage, flaky: flaky, after=('flaky',))
+    results = pipeline.run()
+
+    assert results == {'load_a': 2, 'load_b': 3, 'product': 6}
+    stages = {stage['name']: stage for stage in trace.stages}
+    assert set(stages) == {'load_a', 'load_b', 'product', 'flaky'}
+    assert stages['product']['start'] >= max(stages['load_a']['start'], stages['load_b']['start'])
+    assert stages['load_a']['rows'] == 2 and 'division by zero' in stages['flaky']['error']
+    print("OK - Independent stages overlap, dependents wait, skips and optional failures propagate")
+
+    pipeline = UpdatePipeline(UpdateTrace(), max_workers=2)
+    started = []
+
+    def slow(stage):
+        time.sleep(0.2)
+        started.append('slow')
+
+    def broken(stage):
+        raise RuntimeError('database unavailable')
+
+    pipeline.add('slow', slow)
+    pipeline.add('broken', broken)
+    pipeline.add('after_broken', lambda stage, broken: started.append('after_broken'), after=('broken',))
+    try:
+        pipeline.run()
+        assert False, 'expected RuntimeError'
+    except RuntimeError as e:
+        assert str(e) == 'database unavailable'
+    assert started == ['slow']
+    print("OK - A failing stage is re-raised after running stages finish, its dependents never start")
+
+    order = []
+    pipeline = UpdatePipeline(UpdateTrace(), max_workers=1)
+    for name in ('first', 'second', 'third'):
+        pipeline.add(name, lambda stage, name=name: order.append(name))
+    pipeline.run()
+    assert order == ['first', 'second', 'third']
+    try:
+        pipeline.add('orphan', lambda stage, missing: None, after=('missing',))
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+    print("OK - One worker runs stages in the order they were added, unknown dependencies are rejected")
+
+    print("\nAll update pipeline checks passed!")
+    return True
+
+
+if __name__ == "__main__":
+    test_update_pipeline()
@@ -0,0 +1,64 @@
+"""
+Test script for update-cycle traces
+"""
+import json
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from update_trace import UpdateTrace, UpdateTraceLog
+
+
+def test_update_trace_log():
+    """
+    Check stage timing and volumes, the ring buffer and JSON-lines persistence
+    """
+    temp_dir = tempfile.mkdtemp()
+    jsonl_path = os.path.join(temp_dir, 'update_traces.jsonl')
+
+    try:
+        trace_log = UpdateTraceLog(max_traces=2, jsonl_path=jsonl_path)
+        for version in (1, 2, 3):
+            trace = UpdateTrace(full_reload=version == 1)
+            with trace.stage('load') as stage:
+                stage['rows'] = version * 100
+            with trace.stage('matrix', users=10, quizzes=5):
+                pass
+            trace.finish(model_version=version)
+            trace_log.add(trace)
+
+        traces = trace_log.recent()
+        assert [trace['model_version'] for trace in traces] == [3, 2]
+        assert [stage['name'] for stage in traces[0]['stages']] == ['load', 'matrix']
+        assert traces[0]['stages'][0]['rows'] == 300 and traces[0]['stages'][1]['quizzes'] == 5
+        assert all(stage['duration'] is not None for stage in traces[0]['stages'])
+        assert trace_log.recent(limit=1)[0]['model_version'] == 3
+        print("OK - Ring buffer keeps the newest traces with stage durations and volumes")
+
+        with open(jsonl_path, encoding='utf-8') as trace_file:
+            persisted = [json.loads(line) for line in trace_file]
+        assert [trace['model_version'] for trace in persisted] == [1, 2, 3]
+        assert persisted[0]['full_reload'] is True
+        print("OK - Every trace appended to the JSON-lines file")
+
+        failed = UpdateTrace()
+        try:
+            with failed.stage('load'):
+                raise ValueError('database unavailable')
+        except ValueError as e:
+            failed.finish(model_version=3, error=e)
+        assert failed.error == 'ValueError: database unavailable'
+        assert failed.stages[0]['duration'] is not None
+        print(f"OK - Failed runs keep the error ({failed.summary()})")
+
+        print("\nAll update trace checks passed!")
+        return True
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_update_trace_log()
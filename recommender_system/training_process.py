@@ -0,0 +1,40 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingProcess:
+    """
+    One long-lived child process that runs model updates, so the CPU-heavy fitting (which holds
+    the GIL for long stretches) never competes with request threads for the interpreter.
+    The child keeps its own recommender state between runs (rating store watermarks, play history)
+    and hands each finished snapshot back through files: task(*args) saves it to the model
+    directory, and the serving process only maps the files and swaps its snapshot reference.
+    Uses the spawn start method, since forking a process with running request threads is unsafe.
+    A child that dies is replaced on the next run.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self._executor = None
+
+    def run(self, *args):
+        """
+        Run task(*args) in the child process and return its result (exceptions are re-raised here)
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            return self._executor.submit(self.task, *args).result()
+        except BrokenProcessPool:
+            logger.error("Training process died, a new one is started on the next run")
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
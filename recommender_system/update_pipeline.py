@@ -0,0 +1,95 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from update_trace import UpdateTrace
+
+logger = logging.getLogger(__name__)
+
+# Result of a stage that did not run (condition false, a dependency skipped or an optional stage failed)
+SKIPPED = object()
+
+
+class UpdatePipeline:
+    """
+    The stages of a model update as a dependency graph run on a thread pool. A stage starts as
+    soon as the stages it depends on have finished, so independent database reads overlap (each
+    on its own pooled connection) and independent fits run side by side; the database driver,
+    numpy and scipy release the GIL for most of that work. Every stage is timed in the UpdateTrace.
+    A stage is skipped when its condition is false or a stage it depends on was skipped.
+    A failing optional stage is logged and counts as skipped; any other failure stops new stages
+    from starting and is re-raised once the running ones have finished.
+    With max_workers=1 the stages run one at a time in the order they were added.
+    """
+
+    def __init__(self, trace: UpdateTrace, max_workers: int = 4):
+        self.trace = trace
+        self.max_workers = max(max_workers, 1)
+        # {name: (fn, dependencies, condition, optional)} in the order the stages were added
+        self._stages = {}
+
+    def add(self, name: str, fn, after: tuple = (), condition=None, optional: bool = False):
+        """
+        Add a stage. fn(stage, **inputs) gets its trace record (for data volumes) and the results of
+        the stages it runs after, keyed by stage name; condition(**inputs) decides whether it runs.
+        Dependencies must be added first.
+        """
+        for dependency in after:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self._stages[name] = (fn, tuple(after), condition, optional)
+
+    def _run_stage(self, name: str, inputs: dict):
+        fn, _, _, optional = self._stages[name]
+        with self.trace.stage(name) as stage:
+            try:
+                return fn(stage, **inputs)
+            except Exception as e:
+                if not optional:
+                    raise
+                logger.error(f"Error in update stage '{name}': {str(e)}")
+                stage['error'] = str(e)
+                return SKIPPED
+
+    def run(self) -> dict:
+        """
+        Run all stages and return {name: result} for the stages that ran
+        """
+        results = {}
+        pending = list(self._stages)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='update') as executor:
+            while True:
+                # Start every stage whose dependencies are done (skips can unblock further stages)
+                progressed = error is None
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        _, after, condition, _ = self._stages[name]
+                        if not all(dependency in results for dependency in after):
+                            continue
+                        pending.remove(name)
+                        progressed = True
+                        inputs = {dependency: results[dependency] for dependency in after}
+                        if any(value is SKIPPED for value in inputs.values()) or \
+                                (condition is not None and not condition(**inputs)):
+                            results[name] = SKIPPED
+                        else:
+                            running[executor.submit(self._run_stage, name, inputs)] = name
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        results[name] = SKIPPED
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            raise error
+        return {name: result for name, result in results.items() if result is not SKIPPED}
@@ -0,0 +1,117 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None where the resource module is missing
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class UpdateTrace:
+    """
+    Structured record of one update_recommendations() run: total duration, and per stage its
+    duration plus data volumes (row counts, matrix sizes), the published model version,
+    peak RSS and the error if the run failed.
+    """
+
+    def __init__(self, full_reload: bool = False):
+        self.started_at = datetime.now()
+        self.full_reload = full_reload
+        self.stages = []
+        self.duration = None
+        self.model_version = None
+        self.peak_rss_mb = None
+        self.error = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, **volumes):
+        """
+        Time the with-block as a stage. The yielded dict collects data volumes for the stage.
+        Stages may run concurrently from several threads.
+        """
+        start = time.perf_counter()
+        # Offset from the start of the update, to show which stages overlapped
+        record = {'name': name, 'start': round(start - self._start, 4), 'duration': None, **volumes}
+        self.stages.append(record)
+        try:
+            yield record
+        finally:
+            record['duration'] = round(time.perf_counter() - start, 4)
+
+    def finish(self, model_version: int = None, error: Exception = None):
+        self.duration = round(time.perf_counter() - self._start, 4)
+        self.model_version = model_version
+        self.peak_rss_mb = peak_rss_mb()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def summary(self) -> str:
+        stages = ', '.join(f"{stage['name']} {stage['duration']}s" for stage in self.stages)
+        return f"Update took {self.duration}s ({stages}), peak RSS {self.peak_rss_mb} MB"
+
+    def to_dict(self) -> dict:
+        return {
+            'started_at': self.started_at.isoformat(),
+            'duration': self.duration,
+            'full_reload': self.full_reload,
+            'model_version': self.model_version,
+            'peak_rss_mb': self.peak_rss_mb,
+            'error': self.error,
+            'stages': self.stages
+        }
+
+
+class UpdateTraceLog:
+    """
+    Ring buffer of the last max_traces update traces, optionally appended to a JSON-lines file
+    """
+
+    def __init__(self, max_traces: int = 50, jsonl_path: str = None):
+        self.traces = deque(maxlen=max_traces)
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+
+    def add(self, trace: UpdateTrace):
+        self.add_record(trace.to_dict())
+
+    def add_record(self, record: dict):
+        """
+        Add a trace already converted with to_dict() (e.g. one returned by the training process)
+        """
+        with self._lock:
+            self.traces.append(record)
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as trace_file:
+                        trace_file.write(json.dumps(record, default=str) + '\n')
+                except OSError as e:
+                    logger.error(f"Error writing update trace to {self.jsonl_path}: {str(e)}")
+
+    def recent(self, limit: int = None) -> list:
+        """
+        Most recent traces first
+        """
+        with self._lock:
+            traces = list(self.traces)
+        traces.reverse()
+        return traces[:limit] if limit else traces
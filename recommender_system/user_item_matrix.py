@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class UserItemMatrix:
+    """
+    Sparse users x quizzes rating matrix with student/quiz id <-> row/column index maps.
+    Memory grows with the number of ratings instead of users x quizzes.
+    """
+
+    def __init__(self, ratings: sp.csr_matrix, user_ids, quiz_ids):
+        self.ratings = ratings.tocsr()
+        self.user_ids = np.asarray(user_ids)
+        self.quiz_ids = np.asarray(quiz_ids, dtype=object)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self.quiz_index = {quiz_id: col for col, quiz_id in enumerate(self.quiz_ids.tolist())}
+        self._item_matrix = None
+
+    @classmethod
+    def from_ratings(cls, df: pd.DataFrame, dtype=np.float32) -> 'UserItemMatrix':
+        """
+        Build the matrix from a (student_id, quiz_id, rating) DataFrame
+        """
+        if df.empty:
+            return cls(sp.csr_matrix((0, 0), dtype=dtype), [], [])
+
+        # pivot_table averaged duplicate (student, quiz) pairs, keep that behaviour
+        grouped = df.groupby(['student_id', 'quiz_id'], sort=False)['rating'].mean()
+
+        # Sorted codes keep rows/columns in the same order pivot_table produced
+        user_codes, user_ids = pd.factorize(grouped.index.get_level_values('student_id'), sort=True)
+        quiz_codes, quiz_ids = pd.factorize(grouped.index.get_level_values('quiz_id').astype(str), sort=True)
+
+        ratings = sp.csr_matrix(
+            (grouped.to_numpy(dtype=dtype), (user_codes.astype(np.int32), quiz_codes.astype(np.int32))),
+            shape=(len(user_ids), len(quiz_ids)),
+            dtype=dtype
+        )
+        # A zero rating meant "not rated" in the dense matrix
+        ratings.eliminate_zeros()
+        ratings.sort_indices()
+
+        return cls(ratings, np.asarray(user_ids), np.asarray(quiz_ids, dtype=object))
+
+    @property
+    def shape(self) -> tuple:
+        return self.ratings.shape
+
+    @property
+    def empty(self) -> bool:
+        return self.ratings.shape[0] == 0 or self.ratings.shape[1] == 0
+
+    @property
+    def index(self) -> np.ndarray:
+        """Student IDs in row order"""
+        return self.user_ids
+
+    @property
+    def columns(self) -> np.ndarray:
+        """Quiz IDs in column order"""
+        return self.quiz_ids
+
+    @property
+    def nnz(self) -> int:
+        return self.ratings.nnz
+
+    @property
+    def item_matrix(self) -> sp.csr_matrix:
+        """
+        Quizzes x users matrix (the CSC view of the ratings, transposed), built once on first use
+        """
+        if self._item_matrix is None:
+            self._item_matrix = self.ratings.tocsc().T.tocsr()
+        return self._item_matrix
+
+    def user_ratings(self, user_id) -> tuple:
+        """
+        Return (quiz column indices, ratings) for a student, or empty arrays if unknown
+        """
+        row = self.user_index.get(user_id)
+        if row is None:
+            return np.array([], dtype=np.int32), np.array([], dtype=self.ratings.dtype)
+        start, end = self.ratings.indptr[row], self.ratings.indptr[row + 1]
+        return self.ratings.indices[start:end], self.ratings.data[start:end]
+
+    def user_rating_map(self, user_id) -> dict:
+        """
+        Return {quiz_id: rating} for a student's rated quizzes
+        """
+        quiz_indices, ratings = self.user_ratings(user_id)
+        return {self.quiz_ids[col]: float(rating) for col, rating in zip(quiz_indices, ratings)}